@@ -0,0 +1,87 @@
+# admin_page.py
+from shiny import ui, render, reactive
+from shiny.ui import tags
+
+from monitor import LIMIAR_LENTA_MS, LOG_CONSULTAS, ler_log, resumo_por_consulta
+from banco import pool
+from cache import cache_resultados, cache_imagens
+import cache_planilhas
+
+def criar_pagina_admin():
+    """Cria a página do monitor de consultas (log de consultas lentas)."""
+    return tags.div(
+        tags.h2("Monitor de Consultas", class_="page-title"),
+
+        ui.card(
+            ui.h4("Resumo por consulta", class_="mb-3"),
+            ui.p(f"Consultas acima de {LIMIAR_LENTA_MS:.0f} ms são marcadas como lentas e guardam o plano do EXPLAIN ANALYZE."),
+            ui.p(tags.small(f"Log: {LOG_CONSULTAS}")),
+            ui.input_action_button("admin_atualizar", "Atualizar", class_="btn btn-primary"),
+            ui.br(), ui.br(),
+            ui.output_ui("admin_status"),
+            ui.output_table("admin_resumo"),
+            style="padding: 30px; background: white; border-radius: 10px; margin: 0 auto;"
+        ),
+
+        ui.card(
+            ui.h5("Consultas lentas recentes", class_="mb-3"),
+            ui.output_ui("admin_lentas"),
+            style="margin-top: 20px; padding: 20px; background: #f8f9fa;"
+        )
+    )
+
+def admin_server(input, output):
+    """Outputs da página do monitor. Relê o log a cada clique em Atualizar."""
+
+    @reactive.calc
+    def registros():
+        input.admin_atualizar()
+        return ler_log()
+
+    @render.ui
+    def admin_status():
+        cache = cache_resultados.estatisticas()
+        imagens = cache_imagens.estatisticas()
+        planilhas = cache_planilhas.estatisticas()
+        conexoes = pool.status()
+        return tags.p(
+            f"Cache: {cache['itens']}/{cache['max_itens']} itens, taxa de acerto {cache['taxa_acerto']:.0%}. ",
+            f"Gráficos: {imagens['itens']} imagens, {imagens['bytes'] / 2**20:.1f}/{imagens['max_bytes'] / 2**20:.0f} MB, "
+            f"taxa de acerto {imagens['taxa_acerto']:.0%}. ",
+            f"Planilhas convertidas: {planilhas['entradas']}, {planilhas['bytes'] / 2**20:.1f}/{planilhas['max_bytes'] / 2**20:.0f} MB. ",
+            f"Pool: {conexoes['emprestados']} em uso, {conexoes['livres']} livres de {conexoes['tamanho']}."
+        )
+
+    @render.table
+    def admin_resumo():
+        import pandas as pd
+
+        resumo = resumo_por_consulta(registros())
+        if not resumo:
+            return pd.DataFrame(columns=["Consulta", "Painéis", "Execuções", "Lentas", "Erros", "Média (ms)", "Máx. (ms)", "SQL"])
+        return pd.DataFrame([{
+            "Consulta": g["digital"],
+            "Painéis": g["paineis"],
+            "Execuções": g["execucoes"],
+            "Lentas": g["lentas"],
+            "Erros": g["erros"],
+            "Média (ms)": round(g["ms_medio"], 1),
+            "Máx. (ms)": round(g["ms_max"], 1),
+            "SQL": g["sql"][:120],
+        } for g in resumo])
+
+    @render.ui
+    def admin_lentas():
+        lentas = [r for r in reversed(registros()) if r.get("lenta") or "erro" in r][:20]
+        if not lentas:
+            return ui.p("Nenhuma consulta lenta registrada.")
+        itens = []
+        for r in lentas:
+            titulo = f"{r['ts']} | {r['painel']} | {r['digital']} | {r['ms']:.0f} ms | {r['linhas']} linhas"
+            detalhe = r.get("erro") or r.get("plano") or "(plano já capturado em execução anterior)"
+            itens.append(tags.details(
+                tags.summary(titulo),
+                tags.p(tags.code(f"params: {r.get('params')}")),
+                tags.pre(detalhe, style="font-size: 11px; max-height: 400px; overflow: auto;"),
+            ))
+        return tags.div(*itens)
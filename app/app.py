@@ -1,5 +1,4 @@
 # app.py
-import duckdb
 from shiny import App, ui, reactive, render
 from shiny.ui import tags
 from pathlib import Path
@@ -7,13 +6,20 @@ import os
 
 # Importações dos novos arquivos
 from style import custom_css
-from data import get_unidades_disponiveis,get_eixos_sql,get_donut_sql,get_ranking_sql,get_distribuicao_sql,get_eixos_sql_disciplina,get_donut_sql_disciplina,get_ranking_sql_disciplina,get_distribuicao_sql_disciplina
+from data import DB_PATH,get_snapshot_sql_disciplina,snapshot_vazio,get_tendencia_sql,get_tendencia_sql_disciplina,tendencia_vazia
 from components import *
 from ui_content import get_home_content
 from logic_filter import setup_cascading_filters
-from modules import dashboard_ui, dashboard_server
-from upload_page import criar_pagina_upload  # NOVA IMPORT
-from ingestao import processar_excel  # FUNÇÃO SIMPLIFICADA DE UPLOAD
+from modules import dashboard_ui, dashboard_server, GRAFICOS_NO_NAVEGADOR
+from upload_page import criar_pagina_upload, painel_trabalho  # NOVA IMPORT
+from tarefas import em_segundo_plano, limite_por_sessao
+from monitor import painel
+from admin_page import criar_pagina_admin, admin_server
+from padroes import payloads_padrao
+from banco import geracao_atual
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
 
 www_dir = Path(__file__).parent / "www"
 
@@ -26,7 +32,9 @@ app_ui = ui.page_fluid(
         tags.title("Fechamento CPA - Universidade Federal do Paraná"), 
         tags.link(rel="stylesheet", href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.2/css/all.min.css", crossorigin="anonymous"),
         tags.link(rel="icon", type="image/png", href="/static/icon.png?v=2"),
-        tags.link(rel="shortcut icon", href="/static/icon.png?v=2")
+        tags.link(rel="shortcut icon", href="/static/icon.png?v=2"),
+        # Componente local de gráficos (HACKATHON_GRAFICOS=navegador), sem CDN
+        tags.script(src="/static/graficos.js", defer="") if GRAFICOS_NO_NAVEGADOR else None,
     ),
     
     ui.output_ui("css_controlador"), 
@@ -56,6 +64,9 @@ app_ui = ui.page_fluid(
             
             # NOVA ABA: Upload de Dados
             ui.nav_panel("upload", criar_pagina_upload()),
+
+            # Monitor de consultas (log de consultas lentas)
+            ui.nav_panel("admin", criar_pagina_admin()),
             
             id="router_principal"
         ), class_="conteudo-spa"
@@ -76,8 +87,15 @@ def server(input, output, session):
     @reactive.event(input.btn_fechar)
     def _(): estado_menu.set(False)
     
+    # Página ativa e páginas já abertas nesta sessão (carregamento sob demanda)
+    pagina_atual = reactive.Value("home")
+    visitadas = reactive.Value(frozenset({"home"}))
+
     def navegar_para(page_id): 
         ui.update_navset("router_principal", selected=page_id)
+        pagina_atual.set(page_id)
+        if page_id not in visitadas.get():
+            visitadas.set(visitadas.get() | {page_id})
         estado_menu.set(False)
     
     @reactive.effect
@@ -100,45 +118,167 @@ def server(input, output, session):
     @reactive.effect
     @reactive.event(input.nav_upload)
     def _(): navegar_para("upload")
+
+    @reactive.effect
+    @reactive.event(input.nav_admin)
+    def _(): navegar_para("admin")
     
     @render.ui
     def css_controlador(): 
         return tags.style(".menu-lateral { display: flex !important;} .overlay-escura { display: block !important; }") if estado_menu.get() else None
 
+    # --- CONSULTAS EM SEGUNDO PLANO ---
+    # As consultas rodam em threads (tarefas.py) para não travar o event loop,
+    # que é compartilhado com as outras sessões do worker.
+    limite_sessao = limite_por_sessao()
+
     # --- INICIALIZAÇÃO DE FILTROS ---
-    unidades = get_unidades_disponiveis()
-    ui.update_select("inst_campus", choices=unidades)
-    ui.update_select("curso_campus", choices=unidades)
+    # Listas compartilhadas entre sessões (padroes.py), reenviadas a cada nova
+    # geração de dados: unidades e anos de um upload aparecem sem recarregar.
+    # Logo depois de um upload elas ainda estão sendo recalculadas: a espera
+    # fica no executor (payloads_padrao.aguardar), não no event loop
+    @reactive.poll(geracao_atual, 1)
+    def geracao_dados():
+        return geracao_atual()
+
+    def selecionado(id_select, opcoes):
+        # Mantém a escolha do usuário se ela continuar entre as opções
+        if not input[id_select].is_set():
+            return None
+        valor = input[id_select]()
+        return valor if valor in opcoes else None
+
+    @reactive.effect
+    async def _():
+        geracao_dados()
+        try:
+            unidades = await payloads_padrao.aguardar("unidades", limite_sessao)
+            anos = await payloads_padrao.aguardar("anos", limite_sessao)
+        except Exception as e:
+            # Sem as listas novas os selects ficam com as anteriores; a sessão segue
+            print(f"[ERRO] Falha ao atualizar unidades e anos dos filtros: {e}")
+            return
+        with reactive.isolate():
+            for id_select in ("inst_campus", "curso_campus"):
+                ui.update_select(id_select, choices=unidades, selected=selecionado(id_select, unidades))
+            for id_select in ("inst_ano", "curso_ano", "disc_ano"):
+                ui.update_select(id_select, choices=anos, selected=selecionado(id_select, anos))
     
     # Chama a lógica complexa de filtros de disciplina (logic_filters.py)
-    setup_cascading_filters(input, ui)
+    # Os selects só são populados quando a aba Disciplinas é aberta
+    setup_cascading_filters(input, ui, limite_sessao, ativo=lambda: "disciplinas" in visitadas(), geracao=geracao_dados)
 
     # --- ESTADO DOS DADOS (REACTIVE VALUES) ---
+    # Cada snapshot traz (eixos, donut, ranking, distribuição) numa consulta só
     # Institucional
-    dados_inst = reactive.Value(get_eixos_sql("Institucional", "Todos"))
-    donut_inst = reactive.Value(get_donut_sql("Institucional", "Todos"))
-    barras_inst = reactive.Value(get_ranking_sql("Institucional", "Todos"))
-    dist_inst = reactive.Value(get_distribuicao_sql("Institucional", "Todos"))
+    eixos, donut, ranking, dist = snapshot_vazio("Satisfação por Unidade")
+    dados_inst = reactive.Value(eixos)
+    donut_inst = reactive.Value(donut)
+    barras_inst = reactive.Value(ranking)
+    dist_inst = reactive.Value(dist)
 
     # Cursos
-    dados_curso = reactive.Value(get_eixos_sql("Cursos", "Todos"))
-    donut_curso = reactive.Value(get_donut_sql("Cursos", "Todos"))
-    barras_curso = reactive.Value(get_ranking_sql("Cursos", "Todos"))
-    dist_curso = reactive.Value(get_distribuicao_sql("Cursos", "Todos"))
+    eixos, donut, ranking, dist = snapshot_vazio("Top Cursos")
+    dados_curso = reactive.Value(eixos)
+    donut_curso = reactive.Value(donut)
+    barras_curso = reactive.Value(ranking)
+    dist_curso = reactive.Value(dist)
 
     # Disciplinas
-    dados_disc = reactive.Value((0, []))
-    donut_disc = reactive.Value({"total": 0, "concordo": 0, "neutro": 0, "discordo": 0})
-    barras_disc = reactive.Value({"titulo": "Top Disciplinas", "dados": []})
-    dist_disc = reactive.Value({"notas": [], "media": 0})
+    eixos, donut, ranking, dist = snapshot_vazio("Top Disciplinas")
+    dados_disc = reactive.Value(eixos)
+    donut_disc = reactive.Value(donut)
+    barras_disc = reactive.Value(ranking)
+    dist_disc = reactive.Value(dist)
+
+    # Séries anuais (todos os anos do recorte; não dependem do filtro de ano)
+    tend_inst = reactive.Value(tendencia_vazia())
+    tend_curso = reactive.Value(tendencia_vazia())
+    tend_disc = reactive.Value(tendencia_vazia())
+
+    # --- PAINÉIS EM SEGUNDO PLANO ---
+
+    def tarefa_snapshot(nome_painel, funcao_snapshot, destinos, vazio):
+        """
+        ExtendedTask que roda a consulta fora do event loop e distribui os
+        payloads nos destinos. Se a consulta falhar, os destinos recebem os
+        payloads de `vazio()`: só o painel fica em branco, não a sessão.
+        """
+        @reactive.extended_task
+        async def tarefa(*filtros):
+            with painel(nome_painel):
+                return await em_segundo_plano(limite_sessao, funcao_snapshot, *filtros)
+
+        @reactive.effect
+        def _():
+            if tarefa.status() == "error":
+                print(f"[ERRO] Consulta do painel '{nome_painel}' falhou: {tarefa.error.get()}")
+                valores = vazio()
+            else:
+                valores = tarefa.result()
+            for destino, valor in zip(destinos, valores):
+                destino.set(valor)
+
+        return tarefa
+
+    # Com filtro "Todos", Institucional e Cursos usam o payload compartilhado
+    destinos_inst = (dados_inst, donut_inst, barras_inst, dist_inst)
+    destinos_curso = (dados_curso, donut_curso, barras_curso, dist_curso)
+    tarefa_inst = tarefa_snapshot("inst", payloads_padrao.envolver("inst"), destinos_inst,
+                                  lambda: snapshot_vazio("Satisfação por Unidade"))
+    tarefa_curso = tarefa_snapshot("cursos", payloads_padrao.envolver("cursos"), destinos_curso,
+                                   lambda: snapshot_vazio("Top Cursos"))
+    tarefa_disc = tarefa_snapshot("disc", get_snapshot_sql_disciplina, (dados_disc, donut_disc, barras_disc, dist_disc),
+                                  lambda: snapshot_vazio("Top Disciplinas"))
+    serie_vazia = lambda: (tendencia_vazia(),)
+    tarefa_tend_inst = tarefa_snapshot("inst", lambda *filtros: (get_tendencia_sql(*filtros),), (tend_inst,), serie_vazia)
+    tarefa_tend_curso = tarefa_snapshot("cursos", lambda *filtros: (get_tendencia_sql(*filtros),), (tend_curso,), serie_vazia)
+    tarefa_tend_disc = tarefa_snapshot("disc", lambda *filtros: (get_tendencia_sql_disciplina(*filtros),), (tend_disc,), serie_vazia)
+
+    # Estado inicial ("Todos") de Institucional e Cursos, carregado na primeira
+    # vez que a aba é aberta: direto do payload aquecido ou, se ainda não
+    # estiver pronto, esperando por ele em segundo plano
+    carga_inicial = {
+        "institucional": ("inst", destinos_inst, tarefa_inst, tarefa_tend_inst, "Institucional"),
+        "cursos": ("cursos", destinos_curso, tarefa_curso, tarefa_tend_curso, "Cursos"),
+    }
+    paginas_carregadas = set()
+
+    @reactive.effect
+    @reactive.event(pagina_atual)
+    def _():
+        pagina = pagina_atual()
+        if pagina not in carga_inicial or pagina in paginas_carregadas:
+            return
+        paginas_carregadas.add(pagina)
+        nome, destinos, tarefa, tarefa_tend, tipo = carga_inicial[pagina]
+        pronto, payload = payloads_padrao.atual(nome)
+        if pronto:
+            for destino, valor in zip(destinos, payload):
+                destino.set(valor)
+        else:
+            tarefa(tipo, "Todos", "Todos")
+        tarefa_tend(tipo, "Todos")
 
     # --- VARIÁVEL PARA MENSAGENS DE UPLOAD ---
     status_ingestao_msg = reactive.Value("")
+    trabalho_ingestao = reactive.Value(None)  # id do último trabalho submetido nesta sessão
     
     @output
-    @render.text
+    @render.ui
     def status_ingestao():
-        return status_ingestao_msg.get()
+        mensagem = status_ingestao_msg.get()
+        id_trabalho = trabalho_ingestao.get()
+        if id_trabalho is None:
+            return mensagem
+        from trabalhos import obter_trabalho
+        trabalho = obter_trabalho(id_trabalho)
+        if trabalho is None:
+            return mensagem
+        # Enquanto o trabalho roda, relê o andamento a cada meio segundo
+        if trabalho.ativo():
+            reactive.invalidate_later(0.5)
+        return ui.TagList(mensagem, painel_trabalho(trabalho.resumo()))
     
     # --- EVENTOS DE UPLOAD ---
     @reactive.Effect
@@ -150,23 +290,18 @@ def server(input, output, session):
             status_ingestao_msg.set("❌ Nenhum arquivo enviado.")
             return
 
-        caminho_temp = file[0]["datapath"]
-        
         try:
-            # Mensagem inicial
-            status_ingestao_msg.set("📥 Carregando arquivo Excel...")
-            
-            # Caminho do banco principal
-            BANCO_PRINCIPAL_PATH = r"C:\Users\gabri\Documents\theoutliers-ufpr-hackathon\data\db\hackathon.duckdb"
-            
-            # Processar e inserir diretamente
-            total_registros = processar_excel(
-                caminho_temp, 
-                BANCO_PRINCIPAL_PATH,
+            # A leitura (em paralelo, por arquivo e aba) e a inserção única rodam em
+            # segundo plano (trabalhos.py); esta sessão e as demais seguem respondendo.
+            # O andamento aparece em status_ingestao.
+            from trabalhos import submeter_ingestao
+            trabalho = submeter_ingestao(
+                [(arquivo["datapath"], arquivo["name"]) for arquivo in file],
+                DB_PATH,
                 evitar_duplicatas=True
             )
-            
-            status_ingestao_msg.set(f"Sucesso! {total_registros} registros inseridos no banco principal.")
+            status_ingestao_msg.set("")
+            trabalho_ingestao.set(trabalho.id)
             
         except Exception as e:
             # Log detalhado do erro
@@ -177,6 +312,15 @@ def server(input, output, session):
             # Mensagem amigável para o usuário
             status_ingestao_msg.set(f" Erro ao processar arquivo:\n{str(e)[:150]}")
     
+    @reactive.Effect
+    @reactive.event(input.cancelar_ingestao)
+    def _():
+        id_trabalho = trabalho_ingestao.get()
+        if id_trabalho is None:
+            return
+        from trabalhos import cancelar_trabalho
+        cancelar_trabalho(id_trabalho)
+    
     # --- AÇÃO: BAIXAR PDF ---
     @reactive.Effect
     @reactive.event(input.baixar_pdf)
@@ -194,20 +338,14 @@ def server(input, output, session):
     @reactive.effect
     @reactive.event(input.inst_btn_filtrar)
     def _():
-        u = input.inst_campus()
-        dados_inst.set(get_eixos_sql("Institucional", u))
-        donut_inst.set(get_donut_sql("Institucional", u))
-        barras_inst.set(get_ranking_sql("Institucional", u))
-        dist_inst.set(get_distribuicao_sql("Institucional", u))
+        tarefa_inst("Institucional", input.inst_campus(), input.inst_ano())
+        tarefa_tend_inst("Institucional", input.inst_campus())
 
     @reactive.effect
     @reactive.event(input.curso_btn_filtrar)
     def _():
-        u = input.curso_campus()
-        dados_curso.set(get_eixos_sql("Cursos", u))
-        donut_curso.set(get_donut_sql("Cursos", u))
-        barras_curso.set(get_ranking_sql("Cursos", u))
-        dist_curso.set(get_distribuicao_sql("Cursos", u))
+        tarefa_curso("Cursos", input.curso_campus(), input.curso_ano())
+        tarefa_tend_curso("Cursos", input.curso_campus())
 
     @reactive.effect
     @reactive.event(input.disc_btn_filtrar)
@@ -217,14 +355,36 @@ def server(input, output, session):
         curso = input.disc_curso()
         disciplina = input.disc_disciplina()
 
-        dados_disc.set(get_eixos_sql_disciplina(setor, depto, curso, disciplina))
-        donut_disc.set(get_donut_sql_disciplina(setor, depto, curso, disciplina))
-        barras_disc.set(get_ranking_sql_disciplina(setor, depto, curso, disciplina))
-        dist_disc.set(get_distribuicao_sql_disciplina(setor, depto, curso, disciplina))
+        tarefa_disc(setor, depto, curso, disciplina, input.disc_ano())
+        tarefa_tend_disc(setor, depto, curso, disciplina)
+
+    # --- MONITOR DE CONSULTAS ---
+    admin_server(input, output)
 
     # --- CHAMADA DOS MÓDULOS (Dashboard Server) ---
-    dashboard_server("inst", dados_inst, donut_inst, barras_inst, dist_inst)
-    dashboard_server("cursos", dados_curso, donut_curso, barras_curso, dist_curso)
-    dashboard_server("disc", dados_disc, donut_disc, barras_disc, dist_disc)
+    # Outputs de abas inativas e do modo (cards/radar) não selecionado ficam
+    # ocultos no navegador e o Shiny os suspende até aparecerem
+    def rodando(*tarefas):
+        return lambda: any(t.status() == "running" for t in tarefas)
+
+    dashboard_server("inst", dados_inst, donut_inst, barras_inst, dist_inst, tend_inst, rodando(tarefa_inst, tarefa_tend_inst))
+    dashboard_server("cursos", dados_curso, donut_curso, barras_curso, dist_curso, tend_curso, rodando(tarefa_curso, tarefa_tend_curso))
+    dashboard_server("disc", dados_disc, donut_disc, barras_disc, dist_disc, tend_disc, rodando(tarefa_disc, tarefa_tend_disc))
+
+app_shiny = App(app_ui, server, static_assets={"/static": www_dir})
+
+# --- PRONTIDÃO ---
+# Os payloads padrão começam a ser calculados assim que o app sobe;
+# /pronto responde 503 até o primeiro aquecimento terminar.
+# HACKATHON_AQUECER=0 só importa o app (o perfil_inicio.py mede os imports assim).
+if os.environ.get("HACKATHON_AQUECER", "1") != "0":
+    payloads_padrao.aquecer_em_segundo_plano()
+
+def rota_pronto(request):
+    estado = payloads_padrao.estado()
+    return JSONResponse(estado, status_code=200 if estado["pronto"] else 503)
 
-app = App(app_ui, server, static_assets={"/static": www_dir})
\ No newline at end of file
+app = Starlette(routes=[
+    Route("/pronto", rota_pronto),
+    Mount("/", app=app_shiny),
+])
\ No newline at end of file
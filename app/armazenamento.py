@@ -0,0 +1,185 @@
+# armazenamento.py
+# Modo de armazenamento da fAvaliacao. Padrão: tabela dentro do DuckDB.
+# Opcional: dataset Parquet particionado por Ano e família da pesquisa
+# (TipoPergunta: Institucional, Cursos, Disciplina), lido por uma view com o
+# mesmo nome. As dimensões, a dResposta e o cubo continuam no DuckDB.
+import glob
+import os
+
+# --- CONFIGURAÇÃO ---
+
+PARTICOES = ["Ano", "TipoPergunta"]
+
+# Ordem física da fAvaliacao: as varreduras por família/unidade/curso (build
+# do cubo) descartam row groups pelos zone maps de min/max
+ORDEM_FATOS = ["TipoPergunta", "SiglaLotação", "Cod_Curso"]
+
+def sql_ordem_fatos(colunas, alias=""):
+    """ORDER BY da ORDEM_FATOS restrito às colunas disponíveis ('' se nenhuma)."""
+    presentes = [f'{alias}"{col}"' for col in ORDEM_FATOS if col in colunas]
+    return f" ORDER BY {', '.join(presentes)}" if presentes else ""
+
+# Tipos gravados no Parquet (os demais são VARCHAR). A Classe não é gravada:
+# a view a busca na dResposta, então mudanças no MAPA_RESPOSTAS valem na hora.
+TIPOS_FATO = {
+    "ID_Pesquisa": "BIGINT",
+    "ID_Pergunta": "BIGINT",
+    "Ano": "INTEGER",
+    "ID_Resposta": "SMALLINT",
+}
+
+def garantir_config(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS configArmazenamento (
+            Chave VARCHAR PRIMARY KEY,
+            Valor VARCHAR
+        )
+    """)
+
+def diretorio_parquet(con):
+    """Diretório do dataset da fAvaliacao, ou None se ela é uma tabela comum."""
+    existe = con.execute("""
+        SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'configArmazenamento'
+    """).fetchone()[0]
+    if not existe:
+        return None
+    linha = con.execute("SELECT Valor FROM configArmazenamento WHERE Chave = 'fatos_parquet'").fetchone()
+    return linha[0] if linha else None
+
+def fato_em_parquet(con):
+    return diretorio_parquet(con) is not None
+
+def diretorio_padrao(caminho_banco):
+    return os.path.join(os.path.dirname(os.path.abspath(caminho_banco)), "fatos")
+
+def arquivos_parquet(diretorio):
+    """Arquivos atuais do dataset (para desfazer o que um lote abortado gravou)."""
+    return set(glob.glob(os.path.join(diretorio, "*", "*", "*.parquet")))
+
+
+# --- LEITURA (VIEW) ---
+
+def _sql_literal(texto):
+    return "'" + texto.replace("'", "''") + "'"
+
+def criar_view_fatos(con, diretorio, colunas_fato):
+    """(Re)cria a view fAvaliacao sobre o dataset; filtros em Ano/TipoPergunta podam arquivos."""
+    padrao = os.path.join(diretorio, "*", "*", "*.parquet")
+    colunas = ", ".join(f'p."{col}"' for col in colunas_fato)
+    tipos_hive = ", ".join(f"'{col}': {TIPOS_FATO.get(col, 'VARCHAR')}" for col in PARTICOES)
+    con.execute(f"""
+        CREATE OR REPLACE VIEW fAvaliacao AS
+        SELECT {colunas}, p.ID_Resposta, r.Classe
+        FROM read_parquet({_sql_literal(padrao)}, hive_partitioning = true,
+                          hive_types = {{{tipos_hive}}}, union_by_name = true) p
+        LEFT JOIN dResposta r ON p.ID_Resposta = r.ID_Resposta
+    """)
+
+
+# --- ESCRITA ---
+
+def sql_selecao_parquet(origem, colunas_origem, colunas_fato):
+    """
+    SELECT de `origem` no formato do dataset: colunas tipadas (faltantes viram
+    NULL) e ID_Resposta resolvido pela dResposta.
+    """
+    campos = []
+    for col in colunas_fato:
+        valor = f'o."{col}"' if col in colunas_origem else "NULL"
+        campos.append(f'CAST({valor} AS {TIPOS_FATO.get(col, "VARCHAR")}) AS "{col}"')
+    if "ID_Resposta" in colunas_origem:
+        campos.append("CAST(o.ID_Resposta AS SMALLINT) AS ID_Resposta")
+        juncao = ""
+    else:
+        campos.append("r.ID_Resposta")
+        juncao = "LEFT JOIN dResposta r ON TRIM(o.Resposta) = r.Resposta"
+    return f"SELECT {', '.join(campos)} FROM {origem} o {juncao}{sql_ordem_fatos(colunas_origem, 'o.')}"
+
+def gravar_parquet(con, origem, colunas_origem, colunas_fato, diretorio):
+    """Acrescenta as linhas de `origem` ao dataset (um arquivo novo por partição tocada)."""
+    os.makedirs(diretorio, exist_ok=True)
+    con.execute(f"""
+        COPY ({sql_selecao_parquet(origem, colunas_origem, colunas_fato)})
+        TO {_sql_literal(diretorio)}
+        (FORMAT PARQUET, PARTITION_BY ({', '.join(PARTICOES)}),
+         OVERWRITE_OR_IGNORE, FILENAME_PATTERN 'lote_{{uuid}}')
+    """)
+
+
+# --- MIGRAÇÃO ENTRE MODOS ---
+
+def migrar_para_parquet(con, diretorio, colunas_fato):
+    """Exporta a tabela fAvaliacao para o dataset e a troca pela view."""
+    garantir_config(con)
+    if fato_em_parquet(con):
+        print(f"[INFO] fAvaliacao já está em Parquet ({diretorio_parquet(con)}).")
+        return
+    total = con.execute("SELECT COUNT(*) FROM fAvaliacao").fetchone()[0]
+    if not total:
+        raise Exception("fAvaliacao vazia: carregue dados antes de migrar para Parquet.")
+    if os.path.isdir(diretorio) and os.listdir(diretorio):
+        raise Exception(f"Diretório {diretorio} não está vazio.")
+
+    diretorio = os.path.abspath(diretorio)
+    colunas_tabela = [linha[0] for linha in con.execute("DESCRIBE fAvaliacao").fetchall()]
+    gravar_parquet(con, "fAvaliacao", colunas_tabela, colunas_fato, diretorio)
+
+    padrao = _sql_literal(os.path.join(diretorio, "*", "*", "*.parquet"))
+    gravadas = con.execute(f"SELECT COUNT(*) FROM read_parquet({padrao}, hive_partitioning = true)").fetchone()[0]
+    if gravadas != total:
+        raise Exception(f"Exportação incompleta: {gravadas} de {total} linhas.")
+
+    con.begin()
+    try:
+        con.execute("DROP TABLE fAvaliacao")
+        criar_view_fatos(con, diretorio, colunas_fato)
+        con.execute("INSERT OR REPLACE INTO configArmazenamento VALUES ('fatos_parquet', ?)", [diretorio])
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    print(f"[INFO] fAvaliacao migrada para Parquet: {total} linhas em {diretorio}.")
+
+def migrar_para_tabela(con):
+    """Volta a fAvaliacao para uma tabela no DuckDB (o dataset fica no disco)."""
+    diretorio = diretorio_parquet(con)
+    if diretorio is None:
+        print("[INFO] fAvaliacao já é uma tabela.")
+        return
+    con.begin()
+    try:
+        con.execute("CREATE TABLE fAvaliacao_tabela AS SELECT * FROM fAvaliacao")
+        con.execute("DROP VIEW fAvaliacao")
+        con.execute("ALTER TABLE fAvaliacao_tabela RENAME TO fAvaliacao")
+        con.execute("DELETE FROM configArmazenamento WHERE Chave = 'fatos_parquet'")
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    print(f"[INFO] fAvaliacao voltou a ser tabela. O dataset em {diretorio} pode ser apagado.")
+
+
+# --- RECLUSTERIZAÇÃO ---
+
+def reclusterizar_fatos(con):
+    """
+    Regrava a tabela fAvaliacao na ORDEM_FATOS. Cada upload já entra ordenado,
+    mas lotes sucessivos se intercalam; depois de muitos uploads vale rodar.
+    """
+    if fato_em_parquet(con):
+        print("[INFO] fAvaliacao em Parquet já é separada por partição: nada a reordenar.")
+        return
+    colunas = [linha[0] for linha in con.execute("DESCRIBE fAvaliacao").fetchall()]
+    con.begin()
+    try:
+        con.execute(f"CREATE TABLE fAvaliacao_ordenada AS SELECT * FROM fAvaliacao{sql_ordem_fatos(colunas)}")
+        con.execute("DROP TABLE fAvaliacao")
+        con.execute("ALTER TABLE fAvaliacao_ordenada RENAME TO fAvaliacao")
+        con.commit()
+    except Exception:
+        con.rollback()
+        raise
+    # Devolve ao arquivo o espaço da cópia antiga
+    con.execute("CHECKPOINT")
+    qtd = con.execute("SELECT COUNT(*) FROM fAvaliacao").fetchone()[0]
+    print(f"[INFO] fAvaliacao reordenada: {qtd} linhas.")
@@ -0,0 +1,281 @@
+# banco.py
+import os
+import threading
+from contextlib import contextmanager
+
+import duckdb
+
+# --- CONFIGURAÇÃO DO BANCO DE DADOS ---
+base_dir = os.path.dirname(os.path.abspath(__file__))
+if os.environ.get("HACKATHON_DB"):
+    # Banco alternativo (ex.: base sintética do sintetico.py para benchmarks)
+    DB_PATH = os.path.abspath(os.environ["HACKATHON_DB"])
+elif os.path.exists(os.path.join(base_dir, "hackathon.duckdb")):
+    DB_PATH = os.path.join(base_dir, "hackathon.duckdb")
+else:
+    # Caminho alternativo caso esteja rodando em estrutura de pastas diferente
+    DB_PATH = os.path.join(base_dir, "..", "data", "db", "hackathon.duckdb")
+    DB_PATH = os.path.abspath(DB_PATH)
+
+# Quantidade máxima de cursores emprestados ao mesmo tempo
+TAMANHO_POOL = int(os.environ.get("HACKATHON_POOL", "4"))
+# Tempo máximo (s) esperando um cursor livre antes de desistir
+TIMEOUT_POOL = float(os.environ.get("HACKATHON_POOL_TIMEOUT", "30"))
+
+
+# --- GERAÇÃO DOS DADOS ---
+# Toda escrita bem-sucedida no banco incrementa a geração. Quem guarda algo
+# derivado do banco (conexões, caches) compara com a geração atual.
+
+_geracao = 0
+_ouvintes = []
+_lock_geracao = threading.Lock()
+
+def geracao_atual():
+    return _geracao
+
+def nova_geracao():
+    """Marca o banco como alterado e avisa os ouvintes registrados."""
+    global _geracao
+    with _lock_geracao:
+        _geracao += 1
+        geracao = _geracao
+        ouvintes = list(_ouvintes)
+    for ouvinte in ouvintes:
+        try:
+            ouvinte(geracao)
+        except Exception as e:
+            print(f"[ERRO] Ouvinte de geração falhou: {e}")
+    return geracao
+
+def ao_mudar_geracao(ouvinte):
+    """Registra `ouvinte(geracao)` para ser chamado a cada nova geração."""
+    with _lock_geracao:
+        _ouvintes.append(ouvinte)
+    return ouvinte
+
+
+# --- POOL DE CONEXÕES (SOMENTE LEITURA) ---
+
+class PoolConexoes:
+    """
+    Pool limitado de cursores read-only sobre uma única instância do DuckDB.
+    Todos os cursores compartilham o mesmo cache de blocos e catálogo; a
+    instância só é reaberta quando a geração dos dados muda (ou durante uma
+    escrita(), quando ela é de leitura e escrita).
+    """
+
+    def __init__(self, caminho, tamanho=TAMANHO_POOL, timeout=TIMEOUT_POOL):
+        self.caminho = caminho
+        self.tamanho = tamanho
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._base = None
+        self._geracao_base = None
+        self._livres = []
+        self._emprestados = 0
+        self._suspenso = False
+        self._escrevendo = False  # dentro de escrita()
+        self._reabrir = False     # instância de escrita a trocar pela somente leitura
+
+    # Controle interno (sempre chamado com self._cond adquirido)
+
+    def _fechar_tudo(self):
+        for cursor in self._livres:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        self._livres = []
+        if self._base is not None:
+            try:
+                self._base.close()
+            except Exception:
+                pass
+        self._base = None
+        self._geracao_base = None
+        self._reabrir = False
+
+    def _abrir_base(self, somente_leitura=True):
+        self._base = duckdb.connect(self.caminho, read_only=somente_leitura)
+        self._geracao_base = geracao_atual()
+
+    def _base_vencida(self):
+        # A instância de escrita só é trocada quando escrita() termina
+        if self._base is None or self._escrevendo:
+            return False
+        return self._reabrir or self._geracao_base != geracao_atual()
+
+    def _pode_emprestar(self):
+        if self._suspenso:
+            return False
+        if self._base_vencida():
+            # Só recicla a instância quando ninguém estiver usando cursores antigos
+            return self._emprestados == 0
+        return bool(self._livres) or self._emprestados < self.tamanho
+
+    @staticmethod
+    def _saudavel(cursor):
+        try:
+            cursor.execute("SELECT 1").fetchone()
+            return True
+        except Exception:
+            return False
+
+    # API pública
+
+    def emprestar(self):
+        with self._cond:
+            if not self._cond.wait_for(self._pode_emprestar, timeout=self.timeout):
+                raise TimeoutError("Nenhuma conexão livre no pool do banco.")
+
+            if self._base_vencida():
+                print("[INFO] Nova geração de dados: reabrindo conexões do banco.")
+                self._fechar_tudo()
+
+            while self._livres:
+                cursor = self._livres.pop()
+                if self._saudavel(cursor):
+                    self._emprestados += 1
+                    return cursor
+                cursor.close()
+
+            if self._base is None:
+                self._abrir_base()
+            try:
+                cursor = self._base.cursor()
+            except Exception:
+                # Instância base inválida: reabre uma vez antes de desistir
+                self._fechar_tudo()
+                self._abrir_base()
+                cursor = self._base.cursor()
+            self._emprestados += 1
+            return cursor
+
+    def devolver(self, cursor):
+        with self._cond:
+            self._emprestados -= 1
+            if self._base is None or self._base_vencida() or self._suspenso:
+                cursor.close()
+            else:
+                self._livres.append(cursor)
+            self._cond.notify_all()
+
+    @contextmanager
+    def conexao(self):
+        cursor = self.emprestar()
+        try:
+            yield cursor
+        finally:
+            self.devolver(cursor)
+
+    def suspender(self):
+        """Fecha todas as conexões (ex.: para liberar o arquivo a um escritor)."""
+        with self._cond:
+            self._suspenso = True
+            if not self._cond.wait_for(lambda: self._emprestados == 0, timeout=self.timeout):
+                self._suspenso = False
+                self._cond.notify_all()
+                raise TimeoutError("Conexões do banco ainda em uso.")
+            self._fechar_tudo()
+
+    def retomar(self):
+        with self._cond:
+            self._suspenso = False
+            self._cond.notify_all()
+
+    @contextmanager
+    def suspenso(self):
+        self.suspender()
+        try:
+            yield
+        finally:
+            self.retomar()
+
+    @contextmanager
+    def escrita(self):
+        """
+        Cursor de escrita no arquivo do pool sem parar as leituras: o pool troca
+        a instância somente leitura por uma de leitura e escrita e segue
+        emprestando cursores dela. Pelo MVCC do DuckDB os leitores veem o último
+        COMMIT (a geração anterior) até o escritor terminar; só esperam nas
+        trocas de instância. Ao sair, o pool volta ao somente leitura assim que
+        os cursores emprestados forem devolvidos.
+        """
+        with self._cond:
+            self._suspenso = True
+            try:
+                if not self._cond.wait_for(lambda: self._emprestados == 0, timeout=self.timeout):
+                    raise TimeoutError("Conexões do banco ainda em uso.")
+                self._fechar_tudo()
+                self._abrir_base(somente_leitura=False)
+                escritor = self._base.cursor()
+                self._escrevendo = True
+            finally:
+                self._suspenso = False
+                self._cond.notify_all()
+        try:
+            yield escritor
+        finally:
+            escritor.close()
+            with self._cond:
+                self._escrevendo = False
+                self._reabrir = True
+                if self._emprestados == 0:
+                    self._fechar_tudo()
+                self._cond.notify_all()
+
+    def reciclar(self):
+        """Descarta as conexões ociosas; as emprestadas são fechadas na devolução."""
+        with self._cond:
+            if self._emprestados == 0 and not self._escrevendo:
+                self._fechar_tudo()
+            self._cond.notify_all()
+
+    def status(self):
+        with self._cond:
+            return {
+                "aberto": self._base is not None,
+                "livres": len(self._livres),
+                "emprestados": self._emprestados,
+                "tamanho": self.tamanho,
+                "geracao": self._geracao_base,
+                "suspenso": self._suspenso,
+                "escrita": self._escrevendo,
+            }
+
+
+pool = PoolConexoes(DB_PATH)
+
+def conexao():
+    """Empresta um cursor do pool: `with conexao() as conn: ...`."""
+    return pool.conexao()
+
+# Gancho de reabertura: cada nova geração de dados recicla o pool
+ao_mudar_geracao(lambda geracao: pool.reciclar())
+
+
+# --- TRANSAÇÕES DE ESCRITA ---
+
+_em_transacao = set()  # id() das conexões com transação aberta por transacao()
+
+@contextmanager
+def transacao(con):
+    """
+    BEGIN/COMMIT (ROLLBACK em caso de erro) na conexão de escrita. Dentro de
+    uma transação já aberta por transacao(), só participa dela: quem abriu
+    decide o commit. Assim a ingestão inteira pode ser desfeita de uma vez.
+    """
+    if id(con) in _em_transacao:
+        yield
+        return
+    con.begin()
+    _em_transacao.add(id(con))
+    try:
+        yield
+        con.commit()
+    except BaseException:
+        con.rollback()
+        raise
+    finally:
+        _em_transacao.discard(id(con))
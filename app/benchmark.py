@@ -0,0 +1,152 @@
+# benchmark.py
+# Mede as funções públicas do data.py sobre combinações de filtros e imprime
+# p50/p95 e o pico de memória em JSON. Uso:
+#   python benchmark.py --banco ../data/db/sintetico.duckdb [--repeticoes 5] [--saida resultado.json]
+# Por padrão mede sem o cache de resultados (cada chamada vai ao banco);
+# --com-cache mede as funções como o app as chama.
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+
+
+def rss_pico_mb():
+    """Pico de memória residente do processo (MB), ou None se a plataforma não informar."""
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB; macOS em bytes
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+def combinacoes_simples(data, amostras, sorteio):
+    unidades = [u for u in data.get_unidades_disponiveis() if u != "Todos"]
+    escolhidas = ["Todos"] + sorteio.sample(unidades, min(amostras, len(unidades)))
+    return [(tipo, unidade) for tipo in ("Institucional", "Cursos", "Disciplina") for unidade in escolhidas]
+
+
+def combinacoes_disciplina(data, amostras, sorteio):
+    """Do mais amplo ao mais específico: tudo, setor, setor+depto, +curso, +disciplina."""
+    combos = [("Todos", "Todos", "Todos", "Todas")]
+    estrutura = data.get_estrutura_academica()
+    if estrutura.empty:
+        return combos
+    for _ in range(amostras):
+        linha = estrutura.iloc[sorteio.randrange(len(estrutura))]
+        combos += [
+            (linha["Setor"], "Todos", "Todos", "Todas"),
+            (linha["Setor"], linha["Departamento"], "Todos", "Todas"),
+            (linha["Setor"], linha["Departamento"], linha["Curso"], "Todas"),
+            (linha["Setor"], linha["Departamento"], linha["Curso"], linha["Nome_Disciplina"]),
+        ]
+    return combos
+
+
+def medir(funcao, combos, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        for args in combos:
+            inicio = time.perf_counter()
+            funcao(*args)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+    return {
+        "execucoes": len(tempos),
+        "p50_ms": round(float(np.percentile(tempos, 50)), 3),
+        "p95_ms": round(float(np.percentile(tempos, 95)), 3),
+        "max_ms": round(max(tempos), 3),
+        "rss_pico_mb": rss_pico_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das consultas do dashboard CPA.")
+    parser.add_argument("--banco", default=os.environ.get("HACKATHON_DB"), help="Arquivo DuckDB (padrão: HACKATHON_DB ou o banco do app)")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--amostras", type=int, default=5, help="Filtros sorteados por família")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--com-cache", action="store_true", help="Mantém o cache de resultados ligado")
+    parser.add_argument("--funcoes", nargs="*", help="Mede só estas funções")
+    parser.add_argument("--saida", help="Grava o JSON neste arquivo além de imprimir")
+    args = parser.parse_args()
+
+    # O banco e o monitor são configurados na importação do data.py
+    if args.banco:
+        os.environ["HACKATHON_DB"] = args.banco
+    # Sem EXPLAIN ANALYZE automático: ele reexecutaria as consultas lentas durante a medição
+    os.environ.setdefault("HACKATHON_LIMIAR_LENTA_MS", "inf")
+
+    rss_inicial = rss_pico_mb()
+    inicio_import = time.perf_counter()
+    import data
+    import_ms = (time.perf_counter() - inicio_import) * 1000
+
+    sorteio = random.Random(args.semente)
+    simples = combinacoes_simples(data, args.amostras, sorteio)
+    disciplina = combinacoes_disciplina(data, args.amostras, sorteio)
+
+    funcoes = {
+        "get_estrutura_academica": (data.get_estrutura_academica, [()]),
+        "get_unidades_disponiveis": (data.get_unidades_disponiveis, [()]),
+        "get_eixos_sql": (data.get_eixos_sql, simples),
+        "get_donut_sql": (data.get_donut_sql, simples),
+        "get_ranking_sql": (data.get_ranking_sql, simples),
+        "get_distribuicao_sql": (data.get_distribuicao_sql, simples),
+        "get_snapshot_sql": (data.get_snapshot_sql, simples),
+        "get_eixos_sql_disciplina": (data.get_eixos_sql_disciplina, disciplina),
+        "get_donut_sql_disciplina": (data.get_donut_sql_disciplina, disciplina),
+        "get_ranking_sql_disciplina": (data.get_ranking_sql_disciplina, disciplina),
+        "get_distribuicao_sql_disciplina": (data.get_distribuicao_sql_disciplina, disciplina),
+        "get_snapshot_sql_disciplina": (data.get_snapshot_sql_disciplina, disciplina),
+        "get_tendencia_sql": (data.get_tendencia_sql, simples),
+        "get_tendencia_sql_disciplina": (data.get_tendencia_sql_disciplina, disciplina),
+    }
+    if args.funcoes:
+        funcoes = {nome: funcoes[nome] for nome in args.funcoes}
+
+    resultados = {}
+    for nome, (funcao, combos) in funcoes.items():
+        if not args.com_cache:
+            # @cacheado usa functools.wraps: __wrapped__ é a função original
+            funcao = getattr(funcao, "__wrapped__", funcao)
+        resultados[nome] = medir(funcao, combos, args.repeticoes)
+        resultados[nome]["combinacoes"] = len(combos)
+        print(f"[INFO] {nome}: p50 {resultados[nome]['p50_ms']} ms, p95 {resultados[nome]['p95_ms']} ms", file=sys.stderr)
+
+    with data.conexao() as conn:
+        linhas_fato = conn.execute("SELECT COUNT(*) FROM fAvaliacao").fetchone()[0]
+
+    relatorio = {
+        "banco": data.DB_PATH,
+        "linhas_fato": linhas_fato,
+        "repeticoes": args.repeticoes,
+        "com_cache": args.com_cache,
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "import_data_ms": round(import_ms, 3),
+        "rss_inicial_mb": rss_inicial,
+        "rss_pico_mb": rss_pico_mb(),
+        "funcoes": resultados,
+    }
+    if args.com_cache:
+        relatorio["cache"] = data.estatisticas_cache()
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    print(texto)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto)
+
+
+if __name__ == "__main__":
+    main()
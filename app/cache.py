@@ -0,0 +1,212 @@
+# cache.py
+import functools
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from banco import geracao_atual, ao_mudar_geracao
+
+# Limites padrão do cache de resultados
+CACHE_MAX_ITENS = int(os.environ.get("HACKATHON_CACHE_ITENS", "256"))
+CACHE_TTL = float(os.environ.get("HACKATHON_CACHE_TTL", "300"))
+# Limite, em MB, do cache de gráficos renderizados (PNG)
+CACHE_IMAGENS_MB = float(os.environ.get("HACKATHON_CACHE_IMAGENS_MB", "64"))
+
+
+class CacheResultados:
+    """
+    Cache LRU com TTL para resultados de consultas. Cada entrada lembra a
+    geração do banco em que foi calculada; depois de uma ingestão ela deixa
+    de valer. Os valores são compartilhados entre sessões: trate-os como
+    somente leitura.
+    """
+
+    def __init__(self, max_itens=CACHE_MAX_ITENS, ttl=CACHE_TTL):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._itens = OrderedDict()  # chave -> (geracao, expira_em, valor)
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+        self.descartes = 0
+        self.expirados = 0
+        self.invalidados = 0
+
+    def obter(self, chave):
+        """Retorna (True, valor) se houver entrada válida, senão (False, None)."""
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self.faltas += 1
+                return False, None
+            geracao, expira_em, valor = item
+            if geracao != geracao_atual():
+                del self._itens[chave]
+                self.invalidados += 1
+                self.faltas += 1
+                return False, None
+            if time.monotonic() > expira_em:
+                del self._itens[chave]
+                self.expirados += 1
+                self.faltas += 1
+                return False, None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return True, valor
+
+    def guardar(self, chave, valor, geracao):
+        with self._lock:
+            if geracao != geracao_atual():
+                # O banco mudou enquanto a consulta rodava; não guarda resultado velho
+                return
+            self._itens[chave] = (geracao, time.monotonic() + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self.descartes += 1
+
+    def limpar(self):
+        with self._lock:
+            self.invalidados += len(self._itens)
+            self._itens.clear()
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.acertos + self.faltas
+            return {
+                "itens": len(self._itens),
+                "max_itens": self.max_itens,
+                "ttl": self.ttl,
+                "acertos": self.acertos,
+                "faltas": self.faltas,
+                "taxa_acerto": self.acertos / consultas if consultas else 0.0,
+                "descartes": self.descartes,
+                "expirados": self.expirados,
+                "invalidados": self.invalidados,
+            }
+
+
+cache_resultados = CacheResultados()
+
+# Uma nova geração de dados esvazia o cache de uma vez (libera memória cedo)
+ao_mudar_geracao(lambda geracao: cache_resultados.limpar())
+
+
+def cacheado(escopo):
+    """
+    Memoiza a função pela chave (nome, escopo, filtros). Exceções não são
+    guardadas, então a próxima chamada tenta de novo.
+    """
+    def decorador(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            chave = (func.__name__, escopo, args, tuple(sorted(kwargs.items())))
+            achou, valor = cache_resultados.obter(chave)
+            if achou:
+                return valor
+            geracao = geracao_atual()
+            valor = func(*args, **kwargs)
+            cache_resultados.guardar(chave, valor, geracao)
+            return valor
+        return wrapper
+    return decorador
+
+
+# --- CACHE DE GRÁFICOS RENDERIZADOS ---
+
+def _alimentar(h, valor):
+    """Serializa o payload no hash sem ambiguidade (tipo + conteúdo)."""
+    if isinstance(valor, dict):
+        h.update(b"{%d" % len(valor))
+        for chave in sorted(valor, key=str):
+            _alimentar(h, chave)
+            _alimentar(h, valor[chave])
+    elif isinstance(valor, (list, tuple)):
+        h.update(b"[%d" % len(valor))
+        for item in valor:
+            _alimentar(h, item)
+    elif hasattr(valor, "dtype") and hasattr(valor, "shape"):
+        import numpy as np
+
+        h.update(f"a{valor.dtype.str}{valor.shape}".encode())
+        if valor.dtype.hasobject:
+            # Arrays de objetos (rótulos) guardam ponteiros: usa o conteúdo
+            _alimentar(h, valor.tolist())
+        else:
+            h.update(np.ma.getdata(valor).tobytes())
+            if np.ma.is_masked(valor):
+                h.update(np.ma.getmaskarray(valor).tobytes())
+    else:
+        h.update(f"{type(valor).__name__}:{valor!r};".encode())
+
+
+def impressao_payload(*partes):
+    """Hash estável de (tipo do gráfico, payload, tamanho, DPI) para o cache de imagens."""
+    h = hashlib.blake2b(digest_size=16)
+    for parte in partes:
+        _alimentar(h, parte)
+    return h.hexdigest()
+
+
+class CacheImagens:
+    """
+    LRU de gráficos já renderizados, limitado pelo total de bytes. A chave
+    é a impressão do payload, então a mesma imagem serve a qualquer sessão
+    e não depende da geração dos dados (payload novo, chave nova).
+    """
+
+    def __init__(self, max_bytes=int(CACHE_IMAGENS_MB * 1024 * 1024)):
+        self.max_bytes = max_bytes
+        self._itens = OrderedDict()  # chave -> PNG em data URI (str)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+        self.descartes = 0
+
+    def obter(self, chave):
+        with self._lock:
+            imagem = self._itens.get(chave)
+            if imagem is None:
+                self.faltas += 1
+                return None
+            self._itens.move_to_end(chave)
+            self.acertos += 1
+            return imagem
+
+    def guardar(self, chave, imagem):
+        with self._lock:
+            if len(imagem) > self.max_bytes:
+                return
+            antigo = self._itens.pop(chave, None)
+            if antigo is not None:
+                self._bytes -= len(antigo)
+            self._itens[chave] = imagem
+            self._bytes += len(imagem)
+            while self._bytes > self.max_bytes:
+                _, descartado = self._itens.popitem(last=False)
+                self._bytes -= len(descartado)
+                self.descartes += 1
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._bytes = 0
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.acertos + self.faltas
+            return {
+                "itens": len(self._itens),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "acertos": self.acertos,
+                "faltas": self.faltas,
+                "taxa_acerto": self.acertos / consultas if consultas else 0.0,
+                "descartes": self.descartes,
+            }
+
+
+cache_imagens = CacheImagens()
@@ -0,0 +1,163 @@
+# cache_planilhas.py
+# Cache local das planilhas já convertidas. As abas lidas e validadas por
+# ingestao.preparar_excel ficam em Parquet numa pasta por conteúdo do arquivo
+# (hash dos bytes + formato da leitura): reenviar o mesmo Excel, ou auditá-lo
+# no checagem.py, pula o openpyxl. As entradas usadas há mais tempo saem
+# quando a pasta passa de HACKATHON_CACHE_PLANILHAS_MB.
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import duckdb
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+DIR_CACHE_PLANILHAS = os.environ.get(
+    "HACKATHON_CACHE_PLANILHAS",
+    os.path.abspath(os.path.join(base_dir, "..", "data", "cache", "planilhas")),
+)
+CACHE_PLANILHAS_MB = float(os.environ.get("HACKATHON_CACHE_PLANILHAS_MB", "512"))
+
+# Escrito por último: uma pasta sem ele é uma entrada incompleta
+MANIFESTO = "linhas.json"
+
+
+def _sql_literal(texto):
+    return "'" + texto.replace("'", "''") + "'"
+
+def impressao_arquivo(caminho, formato=""):
+    """Hash do conteúdo do arquivo (lido em blocos) junto com o `formato` da conversão."""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(formato.encode("utf-8"))
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+def _pasta(chave):
+    return os.path.join(DIR_CACHE_PLANILHAS, chave)
+
+
+# --- LEITURA ---
+
+def obter(chave):
+    """{tabela: linhas} da entrada, ou None se a planilha não está no cache."""
+    manifesto = os.path.join(_pasta(chave), MANIFESTO)
+    try:
+        with open(manifesto, encoding="utf-8") as f:
+            linhas = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not all(os.path.exists(os.path.join(_pasta(chave), f"{tabela}.parquet")) for tabela in linhas):
+        return None
+    try:
+        os.utime(manifesto)  # marca o uso (ordem de despejo)
+    except OSError:
+        pass
+    return linhas
+
+def carregar(chave, destino):
+    """
+    Recria as tabelas da entrada no DuckDB de preparação `destino`, como
+    preparar_excel faria. Retorna {tabela: linhas}, ou None se não houver entrada.
+    """
+    linhas = obter(chave)
+    if linhas is None:
+        return None
+    con = duckdb.connect(destino)
+    try:
+        for tabela in linhas:
+            arquivo = os.path.join(_pasta(chave), f"{tabela}.parquet")
+            con.execute(f'CREATE TABLE "{tabela}" AS SELECT * FROM read_parquet({_sql_literal(arquivo)})')
+    finally:
+        con.close()
+    print(f"[INFO] Planilha carregada do cache ({chave[:12]}): {sum(linhas.values())} linhas.")
+    return linhas
+
+
+# --- ESCRITA ---
+
+def guardar(chave, partes):
+    """
+    Grava a entrada a partir dos arquivos de preparação `partes` (lista de
+    (arquivo, [tabelas])). A pasta é montada ao lado e renomeada no fim, então
+    leitores nunca veem uma entrada pela metade. Falhas só são registradas.
+    """
+    if obter(chave) is not None:
+        return
+    temporaria = None
+    try:
+        os.makedirs(DIR_CACHE_PLANILHAS, exist_ok=True)
+        temporaria = tempfile.mkdtemp(prefix=f".{chave[:12]}_", dir=DIR_CACHE_PLANILHAS)
+        linhas = {}
+        con = duckdb.connect()
+        try:
+            for i, (arquivo, tabelas) in enumerate(partes):
+                con.execute(f"ATTACH {_sql_literal(arquivo)} AS parte{i} (READ_ONLY)")
+                for tabela in tabelas:
+                    saida = os.path.join(temporaria, f"{tabela}.parquet")
+                    con.execute(f'COPY (SELECT * FROM parte{i}."{tabela}") TO {_sql_literal(saida)} (FORMAT PARQUET)')
+                    linhas[tabela] = con.execute(f'SELECT COUNT(*) FROM parte{i}."{tabela}"').fetchone()[0]
+                con.execute(f"DETACH parte{i}")
+        finally:
+            con.close()
+        with open(os.path.join(temporaria, MANIFESTO), "w", encoding="utf-8") as f:
+            json.dump(linhas, f)
+        if obter(chave) is None:  # outro trabalho pode ter gravado a mesma planilha
+            os.rename(temporaria, _pasta(chave))
+            temporaria = None
+    except Exception as e:
+        print(f"[ERRO] Falha ao gravar planilha no cache: {e}")
+        return
+    finally:
+        if temporaria:
+            shutil.rmtree(temporaria, ignore_errors=True)
+    despejar()
+
+
+# --- LIMITE DE TAMANHO ---
+
+def _entradas():
+    """(pasta, bytes, último uso) de cada entrada completa."""
+    entradas = []
+    try:
+        nomes = os.listdir(DIR_CACHE_PLANILHAS)
+    except OSError:
+        return entradas
+    for nome in nomes:
+        pasta = os.path.join(DIR_CACHE_PLANILHAS, nome)
+        manifesto = os.path.join(pasta, MANIFESTO)
+        if nome.startswith(".") or not os.path.exists(manifesto):
+            continue
+        try:
+            tamanho = sum(e.stat().st_size for e in os.scandir(pasta))
+            entradas.append((pasta, tamanho, os.path.getmtime(manifesto)))
+        except OSError:
+            continue
+    return entradas
+
+def despejar(limite_mb=CACHE_PLANILHAS_MB):
+    """Remove as entradas usadas há mais tempo até a pasta caber em `limite_mb`."""
+    entradas = sorted(_entradas(), key=lambda e: e[2])
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    limite = limite_mb * 2**20
+    removidas = 0
+    for pasta, tamanho, _ in entradas:
+        if total <= limite:
+            break
+        shutil.rmtree(pasta, ignore_errors=True)
+        total -= tamanho
+        removidas += 1
+    if removidas:
+        print(f"[INFO] Cache de planilhas: {removidas} entradas removidas ({total / 2**20:.1f} MB restantes).")
+    return removidas
+
+def estatisticas():
+    entradas = _entradas()
+    return {
+        "entradas": len(entradas),
+        "bytes": sum(tamanho for _, tamanho, _ in entradas),
+        "max_bytes": int(CACHE_PLANILHAS_MB * 2**20),
+        "diretorio": DIR_CACHE_PLANILHAS,
+    }
@@ -1,8 +1,10 @@
-import pandas as pd
 import duckdb
 import glob
 import os
 
+import cache_planilhas
+from ingestao import sql_mapa_respostas, abrir_excel, contar_linhas, chave_planilha
+
 # CONFIGURAÇÃO
 CAMINHO_DADOS = "./data/dados_revisados"
 CAMINHO_DB = "data/db/hackathon.duckdb"
@@ -23,15 +25,21 @@ total_linhas_excel = 0
 print("Contando linhas nos arquivos Excel originais (isso pode levar alguns segundos)...")
 for arquivo in arquivos:
     try:
-        xls = pd.ExcelFile(arquivo)
-        for nome_aba in xls.sheet_names:
-            # Ignora abas vazias ou de metadados se houver
-            df = pd.read_excel(xls, sheet_name=nome_aba)
+        # Planilha já convertida num upload: a contagem da aba de fatos está no cache
+        linhas = cache_planilhas.obter(chave_planilha(arquivo))
+        if linhas is not None:
+            total_linhas_excel += linhas.get("fAvaliacao", 0)
+            print(f"{os.path.basename(arquivo)}: contagem do cache de planilhas")
+            continue
+        # Leitura em streaming (somente leitura): conta as linhas sem montar DataFrames
+        wb = abrir_excel(arquivo)
+        for ws in wb.worksheets:
             # Somamos apenas abas que parecem ser de Fato (Avaliações)
             # Ajuste a lógica se necessário. Assumindo que abas com 'avalia' ou 'fato' são as respostas.
             # Se você quiser contar TUDO, remova o if.
-            if 'avalia' in nome_aba.lower() or 'fato' in nome_aba.lower(): 
-                 total_linhas_excel += len(df)
+            if 'avalia' in ws.title.lower() or 'fato' in ws.title.lower(): 
+                 total_linhas_excel += contar_linhas(ws)
+        wb.close()
     except Exception as e:
         print(f"Erro ao ler {arquivo}: {e}")
 
@@ -47,7 +55,7 @@ print(f"Diferença: {diff} {match_symbol}")
 
 if diff != 0:
     print("⚠️ ALERTA: Se a diferença for positiva, o ETL perdeu dados. Se for negativa, duplicou.")
-    print("   (Nota: Se você filtrou duplicatas exatas no ETL, uma pequena perda é esperada e correta).")
+    print("   (Nota: o ETL ignora linhas repetidas pela chave natural (ingestao.CHAVES_NATURAIS), então uma pequena perda é esperada e correta).")
 
 # ==============================================================================
 # PROVA 2: INTEGRIDADE REFERENCIAL (CAÇA AOS FANTASMAS)
@@ -92,22 +100,22 @@ checar_orfaos('fAvaliacao', 'ID_Pergunta', 'dPergunta', 'ID_Pergunta', 'Pergunta
 # ==============================================================================
 print("\n--- 3. CHECAGEM DE DOMÍNIO (TEXTO DAS RESPOSTAS) ---")
 
-# Vamos ver o que NÃO está sendo capturado pelo seu CASE WHEN do gráfico anterior
-query_validacao_texto = """
+# Vamos ver o que NÃO está sendo capturado pelo dicionário de respostas
+# (ingestao.MAPA_RESPOSTAS, o mesmo que gera a dResposta e a coluna Classe)
+query_validacao_texto = f"""
     SELECT 
-        Resposta,
+        f.Resposta,
         COUNT(*) as Qtd,
-        CASE 
-            WHEN Resposta ILIKE '%Concordo Totalmente%' THEN 'Capturado (5)'
-            WHEN Resposta ILIKE '%Concordo%' AND Resposta NOT ILIKE '%Totalmente%' THEN 'Capturado (4)'
-            WHEN Resposta ILIKE '%Neutro%' THEN 'Capturado (3)'
-            WHEN Resposta ILIKE '%Discordo%' AND Resposta NOT ILIKE '%Totalmente%' THEN 'Capturado (2)'
-            WHEN Resposta ILIKE '%Discordo Totalmente%' THEN 'Capturado (1)'
+        CASE m.Classe
+            WHEN 1 THEN 'Capturado (Concordo)'
+            WHEN 0 THEN 'Capturado (Neutro)'
+            WHEN -1 THEN 'Capturado (Discordo)'
             ELSE '⚠️ NÃO CAPTURADO (NULL)' 
         END as Status_Validacao
-    FROM fAvaliacao
-    WHERE Resposta IS NOT NULL
-    GROUP BY Resposta, Status_Validacao
+    FROM fAvaliacao f
+    LEFT JOIN {sql_mapa_respostas()} m ON TRIM(f.Resposta) = m.Resposta
+    WHERE f.Resposta IS NOT NULL
+    GROUP BY f.Resposta, Status_Validacao
     ORDER BY Status_Validacao DESC, Qtd DESC
 """
 
@@ -118,7 +126,7 @@ print(df_validacao)
 nao_capturados = df_validacao[df_validacao['Status_Validacao'].str.contains('NÃO CAPTURADO')]
 if not nao_capturados.empty:
     print("\n🚨 PERIGO: Existem variações de texto que seu gráfico está ignorando!")
-    print("Isso distorce a média. Adicione essas variações no CASE WHEN do seu código de gráfico.")
+    print("Isso distorce a média. Adicione essas variações em MAPA_RESPOSTAS (ingestao.py).")
 else:
     print("\n✅ Todas as variações de resposta conhecidas estão mapeadas.")
 
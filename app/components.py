@@ -21,6 +21,7 @@ def render_sidebar_nav():
         tags.nav(tags.ul(
             tags.li(ui.input_action_button("nav_home", "Painel Principal", class_="btn-nav-custom")),
             tags.li(ui.input_action_button("nav_upload", "Upload de Dados", class_="btn-nav-custom")), 
+            tags.li(ui.input_action_button("nav_admin", "Monitor de Consultas", class_="btn-nav-custom")), 
             tags.li(ui.input_action_button("nav_inst", "Institucional", class_="btn-nav-custom")), 
             tags.li(ui.input_action_button("nav_cursos", "Cursos", class_="btn-nav-custom")), 
             tags.li(ui.input_action_button("nav_disc", "Disciplinas", class_="btn-nav-custom"))
@@ -42,30 +43,59 @@ def card_excelencia_ui(media):
         class_=f"excellence-card {cor}"
     )
 
-def lista_kpis_ui(lista_dados, ordem):
-    """Gera a lista de cards/KPIs ordenada."""
-    if not lista_dados: return tags.div("Sem dados para exibir.", style="padding: 20px; color: #666;")
+def lista_kpis_ui(eixos, ordem):
+    """Gera a lista de cards/KPIs ordenada a partir do payload colunar dos eixos."""
+    if not len(eixos['eixo']): return tags.div("Sem dados para exibir.", style="padding: 20px; color: #666;")
     
-    lista_final = sorted(lista_dados, key=lambda x: x['score'], reverse=(ordem == "desc"))
+    # O payload já vem em ordem decrescente de nota
+    indices = range(len(eixos['eixo']))
+    if ordem != "desc": indices = reversed(indices)
     html = []
-    for item in lista_final:
+    for i in indices:
         html.append(tags.div(
-            tags.span(item['peso_info']['label'], class_=f"badge-weight {item['peso_info']['class']}"), 
-            tags.div(item['eixo'], class_="kpi-title"), 
-            tags.div(str(item['score']), class_="kpi-score"), 
-            tags.div(tags.i(class_=f"fa-solid {item['icon']}"), "Pontuação", class_="kpi-footer"), 
-            class_=f"kpi-card {item['class']}"
+            tags.span(eixos['peso_label'][i], class_=f"badge-weight {eixos['peso_class'][i]}"), 
+            tags.div(eixos['eixo'][i], class_="kpi-title"), 
+            tags.div(str(eixos['score'][i]), class_="kpi-score"), 
+            tags.div(tags.i(class_=f"fa-solid {eixos['icon'][i]}"), "Pontuação", class_="kpi-footer"), 
+            class_=f"kpi-card {eixos['class'][i]}"
         ))
     return tags.div(html, class_="scroll-container")
 
+def tabela_variacoes_ui(entidades, limite=8):
+    """Entidades com maior variação (em pontos) entre os dois últimos anos com nota."""
+    variacoes = [(label, serie) for label, serie in entidades.items() if len(serie['ano']) >= 2]
+    if not variacoes: return tags.div("Sem anos anteriores para comparar.", style="padding: 20px; color: #666;")
+
+    variacoes.sort(key=lambda v: abs(v[1]['delta'][-1]), reverse=True)
+    linhas = []
+    for label, serie in variacoes[:limite]:
+        delta = int(serie['delta'][-1])
+        cor = "text-green" if delta > 0 else ("text-red" if delta < 0 else "")
+        linhas.append(tags.tr(
+            tags.td(label),
+            tags.td(f"{serie['score'][-2]} ({serie['ano'][-2]})"),
+            tags.td(f"{serie['score'][-1]} ({serie['ano'][-1]})"),
+            tags.td(f"{delta:+d}", class_=cor, style="font-weight: bold;"),
+        ))
+    return tags.table(
+        tags.thead(tags.tr(tags.th("Entidade"), tags.th("Antes"), tags.th("Depois"), tags.th("Variação"))),
+        tags.tbody(*linhas),
+        class_="table table-sm"
+    )
+
 def criar_filtro_simples(prefixo):
-    """Cria o filtro padrão (Unidade) para Inst e Cursos."""
+    """Cria o filtro padrão (Unidade e Ano) para Inst e Cursos."""
     return tags.div(
         tags.div(
             tags.label("Unidade", style="font-weight: 500; font-size: 12px;"),
             ui.input_select(f"{prefixo}_campus", label=None, choices=[], width="200px"),
             style="display:flex; flex-direction:column;"
         ),
+        tags.div(
+            tags.label("Ano", style="font-weight: 500; font-size: 12px;"),
+            ui.input_select(f"{prefixo}_ano", label=None, choices=["Todos"], width="120px"),
+            style="display:flex; flex-direction:column;"
+        ),
         tags.div(
             ui.input_action_button(f"{prefixo}_btn_filtrar", "Atualizar Dados", class_="btn-primary"),
             style="padding-bottom: 5px;"
@@ -100,6 +130,11 @@ def criar_filtro_disciplinas():
                 ui.input_select("disc_disciplina", label=None, choices=[], width="100%"),
                 style="flex: 1;"
             ),
+            tags.div(
+                tags.label("Ano", style="font-weight: 500; font-size: 12px;"),
+                ui.input_select("disc_ano", label=None, choices=["Todos"], width="100%"),
+                style="flex: 0 0 120px;"
+            ),
             style="display:flex; gap: 15px; width: 100%; margin-top: 10px;"
         ),
         tags.div(
@@ -0,0 +1,214 @@
+# cubo.py
+# Agregado materializado (aggAvaliacao) que os dashboards leem no lugar da
+# fAvaliacao. Cada linha guarda as contagens de um nó num ano
+# (Ano, TipoPergunta, SiglaLotação, Cod_Curso, Cod_Disciplina[, GrupoDePergunta]),
+# então o custo de uma consulta depende do número de grupos, não de respostas.
+# Consultas sem filtro de ano somam os anos; séries históricas leem o mesmo cubo.
+from banco import transacao
+
+# --- CÓDIGO DO TIPO DE PESQUISA ---
+# Os painéis filtram por família de pesquisa. Em vez de LIKE '%...%' sobre o
+# texto (que não usa zone maps), o cubo guarda um código inteiro calculado
+# uma vez no build, com a mesma regra de substring de antes.
+CODIGOS_TIPO = {"Institucional": 1, "Curso": 2, "Disciplina": 3}
+TIPO_OUTRO = 0
+
+def sql_codigo_tipo(coluna):
+    casos = " ".join(f"WHEN {coluna} LIKE '%{nome}%' THEN {codigo}" for nome, codigo in CODIGOS_TIPO.items())
+    return f"CASE {casos} ELSE {TIPO_OUTRO} END"
+
+def codigo_tipo(tipo_pergunta):
+    """Código do filtro do painel ("Institucional", "Cursos"...); None se não houver família."""
+    for nome, codigo in CODIGOS_TIPO.items():
+        if nome in tipo_pergunta or tipo_pergunta in nome:
+            return codigo
+    return None
+
+# --- DIMENSÕES (UMA LINHA POR CHAVE) ---
+# As abas de dimensão são reenviadas a cada upload; juntar direto nelas
+# multiplicaria as respostas.
+
+# O mesmo código de TipoPergunta tem eixos diferentes em cada família de
+# pesquisa (ex.: DsAO nos Cursos e nas Disciplinas): a dTipoPergunta guarda a
+# família (TipoCod) e o eixo sai por (pergunta, família). Linhas sem família
+# (bases anteriores a ela) valem para as famílias sem linha própria.
+DIM_EIXO = f"""(
+    SELECT p.ID_Pergunta, t.TipoCod,
+           COALESCE(MIN(tp.GrupoDePergunta) FILTER (WHERE tp.TipoCod = t.TipoCod),
+                    MIN(tp.GrupoDePergunta) FILTER (WHERE tp.TipoCod IS NULL)) AS GrupoDePergunta
+    FROM dPergunta p
+    JOIN dTipoPergunta tp ON p.TipoPergunta = tp.TipoPergunta
+    CROSS JOIN (VALUES {", ".join(f"({codigo})" for codigo in [TIPO_OUTRO, *CODIGOS_TIPO.values()])}) t(TipoCod)
+    GROUP BY p.ID_Pergunta, t.TipoCod
+)"""
+DIM_UNIDADE = "(SELECT SiglaLotação, MIN(UnidadeGestora) AS UnidadeGestora FROM dUnidade GROUP BY SiglaLotação)"
+DIM_CURSO = "(SELECT Cod_Curso, MIN(Curso) AS Curso, MIN(Setor_Curso) AS Setor_Curso FROM dCurso GROUP BY Cod_Curso)"
+# A mesma disciplina é oferecida a vários cursos (de setores diferentes): a
+# chave é o par, e o cubo liga pelo Cod_Curso da própria avaliação
+DIM_DISCIPLINA = """(
+    SELECT Cod_Disciplina, Cod_Curso, MIN(Nome_Disciplina) AS Nome_Disciplina,
+           MIN(Departamento) AS Departamento
+    FROM dDisciplina
+    GROUP BY Cod_Disciplina, Cod_Curso
+)"""
+# Condição de junção do cubo (alias a) com DIM_DISCIPLINA (alias d)
+JUNCAO_DISCIPLINA = "a.Cod_Disciplina = d.Cod_Disciplina AND a.Cod_Curso = d.Cod_Curso"
+
+# --- CUBO ---
+
+# Valores da coluna Nivel (GROUPING do eixo)
+NIVEL_EIXO = 0   # linha por eixo (GrupoDePergunta preenchido; NULL = pergunta sem eixo)
+NIVEL_TOTAL = 1  # linha com o total do nó, sem quebra por eixo
+
+CHAVES_CUBO = ["Ano", "TipoPergunta", "SiglaLotação", "Cod_Curso", "Cod_Disciplina"]
+# Tipo de cada chave no cubo (as demais são VARCHAR)
+TIPOS_CHAVE = {"Ano": "INTEGER"}
+
+# Ordem física do cubo: filtros por tipo/unidade/curso leem poucos row groups
+# (os anos de um mesmo nó ficam lado a lado)
+ORDEM_CUBO = ["TipoCod", "SiglaLotação", "Cod_Curso", "Cod_Disciplina", "Ano"]
+
+def _sql_agregacao(where_clause="1=1"):
+    return f"""
+        SELECT
+            GROUPING(e.GrupoDePergunta) AS Nivel,
+            {sql_codigo_tipo("f.TipoPergunta")} AS TipoCod,
+            TRY_CAST(f.Ano AS INTEGER) AS Ano,
+            f.TipoPergunta,
+            f.SiglaLotação,
+            f.Cod_Curso,
+            f.Cod_Disciplina,
+            e.GrupoDePergunta,
+            COUNT(*) AS Total,
+            COUNT(*) FILTER (WHERE f.Classe = 1) AS Concordo,
+            COUNT(*) FILTER (WHERE f.Classe = 0) AS Neutro,
+            COUNT(*) FILTER (WHERE f.Classe = -1) AS Discordo
+        FROM fAvaliacao f
+        LEFT JOIN {DIM_EIXO} e
+          ON f.ID_Pergunta = e.ID_Pergunta AND e.TipoCod = {sql_codigo_tipo("f.TipoPergunta")}
+        WHERE {where_clause}
+        GROUP BY GROUPING SETS (
+            (f.Ano, f.TipoPergunta, f.SiglaLotação, f.Cod_Curso, f.Cod_Disciplina, e.GrupoDePergunta),
+            (f.Ano, f.TipoPergunta, f.SiglaLotação, f.Cod_Curso, f.Cod_Disciplina)
+        )
+    """
+
+COLUNAS_CUBO = ["Nivel", "TipoCod", *CHAVES_CUBO, "GrupoDePergunta", "Total", "Concordo", "Neutro", "Discordo"]
+
+def _sql_inserir(selecao, ordenar=False):
+    colunas = ", ".join(f'"{col}"' for col in COLUNAS_CUBO)
+    ordem = f" ORDER BY {', '.join(ORDEM_CUBO)}" if ordenar else ""
+    return f"INSERT INTO aggAvaliacao ({colunas}) SELECT * FROM ({selecao}){ordem}"
+
+def _sql_mesmo_no(tabela_chaves, alias):
+    # Chaves podem ser NULL (ex.: Cod_Disciplina na pesquisa institucional)
+    condicoes = " AND ".join(f'k."{col}" IS NOT DISTINCT FROM {alias}."{col}"' for col in CHAVES_CUBO)
+    return f"EXISTS (SELECT 1 FROM {tabela_chaves} k WHERE {condicoes})"
+
+def garantir_cubo(con):
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS aggAvaliacao (
+            Nivel TINYINT,
+            TipoCod TINYINT,
+            Ano INTEGER,
+            TipoPergunta VARCHAR,
+            SiglaLotação VARCHAR,
+            Cod_Curso VARCHAR,
+            Cod_Disciplina VARCHAR,
+            GrupoDePergunta VARCHAR,
+            Total BIGINT,
+            Concordo BIGINT,
+            Neutro BIGINT,
+            Discordo BIGINT
+        )
+    """)
+    # Família de cada tipo de pergunta (DIM_EIXO); bases antigas ficam sem família
+    con.execute("ALTER TABLE dTipoPergunta ADD COLUMN IF NOT EXISTS TipoCod TINYINT")
+    # Cubos criados antes do TipoCod ganham a coluna já preenchida
+    con.execute("ALTER TABLE aggAvaliacao ADD COLUMN IF NOT EXISTS TipoCod TINYINT")
+    con.execute(f"UPDATE aggAvaliacao SET TipoCod = {sql_codigo_tipo('TipoPergunta')} WHERE TipoCod IS NULL")
+    # Cubos sem o Ano não têm como ser quebrados por ano: são esvaziados e o
+    # próximo refresh (atualizar_cubo/reconstruir_cubo) os recalcula inteiros
+    tem_ano = con.execute("""
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_name = 'aggAvaliacao' AND column_name = 'Ano'
+    """).fetchone()[0]
+    if not tem_ano:
+        con.execute("ALTER TABLE aggAvaliacao ADD COLUMN Ano INTEGER")
+        con.execute("DELETE FROM aggAvaliacao")
+        print("[INFO] Cubo sem a coluna Ano: será reconstruído.")
+
+def reconstruir_cubo(con):
+    """Recalcula o cubo inteiro a partir da fAvaliacao, já na ORDEM_CUBO."""
+    garantir_cubo(con)
+    with transacao(con):
+        con.execute("DELETE FROM aggAvaliacao")
+        con.execute(_sql_inserir(_sql_agregacao(), ordenar=True))
+    qtd = con.execute("SELECT COUNT(*) FROM aggAvaliacao").fetchone()[0]
+    print(f"[INFO] Cubo reconstruído: {qtd} grupos.")
+
+def atualizar_cubo(con, tabela_chaves):
+    """
+    Recalcula só os nós presentes em `tabela_chaves` (colunas de CHAVES_CUBO),
+    tipicamente as chaves distintas do lote recém-inserido.
+    """
+    garantir_cubo(con)
+    if con.execute("SELECT COUNT(*) FROM aggAvaliacao").fetchone()[0] == 0:
+        reconstruir_cubo(con)
+        return
+
+    # Tipos e anos do lote como literais: com a fAvaliacao em Parquet
+    # (armazenamento.py) o filtro poda as partições que o lote não tocou
+    filtro_fato = _sql_mesmo_no(tabela_chaves, 'f')
+    tipos = [linha[0] for linha in con.execute(f"SELECT DISTINCT TipoPergunta FROM {tabela_chaves}").fetchall()]
+    if tipos and None not in tipos:
+        literais = ", ".join("'" + tipo.replace("'", "''") + "'" for tipo in tipos)
+        filtro_fato = f"f.TipoPergunta IN ({literais}) AND {filtro_fato}"
+    anos = [linha[0] for linha in con.execute(f"SELECT DISTINCT Ano FROM {tabela_chaves}").fetchall()]
+    if anos and None not in anos:
+        filtro_fato = f"f.Ano IN ({', '.join(str(int(ano)) for ano in anos)}) AND {filtro_fato}"
+
+    with transacao(con):
+        con.execute(f"DELETE FROM aggAvaliacao a WHERE {_sql_mesmo_no(tabela_chaves, 'a')}")
+        con.execute(_sql_inserir(_sql_agregacao(filtro_fato)))
+    qtd = con.execute(f"SELECT COUNT(*) FROM {tabela_chaves}").fetchone()[0]
+    print(f"[INFO] Cubo atualizado: {qtd} nós recalculados.")
+
+
+# --- EIXOS ALTERADOS POR UMA INGESTÃO ---
+# O eixo de cada pergunta vem das dimensões (DIM_EIXO): um upload que muda a
+# dPergunta ou a dTipoPergunta altera nós do cubo sem fatos novos no lote.
+
+def sql_chaves_no(origem):
+    """SELECT DISTINCT das chaves do cubo (CHAVES_CUBO, já tipadas) presentes em `origem`."""
+    chaves = ", ".join(f'TRY_CAST("{col}" AS {TIPOS_CHAVE.get(col, "VARCHAR")}) AS "{col}"' for col in CHAVES_CUBO)
+    return f"SELECT DISTINCT {chaves} FROM {origem}"
+
+def guardar_eixos(con):
+    """Foto do eixo de cada pergunta, tirada antes de mexer nas dimensões."""
+    con.execute(f"CREATE OR REPLACE TEMP TABLE eixos_antes AS SELECT * FROM {DIM_EIXO}")
+
+def marcar_eixos_alterados(con, tabela_chaves):
+    """
+    Acrescenta a `tabela_chaves` os nós com fatos de perguntas que mudaram de
+    eixo desde guardar_eixos() (só os da família de pesquisa em que mudaram).
+    Retorna quantos pares (pergunta, família) mudaram.
+    """
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE perguntas_alteradas AS
+        SELECT COALESCE(a.ID_Pergunta, d.ID_Pergunta) AS ID_Pergunta, COALESCE(a.TipoCod, d.TipoCod) AS TipoCod
+        FROM eixos_antes a
+        FULL OUTER JOIN {DIM_EIXO} d ON a.ID_Pergunta = d.ID_Pergunta AND a.TipoCod = d.TipoCod
+        WHERE a.GrupoDePergunta IS DISTINCT FROM d.GrupoDePergunta
+    """)
+    qtd = con.execute("SELECT COUNT(*) FROM perguntas_alteradas").fetchone()[0]
+    if qtd:
+        fatos = f"""fAvaliacao f WHERE EXISTS (
+            SELECT 1 FROM perguntas_alteradas p
+            WHERE p.ID_Pergunta = f.ID_Pergunta AND p.TipoCod = {sql_codigo_tipo("f.TipoPergunta")}
+        )"""
+        con.execute(f"INSERT INTO {tabela_chaves} {sql_chaves_no(fatos)} EXCEPT SELECT * FROM {tabela_chaves}")
+        print(f"[INFO] {qtd} perguntas (por família de pesquisa) mudaram de eixo: seus nós do cubo serão recalculados.")
+    con.execute("DROP TABLE perguntas_alteradas")
+    con.execute("DROP TABLE eixos_antes")
+    return qtd
@@ -1,32 +1,20 @@
-import duckdb
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import os
-
-from shiny import App, ui, reactive, render
-from shiny.ui import tags
-from pathlib import Path
 
+# pandas só é importado quando um DataFrame é de fato montado; o módulo não
+# toca no banco ao ser importado (o app sobe mesmo sem o arquivo do DuckDB).
 
 # --- CONFIGURAÇÃO DO BANCO DE DADOS ---
-base_dir = os.path.dirname(os.path.abspath(__file__))
-if os.path.exists(os.path.join(base_dir, "hackathon.duckdb")):
-    DB_PATH = os.path.join(base_dir, "hackathon.duckdb")
-else:
-    # Caminho alternativo caso esteja rodando em estrutura de pastas diferente
-    DB_PATH = os.path.join(base_dir, "..", "data", "db", "hackathon.duckdb")
-    DB_PATH = os.path.abspath(DB_PATH)
-
-def get_db_connection():
-    return duckdb.connect(DB_PATH, read_only=True)
+# Caminho e pool de conexões ficam em banco.py; DB_PATH segue exportado aqui
+from banco import DB_PATH, conexao
+from cubo import DIM_CURSO, DIM_DISCIPLINA, DIM_UNIDADE, JUNCAO_DISCIPLINA, NIVEL_EIXO, NIVEL_TOTAL, codigo_tipo
+from cache import cacheado, cache_resultados
+from monitor import executar
 
 def get_estrutura_academica():
     """
     Carrega a hierarquia completa para os filtros:
     Setor (via dCurso) -> Departamento (via dDisciplina) -> Curso -> Disciplina
     """
-    conn = get_db_connection()
     # Fazemos o JOIN entre Disciplina e Curso para garantir que a hierarquia bata com o Star Schema
     query = """
         SELECT DISTINCT
@@ -38,179 +26,234 @@ def get_estrutura_academica():
         JOIN dCurso c ON d.Cod_Curso = c.Cod_Curso
         ORDER BY 1, 2, 3, 4
     """
-    try:
-        df = conn.execute(query).df()
-        return df
-    except Exception as e:
-        print(f"Erro ao carregar estrutura acadêmica: {e}")
-        # Retorna DataFrame vazio com colunas para evitar crash
-        return pd.DataFrame(columns=['Setor', 'Departamento', 'Curso', 'Nome_Disciplina'])
-    finally:
-        conn.close()
+    with conexao() as conn:
+        try:
+            df = executar(conn, query)
+            return df
+        except Exception as e:
+            print(f"Erro ao carregar estrutura acadêmica: {e}")
+            # Retorna DataFrame vazio com colunas para evitar crash
+            import pandas as pd
+            return pd.DataFrame(columns=['Setor', 'Departamento', 'Curso', 'Nome_Disciplina'])
 
-# Carrega a estrutura na memória ao iniciar a aplicação
-df_estrutura = get_estrutura_academica()
+# A estrutura não é mais carregada na importação: o índice dos filtros em
+# cascata (hierarquia.py) a consulta em segundo plano, junto dos payloads padrão.
 
 # --- FUNÇÕES SQL: INSTITUCIONAL E CURSOS (MANTIDAS) ---
+# Todas leem o cubo aggAvaliacao (ver cubo.py), não a fAvaliacao linha a linha.
+# O tipo de pesquisa é filtrado por igualdade no código inteiro TipoCod.
+# Os resultados ficam no cache de cache.py até a próxima ingestão (ou TTL).
+
+def estatisticas_cache():
+    """Acertos, faltas e descartes do cache de resultados (para dimensioná-lo)."""
+    return cache_resultados.estatisticas()
+
+# Nota 0-100 de um grupo: % de concordância entre quem concordou ou discordou
+SQL_SCORE = "CAST(100.0 * SUM(a.Concordo) / NULLIF(SUM(a.Concordo) + SUM(a.Discordo), 0) AS INTEGER)"
 
-def construir_filtros_simples(unidade, tabela_alias="f"):
+def filtro_ano(ano, tabela_alias="a"):
+    """Condição do ano no cubo; None ou "Todos" somam todos os anos."""
+    if ano is None or ano == "Todos":
+        return [], []
+    return [f"{tabela_alias}.Ano = ?"], [int(ano)]
+
+def construir_filtros_simples(unidade, tabela_alias="a", ano="Todos"):
     filtros = []
     params = []
     if unidade and unidade != "Todos":
         filtros.append(f"{tabela_alias}.SiglaLotação = ?") 
         params.append(unidade)
+    filtros_ano, params_ano = filtro_ano(ano, tabela_alias)
+    filtros += filtros_ano
+    params += params_ano
     return " AND ".join(filtros) if filtros else "1=1", params
 
-def get_eixos_sql(tipo_pergunta, unidade):
-    conn = get_db_connection()
-    where_clause, params = construir_filtros_simples(unidade)
+# Histograma da distribuição: 5 faixas de 20 pontos entre 0 e 100
+BINS_DISTRIBUICAO = 5
+LIMITES_DISTRIBUICAO = [100 * i / BINS_DISTRIBUICAO for i in range(BINS_DISTRIBUICAO + 1)]
+
+def histograma_vazio():
+    return {"bins": [0] * BINS_DISTRIBUICAO, "limites": LIMITES_DISTRIBUICAO, "media": 0, "total": 0}
+
+def distribuicao_de_contagens(concordo, neutro, discordo):
+    """
+    Histograma e média das notas (discordo = 0, neutro = 50, concordo = 100)
+    a partir das contagens por classe que o SQL já agregou: o payload tem
+    tamanho fixo, qualquer que seja o volume de respostas.
+    """
+    dist = histograma_vazio()
+    bins = list(dist["bins"])
+    total = 0
+    soma = 0.0
+    for nota, qtd in ((0.0, discordo), (50.0, neutro), (100.0, concordo)):
+        qtd = int(qtd or 0)
+        # Última faixa fechada à direita, como no np.histogram
+        bins[min(int(nota * BINS_DISTRIBUICAO // 100), BINS_DISTRIBUICAO - 1)] += qtd
+        total += qtd
+        soma += nota * qtd
+    dist.update({"bins": bins, "media": soma / total if total else 0, "total": total})
+    return dist
+
+# --- PAYLOADS COLUNARES ---
+# Os resultados vêm do DuckDB como arrays NumPy (fetchnumpy) e os payloads
+# dos módulos guardam colunas alinhadas em vez de listas de dicts. Como ficam
+# no cache compartilhado, os arrays são marcados como somente leitura.
+
+# Faixas de nota dos eixos: < 60 crítico, 60 a 75 importante, > 75 bom
+LIMITES_FAIXA_EIXO = (60, 75)
+ATRIBUTOS_FAIXA_EIXO = {
+    "class": ("card-red", "card-yellow", "card-green"),
+    "icon": ("fa-circle-down", "fa-triangle-exclamation", "fa-circle-check"),
+    "peso_label": ("Crítico", "Importante", "Médio"),
+    "peso_class": ("badge-high", "badge-mid", "badge-low"),
+}
+
+def somente_leitura(colunas):
+    for valores in colunas.values():
+        if isinstance(valores, np.ndarray):
+            valores.flags.writeable = False
+    return colunas
+
+def valores_validos(coluna):
+    """Máscara dos valores não NULL de uma coluna do fetchnumpy."""
+    return ~np.ma.getmaskarray(coluna)
+
+def classificar_eixos(eixos, scores):
+    """
+    Payload colunar dos eixos em ordem de nota decrescente: arrays alinhados
+    eixo, score, class, icon, peso_label e peso_class.
+    """
+    eixos = np.asarray(eixos, dtype=object)
+    scores = np.asarray(scores, dtype=np.int64)
+    ordem = np.argsort(-scores, kind="stable")
+    eixos, scores = eixos[ordem], scores[ordem]
+    faixa = (scores >= LIMITES_FAIXA_EIXO[0]).astype(np.intp) + (scores > LIMITES_FAIXA_EIXO[1])
+    colunas = {"eixo": eixos, "score": scores}
+    for atributo, valores in ATRIBUTOS_FAIXA_EIXO.items():
+        colunas[atributo] = np.asarray(valores, dtype=object)[faixa]
+    return somente_leitura(colunas)
+
+def media_eixos(colunas):
+    return int(colunas["score"].mean()) if len(colunas["score"]) else 0
+
+def ranking_colunar(titulo, labels, values, limite=8):
+    """Os `limite` maiores valores, em ordem crescente (de baixo para cima no gráfico)."""
+    labels = np.asarray(labels, dtype=object)
+    values = np.asarray(values, dtype=np.int64)
+    ordem = np.argsort(-values, kind="stable")[:limite][::-1]
+    return {"titulo": titulo, **somente_leitura({"labels": labels[ordem], "values": values[ordem]})}
+
+def donut_de_contagens(total, concordo, neutro, discordo):
+    if not total:
+        return {"total": 0, "concordo": 0, "neutro": 0, "discordo": 0}
+    return {"total": int(total), "concordo": int(concordo), "neutro": int(neutro), "discordo": int(discordo)}
+
+@cacheado("simples")
+def get_eixos_sql(tipo_pergunta, unidade, ano="Todos"):
+    where_clause, params = construir_filtros_simples(unidade, ano=ano)
     
     query = f"""
         SELECT 
-            tp.GrupoDePergunta AS eixo,
-            CAST(AVG(
-                CASE 
-                    WHEN TRIM(f.Resposta) IN ('Concordo', 'Sim', 'Concordo Totalmente', 'Satisfatório', 'Ótimo', 'Bom') THEN 100
-                    WHEN TRIM(f.Resposta) IN ('Discordo', 'Não', 'Discordo Totalmente', 'Ruim', 'Péssimo') THEN 0
-                    ELSE NULL 
-                END
-            ) AS INTEGER) AS score
-        FROM fAvaliacao f
-        JOIN dPergunta p ON f.ID_Pergunta = p.ID_Pergunta
-        JOIN dTipoPergunta tp ON p.TipoPergunta = tp.TipoPergunta
-        WHERE {where_clause}
-        GROUP BY tp.GrupoDePergunta
+            a.GrupoDePergunta AS eixo,
+            {SQL_SCORE} AS score
+        FROM aggAvaliacao a
+        WHERE a.Nivel = {NIVEL_EIXO} AND a.GrupoDePergunta IS NOT NULL AND {where_clause}
+        GROUP BY a.GrupoDePergunta
         HAVING score IS NOT NULL
         ORDER BY score DESC
     """
-    try:
-        df = conn.execute(query, params).df()
-        dados_processados = []
-        for _, row in df.iterrows():
-            score = row['score']
-            if score < 60:
-                cor, icon, peso_lbl, peso_cls = "card-red", "fa-circle-down", "Crítico", "badge-high"
-            elif score <= 75:
-                cor, icon, peso_lbl, peso_cls = "card-yellow", "fa-triangle-exclamation", "Importante", "badge-mid"
-            else:
-                cor, icon, peso_lbl, peso_cls = "card-green", "fa-circle-check", "Médio", "badge-low"
-
-            dados_processados.append({
-                "eixo": row['eixo'],
-                "score": score,
-                "class": cor,
-                "icon": icon,
-                "peso_info": {"label": peso_lbl, "class": peso_cls}
-            })
-
-        media_geral = int(df['score'].mean()) if not df.empty else 0
-        return media_geral, dados_processados
-    except Exception as e:
-        print(f"Erro SQL Eixos: {e}")
-        return 0, []
-    finally:
-        conn.close()
+    with conexao() as conn:
+        try:
+            colunas = executar(conn, query, params, formato="numpy")
+            dados_processados = classificar_eixos(colunas["eixo"], colunas["score"])
+            return media_eixos(dados_processados), dados_processados
+        except Exception as e:
+            print(f"Erro SQL Eixos: {e}")
+            return 0, classificar_eixos([], [])
 
-def get_donut_sql(tipo_pergunta, unidade):
-    conn = get_db_connection()
-    where_clause, params = construir_filtros_simples(unidade)
-    final_params = [f"%{tipo_pergunta}%"] + params
+@cacheado("simples")
+def get_donut_sql(tipo_pergunta, unidade, ano="Todos"):
+    where_clause, params = construir_filtros_simples(unidade, ano=ano)
+    final_params = [codigo_tipo(tipo_pergunta)] + params
     
     query = f"""
         SELECT
-            COUNT(*) as total,
-            SUM(CASE WHEN TRIM(Resposta) IN ('Concordo', 'Sim', 'Concordo Totalmente', 'Satisfatório', 'Ótimo', 'Bom') THEN 1 ELSE 0 END) as concordo,
-            SUM(CASE WHEN TRIM(Resposta) IN ('Desconheço', 'Indiferente', 'Neutro') THEN 1 ELSE 0 END) as neutro,
-            SUM(CASE WHEN TRIM(Resposta) IN ('Discordo', 'Não', 'Discordo Totalmente', 'Ruim', 'Péssimo') THEN 1 ELSE 0 END) as discordo
-        FROM fAvaliacao f
-        WHERE f.TipoPergunta LIKE ? AND {where_clause}
+            SUM(a.Total) as total,
+            SUM(a.Concordo) as concordo,
+            SUM(a.Neutro) as neutro,
+            SUM(a.Discordo) as discordo
+        FROM aggAvaliacao a
+        WHERE a.Nivel = {NIVEL_TOTAL} AND a.TipoCod = ? AND {where_clause}
     """
-    try:
-        df = conn.execute(query, final_params).df()
-        if df.empty or df.iloc[0]['total'] == 0: 
-            return {"total": 0, "concordo": 0, "neutro": 0, "discordo": 0}
-        return df.iloc[0].to_dict()
-    finally:
-        conn.close()
-
-def get_ranking_sql(tipo_pergunta, unidade):
-    conn = get_db_connection()
-    where_clause, params = construir_filtros_simples(unidade)
-    final_params = [f"%{tipo_pergunta}%"] + params
+    with conexao() as conn:
+        return donut_de_contagens(*executar(conn, query, final_params, formato="one"))
+
+@cacheado("simples")
+def get_ranking_sql(tipo_pergunta, unidade, ano="Todos"):
+    where_clause, params = construir_filtros_simples(unidade, ano=ano)
+    final_params = [codigo_tipo(tipo_pergunta)] + params
     
     if 'Institucional' in tipo_pergunta:
-        join_clause = "JOIN dUnidade d ON f.SiglaLotação = d.SiglaLotação"
+        join_clause = f"JOIN {DIM_UNIDADE} d ON a.SiglaLotação = d.SiglaLotação"
         label_col = "d.UnidadeGestora"
         titulo = "Satisfação por Unidade"
     elif 'Curso' in tipo_pergunta: 
-        join_clause = "JOIN dCurso d ON f.Cod_Curso = d.Cod_Curso"
+        join_clause = f"JOIN {DIM_CURSO} d ON a.Cod_Curso = d.Cod_Curso"
         label_col = "d.Curso"
         titulo = "Top Cursos"
     else: 
-        join_clause = "JOIN dDisciplina d ON f.Cod_Disciplina = d.Cod_Disciplina"
+        join_clause = f"JOIN {DIM_DISCIPLINA} d ON {JUNCAO_DISCIPLINA}"
         label_col = "d.Nome_Disciplina"
         titulo = "Top Disciplinas"
 
     query = f"""
         SELECT 
             {label_col} as label,
-            CAST(AVG(
-                CASE 
-                    WHEN TRIM(f.Resposta) IN ('Concordo', 'Sim') THEN 100
-                    WHEN TRIM(f.Resposta) IN ('Discordo', 'Não') THEN 0
-                    ELSE NULL 
-                END
-            ) AS INTEGER) as value
-        FROM fAvaliacao f
+            {SQL_SCORE} as value
+        FROM aggAvaliacao a
         {join_clause}
-        WHERE f.TipoPergunta LIKE ? AND {where_clause}
+        WHERE a.Nivel = {NIVEL_TOTAL} AND a.TipoCod = ? AND {where_clause}
         GROUP BY {label_col}
         HAVING value IS NOT NULL
         ORDER BY value DESC
         LIMIT 8
     """
-    try:
-        df = conn.execute(query, final_params).df()
-        df = df.sort_values(by='value', ascending=True) 
-        return {"titulo": titulo, "dados": df.to_dict('records')}
-    except Exception:
-        return {"titulo": titulo, "dados": []}
-    finally:
-        conn.close()
-
-def get_distribuicao_sql(tipo_pergunta, unidade):
-    conn = get_db_connection()
-    where_clause, params = construir_filtros_simples(unidade)
-    final_params = [f"%{tipo_pergunta}%"] + params
+    with conexao() as conn:
+        try:
+            colunas = executar(conn, query, final_params, formato="numpy")
+            return ranking_colunar(titulo, colunas["label"], colunas["value"])
+        except Exception:
+            return ranking_colunar(titulo, [], [])
+
+@cacheado("simples")
+def get_distribuicao_sql(tipo_pergunta, unidade, ano="Todos"):
+    where_clause, params = construir_filtros_simples(unidade, ano=ano)
+    final_params = [codigo_tipo(tipo_pergunta)] + params
     
     query = f"""
         SELECT 
-            CASE 
-                WHEN TRIM(Resposta) IN ('Concordo', 'Sim') THEN 100.0
-                WHEN TRIM(Resposta) IN ('Desconheço', 'Neutro') THEN 50.0
-                WHEN TRIM(Resposta) IN ('Discordo', 'Não') THEN 0.0
-                ELSE NULL
-            END as nota
-        FROM fAvaliacao f
-        WHERE f.TipoPergunta LIKE ? AND {where_clause}
-        AND nota IS NOT NULL
+            COALESCE(SUM(a.Concordo), 0),
+            COALESCE(SUM(a.Neutro), 0),
+            COALESCE(SUM(a.Discordo), 0)
+        FROM aggAvaliacao a
+        WHERE a.Nivel = {NIVEL_TOTAL} AND a.TipoCod = ? AND {where_clause}
     """
-    try:
-        df = conn.execute(query, final_params).df()
-        notas = df['nota'].tolist()
-        media = np.mean(notas) if notas else 0
-        return {"notas": notas, "media": media}
-    finally:
-        conn.close()
+    with conexao() as conn:
+        concordo, neutro, discordo = executar(conn, query, final_params, formato="one")
+        return distribuicao_de_contagens(concordo, neutro, discordo)
 
 # --- FUNÇÕES SQL: DISCIPLINAS (NOVAS COM HIERARQUIA) ---
 
-def construir_where_disciplina(setor, depto, curso, disciplina):
+# JOIN necessário: aggAvaliacao -> dDisciplina (par disciplina/curso, para o
+# Departamento) e aggAvaliacao -> dCurso (o Setor é o do curso avaliado)
+FONTE_DISCIPLINA = f"""FROM aggAvaliacao a
+        JOIN {DIM_DISCIPLINA} d ON {JUNCAO_DISCIPLINA}
+        JOIN {DIM_CURSO} c ON a.Cod_Curso = c.Cod_Curso"""
+
+def construir_where_disciplina(setor, depto, curso, disciplina, ano="Todos"):
     filtros = []
     params = []
     
-    # JOIN necessário: fAvaliacao -> dDisciplina -> dCurso (para pegar Setor)
-    
     if setor != "Todos":
         filtros.append("c.Setor_Curso = ?")
         params.append(setor)
@@ -223,145 +266,311 @@ def construir_where_disciplina(setor, depto, curso, disciplina):
     if disciplina != "Todas":
         filtros.append("d.Nome_Disciplina = ?")
         params.append(disciplina)
+    filtros_ano, params_ano = filtro_ano(ano)
+    filtros += filtros_ano
+    params += params_ano
         
     return (" AND ".join(filtros) if filtros else "1=1"), params
 
-def get_eixos_sql_disciplina(setor, depto, curso, disciplina):
-    conn = get_db_connection()
-    where_clause, params = construir_where_disciplina(setor, depto, curso, disciplina)
+@cacheado("disciplina")
+def get_eixos_sql_disciplina(setor, depto, curso, disciplina, ano="Todos"):
+    where_clause, params = construir_where_disciplina(setor, depto, curso, disciplina, ano)
 
     query = f"""
         SELECT 
-            tp.GrupoDePergunta AS eixo,
-            CAST(AVG(
-                CASE 
-                    WHEN TRIM(f.Resposta) IN ('Concordo', 'Sim', 'Concordo Totalmente', 'Satisfatório', 'Ótimo', 'Bom') THEN 100
-                    WHEN TRIM(f.Resposta) IN ('Discordo', 'Não', 'Discordo Totalmente', 'Ruim', 'Péssimo') THEN 0
-                    ELSE NULL 
-                END
-            ) AS INTEGER) AS score
-        FROM fAvaliacao f
-        JOIN dDisciplina d ON f.Cod_Disciplina = d.Cod_Disciplina
-        JOIN dCurso c ON d.Cod_Curso = c.Cod_Curso
-        JOIN dPergunta p ON f.ID_Pergunta = p.ID_Pergunta
-        JOIN dTipoPergunta tp ON p.TipoPergunta = tp.TipoPergunta
-        WHERE {where_clause}
-        GROUP BY tp.GrupoDePergunta
+            a.GrupoDePergunta AS eixo,
+            {SQL_SCORE} AS score
+        {FONTE_DISCIPLINA}
+        WHERE a.Nivel = {NIVEL_EIXO} AND a.GrupoDePergunta IS NOT NULL AND {where_clause}
+        GROUP BY a.GrupoDePergunta
         HAVING score IS NOT NULL
         ORDER BY score DESC
     """
-    try:
-        df = conn.execute(query, params).df()
-        
-        dados_processados = []
-        for _, row in df.iterrows():
-            score = row['score']
-            if score < 60:
-                cor, icon, peso_lbl, peso_cls = "card-red", "fa-circle-down", "Crítico", "badge-high"
-            elif score <= 75:
-                cor, icon, peso_lbl, peso_cls = "card-yellow", "fa-triangle-exclamation", "Importante", "badge-mid"
-            else:
-                cor, icon, peso_lbl, peso_cls = "card-green", "fa-circle-check", "Médio", "badge-low"
-
-            dados_processados.append({
-                "eixo": row['eixo'],
-                "score": score,
-                "class": cor,
-                "icon": icon,
-                "peso_info": {"label": peso_lbl, "class": peso_cls}
-            })
-
-        media_geral = int(df['score'].mean()) if not df.empty else 0
-        return media_geral, dados_processados
-    except Exception as e:
-        print(f"Erro SQL Disciplina Eixos: {e}")
-        return 0, []
-    finally:
-        conn.close()
+    with conexao() as conn:
+        try:
+            colunas = executar(conn, query, params, formato="numpy")
+            dados_processados = classificar_eixos(colunas["eixo"], colunas["score"])
+            return media_eixos(dados_processados), dados_processados
+        except Exception as e:
+            print(f"Erro SQL Disciplina Eixos: {e}")
+            return 0, classificar_eixos([], [])
 
-def get_donut_sql_disciplina(setor, depto, curso, disciplina):
-    conn = get_db_connection()
-    where_clause, params = construir_where_disciplina(setor, depto, curso, disciplina)
+@cacheado("disciplina")
+def get_donut_sql_disciplina(setor, depto, curso, disciplina, ano="Todos"):
+    where_clause, params = construir_where_disciplina(setor, depto, curso, disciplina, ano)
 
     query = f"""
         SELECT
-            COUNT(*) as total,
-            SUM(CASE WHEN TRIM(Resposta) IN ('Concordo', 'Sim', 'Concordo Totalmente', 'Satisfatório', 'Ótimo', 'Bom') THEN 1 ELSE 0 END) as concordo,
-            SUM(CASE WHEN TRIM(Resposta) IN ('Desconheço', 'Indiferente', 'Neutro') THEN 1 ELSE 0 END) as neutro,
-            SUM(CASE WHEN TRIM(Resposta) IN ('Discordo', 'Não', 'Discordo Totalmente', 'Ruim', 'Péssimo') THEN 1 ELSE 0 END) as discordo
-        FROM fAvaliacao f
-        JOIN dDisciplina d ON f.Cod_Disciplina = d.Cod_Disciplina
-        JOIN dCurso c ON d.Cod_Curso = c.Cod_Curso
-        WHERE {where_clause}
+            SUM(a.Total) as total,
+            SUM(a.Concordo) as concordo,
+            SUM(a.Neutro) as neutro,
+            SUM(a.Discordo) as discordo
+        {FONTE_DISCIPLINA}
+        WHERE a.Nivel = {NIVEL_TOTAL} AND {where_clause}
     """
-    try:
-        df = conn.execute(query, params).df()
-        if df.empty or df.iloc[0]['total'] == 0:
-            return {"total": 0, "concordo": 0, "neutro": 0, "discordo": 0}
-        return df.iloc[0].to_dict()
-    finally:
-        conn.close()
-
-def get_ranking_sql_disciplina(setor, depto, curso, disciplina):
-    conn = get_db_connection()
-    where_clause, params = construir_where_disciplina(setor, depto, curso, disciplina)
+    with conexao() as conn:
+        return donut_de_contagens(*executar(conn, query, params, formato="one"))
+
+@cacheado("disciplina")
+def get_ranking_sql_disciplina(setor, depto, curso, disciplina, ano="Todos"):
+    where_clause, params = construir_where_disciplina(setor, depto, curso, disciplina, ano)
 
     query = f"""
         SELECT 
             d.Nome_Disciplina as label,
-            CAST(AVG(
-                CASE 
-                    WHEN TRIM(f.Resposta) IN ('Concordo', 'Sim') THEN 100
-                    WHEN TRIM(f.Resposta) IN ('Discordo', 'Não') THEN 0
-                    ELSE NULL 
-                END
-            ) AS INTEGER) as value
-        FROM fAvaliacao f
-        JOIN dDisciplina d ON f.Cod_Disciplina = d.Cod_Disciplina
-        JOIN dCurso c ON d.Cod_Curso = c.Cod_Curso
-        WHERE {where_clause}
+            {SQL_SCORE} as value
+        {FONTE_DISCIPLINA}
+        WHERE a.Nivel = {NIVEL_TOTAL} AND {where_clause}
         GROUP BY d.Nome_Disciplina
         HAVING value IS NOT NULL
         ORDER BY value DESC
         LIMIT 8
     """
-    try:
-        df = conn.execute(query, params).df()
-        df = df.sort_values(by="value", ascending=True)
-        return {"titulo": "Melhores Disciplinas (Seleção)", "dados": df.to_dict("records")}
-    finally:
-        conn.close()
-
-def get_distribuicao_sql_disciplina(setor, depto, curso, disciplina):
-    conn = get_db_connection()
-    where_clause, params = construir_where_disciplina(setor, depto, curso, disciplina)
+    with conexao() as conn:
+        colunas = executar(conn, query, params, formato="numpy")
+        return ranking_colunar("Melhores Disciplinas (Seleção)", colunas["label"], colunas["value"])
+
+@cacheado("disciplina")
+def get_distribuicao_sql_disciplina(setor, depto, curso, disciplina, ano="Todos"):
+    where_clause, params = construir_where_disciplina(setor, depto, curso, disciplina, ano)
 
     query = f"""
         SELECT 
-            CASE 
-                WHEN TRIM(Resposta) IN ('Concordo', 'Sim') THEN 100.0
-                WHEN TRIM(Resposta) IN ('Desconheço', 'Neutro') THEN 50.0
-                WHEN TRIM(Resposta) IN ('Discordo', 'Não') THEN 0.0
-                ELSE NULL
-            END as nota
-        FROM fAvaliacao f
-        JOIN dDisciplina d ON f.Cod_Disciplina = d.Cod_Disciplina
-        JOIN dCurso c ON d.Cod_Curso = c.Cod_Curso
-        WHERE {where_clause}
-        AND nota IS NOT NULL
+            COALESCE(SUM(a.Concordo), 0),
+            COALESCE(SUM(a.Neutro), 0),
+            COALESCE(SUM(a.Discordo), 0)
+        {FONTE_DISCIPLINA}
+        WHERE a.Nivel = {NIVEL_TOTAL} AND {where_clause}
     """
-    try:
-        df = conn.execute(query, params).df()
-        notas = df['nota'].tolist()
-        media = np.mean(notas) if notas else 0
-        return {"notas": notas, "media": media}
-    finally:
-        conn.close()
+    with conexao() as conn:
+        concordo, neutro, discordo = executar(conn, query, params, formato="one")
+        return distribuicao_de_contagens(concordo, neutro, discordo)
 
+@cacheado("unidades")
 def get_unidades_disponiveis():
     try:
-        conn = get_db_connection()
-        df = conn.execute("SELECT DISTINCT SiglaLotação FROM dUnidade ORDER BY 1").df()
-        conn.close()
-        return ["Todos"] + df['SiglaLotação'].tolist()
-    except: return ["Todos"]
\ No newline at end of file
+        with conexao() as conn:
+            linhas = executar(conn, "SELECT DISTINCT SiglaLotação FROM dUnidade ORDER BY 1", formato="all")
+        return ["Todos"] + [sigla for (sigla,) in linhas]
+    except: return ["Todos"]
+
+@cacheado("unidades")
+def get_anos_disponiveis():
+    """Anos presentes no cubo, do mais recente ao mais antigo (valores do filtro de ano)."""
+    try:
+        with conexao() as conn:
+            linhas = executar(conn, "SELECT DISTINCT Ano FROM aggAvaliacao WHERE Ano IS NOT NULL ORDER BY 1 DESC", formato="all")
+        return ["Todos"] + [str(ano) for (ano,) in linhas]
+    except: return ["Todos"]
+
+# --- SNAPSHOT DO DASHBOARD (UMA CONSULTA POR FILTRO) ---
+# Os quatro painéis (eixos, donut, ranking, distribuição) saem de um único
+# GROUPING SETS sobre o cubo aggAvaliacao.
+
+def snapshot_vazio(titulo):
+    return (
+        (0, classificar_eixos([], [])),
+        donut_de_contagens(0, 0, 0, 0),
+        ranking_colunar(titulo, [], []),
+        histograma_vazio(),
+    )
+
+def executar_snapshot(fonte, label_col, filtro_tipo, where_clause, params, titulo):
+    """
+    Roda a consulta fundida e separa o resultado nos quatro payloads que o
+    dashboard_server consome. `filtro_tipo` restringe donut/ranking/distribuição
+    (os eixos, como nas funções individuais, não filtram pelo tipo).
+    """
+    query = f"""
+        WITH base AS (
+            SELECT
+                a.Nivel,
+                a.GrupoDePergunta AS eixo,
+                {label_col} AS label,
+                {filtro_tipo} AS do_tipo,
+                a.Total,
+                a.Concordo,
+                a.Neutro,
+                a.Discordo
+            {fonte}
+            WHERE {where_clause}
+        )
+        SELECT
+            GROUPING(eixo, label) AS nivel,
+            eixo,
+            label,
+            CAST(100.0 * SUM(Concordo) FILTER (WHERE Nivel = {NIVEL_EIXO})
+                / NULLIF(SUM(Concordo + Discordo) FILTER (WHERE Nivel = {NIVEL_EIXO}), 0) AS INTEGER) AS score_eixo,
+            CAST(100.0 * SUM(Concordo) FILTER (WHERE Nivel = {NIVEL_TOTAL} AND do_tipo)
+                / NULLIF(SUM(Concordo + Discordo) FILTER (WHERE Nivel = {NIVEL_TOTAL} AND do_tipo), 0) AS INTEGER) AS score_ranking,
+            COALESCE(SUM(Total) FILTER (WHERE Nivel = {NIVEL_TOTAL} AND do_tipo), 0) AS total,
+            COALESCE(SUM(Concordo) FILTER (WHERE Nivel = {NIVEL_TOTAL} AND do_tipo), 0) AS concordo,
+            COALESCE(SUM(Neutro) FILTER (WHERE Nivel = {NIVEL_TOTAL} AND do_tipo), 0) AS neutro,
+            COALESCE(SUM(Discordo) FILTER (WHERE Nivel = {NIVEL_TOTAL} AND do_tipo), 0) AS discordo
+        FROM base
+        GROUP BY GROUPING SETS ((eixo), (label), ())
+    """
+    try:
+        with conexao() as conn:
+            colunas = executar(conn, query, params, formato="numpy")
+    except Exception as e:
+        print(f"Erro SQL Snapshot: {e}")
+        return snapshot_vazio(titulo)
+
+    # nivel = bits de GROUPING(eixo, label): 1 -> por eixo, 2 -> por label, 3 -> total
+    nivel = np.asarray(colunas["nivel"])
+    por_eixo = (nivel == 1) & valores_validos(colunas["eixo"]) & valores_validos(colunas["score_eixo"])
+    por_label = (nivel == 2) & valores_validos(colunas["label"]) & valores_validos(colunas["score_ranking"])
+    geral = np.flatnonzero(nivel == 3)
+
+    dados_eixos = classificar_eixos(np.asarray(colunas["eixo"])[por_eixo], np.asarray(colunas["score_eixo"])[por_eixo])
+    donut = donut_de_contagens(0, 0, 0, 0)
+    if geral.size:
+        i = geral[0]
+        donut = donut_de_contagens(*(colunas[c][i] for c in ("total", "concordo", "neutro", "discordo")))
+
+    # Mesmo recorte das funções individuais: 8 maiores, exibidos em ordem crescente
+    ranking = ranking_colunar(titulo, np.asarray(colunas["label"])[por_label], np.asarray(colunas["score_ranking"])[por_label])
+
+    return (
+        (media_eixos(dados_eixos), dados_eixos),
+        donut,
+        ranking,
+        distribuicao_de_contagens(donut["concordo"], donut["neutro"], donut["discordo"]),
+    )
+
+def fonte_simples(tipo_pergunta):
+    """(fonte, coluna do rótulo, título do ranking) de Institucional/Cursos."""
+    if 'Institucional' in tipo_pergunta:
+        return (f"FROM aggAvaliacao a LEFT JOIN {DIM_UNIDADE} d ON a.SiglaLotação = d.SiglaLotação",
+                "d.UnidadeGestora", "Satisfação por Unidade")
+    if 'Curso' in tipo_pergunta:
+        return (f"FROM aggAvaliacao a LEFT JOIN {DIM_CURSO} d ON a.Cod_Curso = d.Cod_Curso",
+                "d.Curso", "Top Cursos")
+    return (f"FROM aggAvaliacao a LEFT JOIN {DIM_DISCIPLINA} d ON {JUNCAO_DISCIPLINA}",
+            "d.Nome_Disciplina", "Top Disciplinas")
+
+@cacheado("simples")
+def get_snapshot_sql(tipo_pergunta, unidade, ano="Todos"):
+    """Eixos, donut, ranking e distribuição de Institucional/Cursos numa consulta."""
+    where_clause, params = construir_filtros_simples(unidade, ano=ano)
+    fonte, label_col, titulo = fonte_simples(tipo_pergunta)
+    final_params = [codigo_tipo(tipo_pergunta)] + params
+    return executar_snapshot(fonte, label_col, "a.TipoCod = ?", where_clause, final_params, titulo)
+
+@cacheado("disciplina")
+def get_snapshot_sql_disciplina(setor, depto, curso, disciplina, ano="Todos"):
+    """Eixos, donut, ranking e distribuição da hierarquia de disciplinas numa consulta."""
+    where_clause, params = construir_where_disciplina(setor, depto, curso, disciplina, ano)
+    return executar_snapshot(FONTE_DISCIPLINA, "d.Nome_Disciplina", "TRUE", where_clause, params, "Melhores Disciplinas (Seleção)")
+
+# --- TENDÊNCIA ANUAL (SÉRIES POR EIXO E POR ENTIDADE) ---
+# O cubo já está quebrado por Ano: a série de todos os eixos e de todas as
+# entidades sai de um GROUPING SETS sobre ele, e a variação em relação ao
+# ano anterior é calculada no banco com LAG, de uma vez para todas as séries.
+
+# Cada série é colunar: arrays alinhados ano, score, delta (NaN no primeiro
+# ano da série) e, na geral e nas entidades, total de respostas.
+
+def serie_vazia():
+    return somente_leitura({
+        "ano": np.empty(0, dtype=np.int64), "score": np.empty(0, dtype=np.int64),
+        "delta": np.empty(0, dtype=np.float64), "total": np.empty(0, dtype=np.int64),
+    })
+
+def tendencia_vazia():
+    return {"anos": [], "geral": serie_vazia(), "eixos": {}, "entidades": {}}
+
+def separar_series(chaves, colunas):
+    """Divide colunas ordenadas por `chaves` em {chave: fatia de cada coluna} (fatias são views)."""
+    if not len(chaves):
+        return {}
+    inicios = np.flatnonzero(np.r_[True, chaves[1:] != chaves[:-1]])
+    fins = np.r_[inicios[1:], len(chaves)]
+    return {chaves[i]: {nome: col[i:f] for nome, col in colunas.items()} for i, f in zip(inicios, fins)}
+
+def executar_tendencia(fonte, label_col, filtro_tipo, where_clause, params):
+    """
+    Séries anuais no mesmo recorte do snapshot: nota por eixo (sem filtro de
+    tipo, como os eixos do snapshot), nota geral e nota por entidade do
+    ranking. Cada série traz `delta` = nota - nota do ano anterior da série.
+    """
+    query = f"""
+        WITH base AS (
+            SELECT
+                a.Ano,
+                a.Nivel,
+                a.GrupoDePergunta AS eixo,
+                {label_col} AS label,
+                {filtro_tipo} AS do_tipo,
+                a.Total,
+                a.Concordo,
+                a.Discordo
+            {fonte}
+            WHERE a.Ano IS NOT NULL AND {where_clause}
+        ),
+        series AS (
+            SELECT
+                GROUPING(eixo, label) AS nivel,
+                Ano,
+                eixo,
+                label,
+                CASE WHEN GROUPING(eixo, label) = 1 THEN
+                    CAST(100.0 * SUM(Concordo) FILTER (WHERE Nivel = {NIVEL_EIXO})
+                        / NULLIF(SUM(Concordo + Discordo) FILTER (WHERE Nivel = {NIVEL_EIXO}), 0) AS INTEGER)
+                ELSE
+                    CAST(100.0 * SUM(Concordo) FILTER (WHERE Nivel = {NIVEL_TOTAL} AND do_tipo)
+                        / NULLIF(SUM(Concordo + Discordo) FILTER (WHERE Nivel = {NIVEL_TOTAL} AND do_tipo), 0) AS INTEGER)
+                END AS score,
+                COALESCE(SUM(Total) FILTER (WHERE Nivel = {NIVEL_TOTAL} AND do_tipo), 0) AS total
+            FROM base
+            GROUP BY GROUPING SETS ((Ano, eixo), (Ano, label), (Ano))
+        )
+        SELECT
+            nivel, Ano, eixo, label, score, total,
+            score - LAG(score) OVER (PARTITION BY nivel, eixo, label ORDER BY Ano) AS delta
+        FROM series
+        WHERE score IS NOT NULL AND (nivel = 3 OR COALESCE(eixo, label) IS NOT NULL)
+        ORDER BY nivel, eixo, label, Ano
+    """
+    try:
+        with conexao() as conn:
+            colunas = executar(conn, query, params, formato="numpy")
+    except Exception as e:
+        print(f"Erro SQL Tendência: {e}")
+        return tendencia_vazia()
+
+    # nivel = bits de GROUPING(eixo, label): 1 -> por eixo, 2 -> por label, 3 -> geral
+    # As linhas vêm ordenadas por (nivel, eixo, label, Ano): cada série é uma fatia contígua
+    nivel = np.asarray(colunas["nivel"])
+    serie = {
+        "ano": np.asarray(colunas["Ano"], dtype=np.int64),
+        "score": np.asarray(colunas["score"], dtype=np.int64),
+        "delta": np.ma.filled(np.ma.asarray(colunas["delta"]).astype(np.float64), np.nan),
+        "total": np.asarray(colunas["total"], dtype=np.int64),
+    }
+    sem_total = {nome: col for nome, col in serie.items() if nome != "total"}
+    eixo = np.asarray(colunas["eixo"], dtype=object)
+    label = np.asarray(colunas["label"], dtype=object)
+    por_eixo, por_label, geral = nivel == 1, nivel == 2, nivel == 3
+
+    return {
+        "anos": np.unique(serie["ano"]).tolist(),
+        "geral": somente_leitura({nome: col[geral] for nome, col in serie.items()}),
+        "eixos": separar_series(eixo[por_eixo], somente_leitura({nome: col[por_eixo] for nome, col in sem_total.items()})),
+        "entidades": separar_series(label[por_label], somente_leitura({nome: col[por_label] for nome, col in serie.items()})),
+    }
+
+@cacheado("simples")
+def get_tendencia_sql(tipo_pergunta, unidade):
+    """Séries anuais (geral, eixos, entidades) de Institucional/Cursos."""
+    where_clause, params = construir_filtros_simples(unidade)
+    fonte, label_col, _ = fonte_simples(tipo_pergunta)
+    final_params = [codigo_tipo(tipo_pergunta)] + params
+    return executar_tendencia(fonte, label_col, "a.TipoCod = ?", where_clause, final_params)
+
+@cacheado("disciplina")
+def get_tendencia_sql_disciplina(setor, depto, curso, disciplina):
+    """Séries anuais (geral, eixos, disciplinas) da hierarquia de disciplinas."""
+    where_clause, params = construir_where_disciplina(setor, depto, curso, disciplina)
+    return executar_tendencia(FONTE_DISCIPLINA, "d.Nome_Disciplina", "TRUE", where_clause, params)
\ No newline at end of file
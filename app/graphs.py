@@ -1,34 +1,53 @@
-import duckdb
-import pandas as pd
+import asyncio
+import base64
+import io
+
 import numpy as np
-import matplotlib.pyplot as plt
-import os
 
-from shiny import App, ui, reactive, render
-from shiny.ui import tags
-from pathlib import Path
+from cache import cache_imagens, impressao_payload
+from tarefas import em_processo_de_render
 
+# --- CONFIGURAÇÃO VISUAL (MATPLOTLIB) ---
+# O matplotlib (a parte mais cara da subida) só é importado no primeiro
+# gráfico, e o estilo é aplicado nesse momento, não na importação do módulo.
+ESTILO = {
+    'font.family': 'sans-serif',
+    'font.sans-serif': ['Roboto', 'Arial', 'Helvetica', 'sans-serif'],
+    'text.color': '#333333',
+    'axes.labelcolor': '#333333',
+    'xtick.color': '#333333',
+    'ytick.color': '#333333',
+}
 
+_Figure = None
 
-# --- CONFIGURAÇÃO VISUAL (MATPLOTLIB) ---
-plt.rcParams['font.family'] = 'sans-serif'
-plt.rcParams['font.sans-serif'] = ['Roboto', 'Arial', 'Helvetica', 'sans-serif']
-plt.rcParams['text.color'] = '#333333'
-plt.rcParams['axes.labelcolor'] = '#333333'
-plt.rcParams['xtick.color'] = '#333333'
-plt.rcParams['ytick.color'] = '#333333'
+def figura(**kwargs):
+    """
+    Figure nova pela API orientada a objetos, no backend Agg. Não passa
+    pelo pyplot, então não entra no registro global de figuras: quando a
+    referência some, a memória é liberada.
+    """
+    global _Figure
+    if _Figure is None:
+        import matplotlib
+        matplotlib.use("Agg")
+        matplotlib.rcParams.update(ESTILO)
+        from matplotlib.figure import Figure
+        _Figure = Figure
+    return _Figure(**kwargs)
 
 
 
-def criar_plot_radar(lista_dados):
-    if not lista_dados: return None
-    labels = [d['eixo'] for d in lista_dados]
-    valores = [d['score'] for d in lista_dados]
+def criar_plot_radar(eixos):
+    if not len(eixos['eixo']): return None
+    labels = list(eixos['eixo'])
+    valores = eixos['score'].tolist()
     valores += valores[:1] 
     angles = np.linspace(0, 2 * np.pi, len(labels), endpoint=False).tolist()
     angles += angles[:1]
     
-    fig, ax = plt.subplots(figsize=(10, 10), subplot_kw=dict(polar=True))
+    fig = figura(figsize=(10, 10))
+    ax = fig.subplots(subplot_kw=dict(polar=True))
     ax.plot(angles, valores, color='#004b8d', linewidth=2, linestyle='solid')
     ax.fill(angles, valores, color='#004b8d', alpha=0.25)
     ax.set_xticks(angles[:-1])
@@ -40,7 +59,7 @@ def criar_plot_radar(lista_dados):
     ax.set_yticklabels(["20", "40", "60", "80", "100"], color="#999", size=9)
     ax.spines['polar'].set_visible(False)
     fig.patch.set_alpha(0.0)
-    plt.tight_layout(pad=3.0)
+    fig.tight_layout(pad=3.0)
     return fig
 
 def criar_plot_donut(dados):
@@ -54,7 +73,8 @@ def criar_plot_donut(dados):
         pct = (val / total * 100)
         labels_legenda.append(f"{lbl}: {val} ({pct:.1f}%)")
 
-    fig, ax = plt.subplots(figsize=(6, 4))
+    fig = figura(figsize=(6, 4))
+    ax = fig.subplots()
     wedges, texts = ax.pie(vals, colors=colors, startangle=90, wedgeprops=dict(width=0.4))
     ax.text(0, 0, f"{total}", ha='center', va='center', fontsize=22, fontweight='bold', color='#333')
     ax.legend(wedges, labels_legenda, title="Respostas", loc="center left", bbox_to_anchor=(1, 0, 0.5, 1), frameon=False)
@@ -62,11 +82,11 @@ def criar_plot_donut(dados):
     return fig
 
 def criar_plot_barras(dados_dict):
-    dados = dados_dict["dados"]
-    if not dados: return None
-    labels = [d['label'] for d in dados]
-    values = [d['value'] for d in dados]
-    fig, ax = plt.subplots(figsize=(6, 4))
+    labels = dados_dict["labels"]
+    values = dados_dict["values"]
+    if not len(labels): return None
+    fig = figura(figsize=(6, 4))
+    ax = fig.subplots()
     bars = ax.barh(labels, values, color='#004b8d', height=0.6)
     ax.spines['top'].set_visible(False)
     ax.spines['right'].set_visible(False)
@@ -77,17 +97,21 @@ def criar_plot_barras(dados_dict):
     ax.tick_params(axis='y', length=0)
     for bar in bars: 
         ax.text(bar.get_width() + 2, bar.get_y() + bar.get_height()/2, f'{int(bar.get_width())}', ha='left', va='center', fontsize=10, fontweight='bold', color='#004b8d')
-    plt.tight_layout()
+    fig.tight_layout()
     fig.patch.set_alpha(0.0)
     return fig
 
 def criar_plot_distribuicao(dados):
-    notas = dados['notas']
+    # Recebe o histograma já agregado no banco: contagens por faixa + limites
+    n = dados['bins']
+    limites = dados['limites']
     media = dados['media']
-    if not notas: return None
+    if not dados['total']: return None
     
-    fig, ax = plt.subplots(figsize=(6, 4))
-    n, bins, patches = ax.hist(notas, bins=5, range=(0, 100), edgecolor='white', linewidth=0.5) 
+    larguras = np.diff(limites)
+    fig = figura(figsize=(6, 4))
+    ax = fig.subplots()
+    patches = ax.bar(limites[:-1], n, width=larguras, align='edge', edgecolor='white', linewidth=0.5)
     for i, patch in enumerate(patches):
         x_val = patch.get_x() + patch.get_width() / 2
         if x_val < 40: 
@@ -107,6 +131,122 @@ def criar_plot_distribuicao(dados):
     ax.set_yticks([])
     ax.plot(media, -max(n)*0.05, marker='^', color='#333', markersize=10, clip_on=False)
     ax.text(media, -max(n)*0.15, f"{media:.1f}", ha='center', va='top', fontweight='bold', color='#333')
-    plt.tight_layout()
+    fig.tight_layout()
     fig.patch.set_alpha(0.0)
     return fig
+
+def criar_plot_tendencia(tendencia):
+    # Séries anuais já calculadas no banco: nota geral (destacada) e por eixo
+    anos = tendencia['anos']
+    geral = tendencia['geral']
+    if not len(geral['ano']) and not tendencia['eixos']: return None
+
+    fig = figura(figsize=(10, 4))
+    ax = fig.subplots()
+    import matplotlib
+    cores = matplotlib.colormaps['tab10'](np.linspace(0, 1, 10))
+    for i, (eixo, serie) in enumerate(sorted(tendencia['eixos'].items())):
+        ax.plot(serie['ano'], serie['score'], marker='o', linewidth=1.2,
+                alpha=0.7, color=cores[i % 10], label=eixo if len(eixo) <= 40 else eixo[:37] + '...')
+    if len(geral['ano']):
+        ax.plot(geral['ano'], geral['score'], marker='o', linewidth=3, color='#004b8d', label='Geral')
+        for ano, score in zip(geral['ano'], geral['score']):
+            ax.text(ano, score + 3, str(score), ha='center', fontsize=10, fontweight='bold', color='#004b8d')
+    ax.set_xticks(anos)
+    ax.set_xticklabels([str(a) for a in anos])
+    if len(anos) == 1:
+        ax.set_xlim(anos[0] - 1, anos[0] + 1)
+    ax.set_ylim(0, 105)
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.spines['left'].set_color('#cccccc')
+    ax.spines['bottom'].set_color('#cccccc')
+    ax.grid(axis='y', linestyle='--', alpha=0.3)
+    ax.legend(loc='center left', bbox_to_anchor=(1, 0.5), frameon=False, fontsize=8)
+    fig.tight_layout()
+    fig.patch.set_alpha(0.0)
+    return fig
+
+
+# --- RENDERIZAÇÃO COM CACHE ---
+# Mesmo tamanho de figura/DPI que o render.plot usaria: o container do output
+# em pixels lógicos, PPI do matplotlib vezes o pixelratio do navegador.
+PPI = 100
+
+GRAFICOS = {
+    "radar": criar_plot_radar,
+    "donut": criar_plot_donut,
+    "barras": criar_plot_barras,
+    "distribuicao": criar_plot_distribuicao,
+    "tendencia": criar_plot_tendencia,
+}
+
+def figura_png(fig, largura, altura, pixelratio):
+    """PNG (data URI) da figura no tamanho do container; descarta a figura."""
+    try:
+        fig.set_size_inches(largura / PPI, altura / PPI)
+        if fig.get_layout_engine() is None:
+            fig.set_layout_engine("tight")
+        with io.BytesIO() as buf:
+            fig.savefig(buf, format="png", dpi=PPI * pixelratio)
+            return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+    finally:
+        # Quebra as referências circulares figura <-> eixos <-> artistas
+        fig.clear()
+
+def renderizar(tipo, payload, largura, altura, pixelratio):
+    """Desenha o gráfico (roda nos processos de render de tarefas.py); None = vazio."""
+    fig = GRAFICOS[tipo](payload)
+    if fig is None: return None
+    return figura_png(fig, largura, altura, pixelratio)
+
+_em_andamento = {}  # chave -> future do render em curso (mesmo gráfico pedido por várias sessões)
+
+async def grafico_png(tipo, payload, largura, altura, pixelratio):
+    """
+    ImgData do gráfico `tipo`. Consulta o cache de imagens antes do matplotlib:
+    o mesmo payload no mesmo tamanho (o caso comum de "Todos") é desenhado uma
+    vez só, fora do event loop. Pedidos iguais simultâneos esperam o mesmo render.
+    """
+    largura, altura = round(largura), round(altura)
+    chave = impressao_payload(tipo, payload, largura, altura, PPI * pixelratio)
+    src = cache_imagens.obter(chave)
+    if src is None:
+        pendente = _em_andamento.get(chave)
+        if pendente is None:
+            pendente = asyncio.ensure_future(em_processo_de_render(renderizar, tipo, payload, largura, altura, pixelratio))
+            _em_andamento[chave] = pendente
+            pendente.add_done_callback(lambda _: _em_andamento.pop(chave, None))
+        src = await asyncio.shield(pendente)
+        if src is None: return None
+        cache_imagens.guardar(chave, src)
+    return {"src": src, "width": "100%", "height": "100%"}
+
+
+# --- PAYLOADS PARA O NAVEGADOR ---
+# No modo HACKATHON_GRAFICOS=navegador o servidor só manda os números e o
+# www/graficos.js desenha (e redesenha ao redimensionar) no próprio navegador.
+
+def _serie(serie):
+    return {"ano": np.asarray(serie['ano']).tolist(), "score": np.asarray(serie['score']).tolist()}
+
+def dados_grafico(tipo, payload):
+    """Payload compacto (JSON) do gráfico `tipo`; None quando não há o que desenhar."""
+    if tipo == "radar":
+        if not len(payload['eixo']): return None
+        return {"labels": list(payload['eixo']), "values": np.asarray(payload['score']).tolist()}
+    if tipo == "donut":
+        if not payload['total']: return None
+        return {chave: int(payload[chave]) for chave in ("total", "concordo", "neutro", "discordo")}
+    if tipo == "barras":
+        if not len(payload['labels']): return None
+        return {"labels": list(payload['labels']), "values": np.asarray(payload['values']).tolist()}
+    if tipo == "distribuicao":
+        if not payload['total']: return None
+        return {"bins": [int(n) for n in payload['bins']], "limites": list(payload['limites']),
+                "media": round(float(payload['media']), 1)}
+    if tipo == "tendencia":
+        if not len(payload['geral']['ano']) and not payload['eixos']: return None
+        return {"anos": [int(a) for a in payload['anos']], "geral": _serie(payload['geral']),
+                "eixos": {eixo: _serie(serie) for eixo, serie in sorted(payload['eixos'].items())}}
+    raise ValueError(f"Gráfico desconhecido: {tipo}")
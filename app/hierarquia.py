@@ -0,0 +1,79 @@
+# hierarquia.py
+# Índice da hierarquia Setor -> Departamento -> Curso -> Disciplina usado
+# pelos filtros em cascata. É montado a partir da estrutura acadêmica uma vez
+# por geração de dados (registrado em padroes.py) e compartilhado por todas
+# as sessões: trocar um filtro vira uma consulta num dicionário.
+from itertools import product
+
+import numpy as np
+
+from data import get_estrutura_academica
+
+NIVEIS = ["Setor", "Departamento", "Curso", "Nome_Disciplina"]
+# Opção "sem filtro" de cada nível (a disciplina usa o feminino)
+OPCAO_TODOS = {"Setor": "Todos", "Departamento": "Todos", "Curso": "Todos", "Nome_Disciplina": "Todas"}
+
+
+class IndiceHierarquia:
+    """
+    Cada nível é codificado como categórico (códigos inteiros na ordem
+    alfabética). Para cada nível e cada prefixo dos níveis acima, com "Todos"
+    em qualquer posição, guarda a tupla pronta de opções (já com "Todos" na
+    frente). As strings vêm das categorias, então as tuplas só guardam referências.
+    """
+
+    def __init__(self, estrutura):
+        import pandas as pd
+
+        self._categorias = {}
+        self._codigo = {}  # nível -> {valor: código}
+        colunas = []
+        for nivel in NIVEIS:
+            categorico = pd.Categorical(estrutura[nivel]) if nivel in estrutura else pd.Categorical([])
+            self._categorias[nivel] = np.asarray(categorico.categories, dtype=object)
+            self._codigo[nivel] = {valor: i for i, valor in enumerate(self._categorias[nivel])}
+            colunas.append(np.asarray(categorico.codes, dtype=np.int32))
+        codigos = np.column_stack(colunas) if len(estrutura) else np.empty((0, len(NIVEIS)), dtype=np.int32)
+
+        self._opcoes = {}  # (nível, prefixo) -> tupla de opções; None no prefixo = "Todos"
+        for i, nivel in enumerate(NIVEIS):
+            validos = codigos[codigos[:, i] >= 0]  # código -1 = valor vazio, nunca vira opção
+            categorias = self._categorias[nivel]
+            for filtrado in product((False, True), repeat=i):
+                pais = [j for j in range(i) if filtrado[j]]
+                # Pares (prefixo, filho) distintos, em ordem: cada prefixo é um bloco contíguo
+                pares = np.unique(validos[:, pais + [i]], axis=0)
+                if not len(pares):
+                    continue
+                prefixos = pares[:, :-1]
+                inicios = np.flatnonzero(np.r_[True, (prefixos[1:] != prefixos[:-1]).any(axis=1)])
+                fins = np.r_[inicios[1:], len(pares)]
+                for inicio, fim in zip(inicios, fins):
+                    prefixo = iter(prefixos[inicio].tolist())
+                    chave = tuple(next(prefixo) if f else None for f in filtrado)
+                    self._opcoes[(nivel, chave)] = (OPCAO_TODOS[nivel], *categorias[pares[inicio:fim, -1]])
+
+    def opcoes(self, nivel, *filtros):
+        """Opções do `nivel` dados os valores escolhidos nos níveis acima (na ordem de NIVEIS)."""
+        chave = []
+        for pai, valor in zip(NIVEIS, filtros):
+            if not valor or valor == OPCAO_TODOS[pai]:
+                chave.append(None)
+                continue
+            codigo = self._codigo[pai].get(valor)
+            if codigo is None:
+                return (OPCAO_TODOS[nivel],)
+            chave.append(codigo)
+        return self._opcoes.get((nivel, tuple(chave)), (OPCAO_TODOS[nivel],))
+
+    def estatisticas(self):
+        return {
+            "categorias": {nivel: len(valores) for nivel, valores in self._categorias.items()},
+            "prefixos": len(self._opcoes),
+            "opcoes": sum(len(opcoes) for opcoes in self._opcoes.values()),
+        }
+
+
+def montar_indice():
+    """Consulta a estrutura acadêmica e monta o índice (chamado pelo aquecimento)."""
+    return IndiceHierarquia(get_estrutura_academica())
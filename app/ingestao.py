@@ -1,7 +1,19 @@
 # ingestao.py
-import pandas as pd
 import duckdb
 import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from banco import pool, nova_geracao, transacao
+from cubo import garantir_cubo, atualizar_cubo, sql_chaves_no, sql_codigo_tipo, guardar_eixos, marcar_eixos_alterados
+from armazenamento import garantir_config, diretorio_parquet, gravar_parquet, sql_ordem_fatos, arquivos_parquet
+import cache_planilhas
+
+try:
+    import pyarrow as pa
+except ImportError:  # opcional: sem pyarrow os lotes vão como DataFrame do pandas
+    pa = None
 
 # ============================================================
 # CONFIGURAÇÕES DO EXCEL
@@ -35,96 +47,618 @@ COLUNAS = {
     ],
 }
 
-def carregar_excel(path_excel: str) -> dict:
-    """Lê o Excel em memória."""
+# Colunas do banco que não vêm do Excel. O mesmo código de TipoPergunta tem
+# eixos diferentes em cada família de pesquisa (ex.: DsAO nos Cursos e nas
+# Disciplinas): a dTipoPergunta de cada planilha leva a família (cubo.TipoCod)
+# dos fatos da mesma planilha, gravada ao juntar as planilhas (juntar_preparacoes).
+COLUNAS_DERIVADAS = {
+    "dTipoPergunta": {"TipoCod": "TINYINT"},
+}
+
+# Chave natural de cada tabela, usada com evitar_duplicatas. Dimensões com
+# chave são upsert (a linha do upload substitui as do banco com a mesma
+# chave); nos fatos a linha já existente fica e a do upload é ignorada.
+# Tabelas fora daqui usam a linha inteira como chave (a dUnidade não tem
+# código estável). Reenviar a dTipoPergunta de uma família troca o eixo só
+# nela. A disciplina é oferecida a vários cursos: a chave inclui o curso. Na
+# pesquisa institucional o mesmo respondente avalia várias unidades: a
+# chave dos fatos inclui a SiglaLotação.
+CHAVES_NATURAIS = {
+    "dCurso": ["Cod_Curso"],
+    "dDisciplina": ["Cod_Disciplina", "Cod_Curso"],
+    "dPergunta": ["ID_Pergunta"],
+    "dTipoPergunta": ["TipoPergunta", "TipoCod"],
+    "fAvaliacao": ["ID_Pesquisa", "ID_Pergunta", "Cod_Disciplina", "Cod_Curso", "SiglaLotação"],
+}
+
+# Tipo de cada coluna lida do Excel (as demais são VARCHAR, como nas tabelas do banco)
+TIPOS_COLUNAS = {
+    "ID_Pesquisa": "BIGINT",
+    "ID_Pergunta": "BIGINT",
+    "Ordem": "BIGINT",
+    "Ano": "INTEGER",
+}
+
+# Linhas por lote na leitura do Excel: o pico de memória depende disso, não do arquivo
+TAMANHO_LOTE = int(os.environ.get("HACKATHON_LOTE_INGESTAO", "50000"))
+
+# ============================================================
+# DICIONÁRIO DE RESPOSTAS
+# ============================================================
+
+# Classe canônica de cada resposta (texto já sem espaços nas pontas):
+# 1 = concordância, 0 = neutra, -1 = discordância. Textos fora do mapa
+# entram na dResposta com Classe NULL e aparecem na auditoria (checagem.py).
+MAPA_RESPOSTAS = {
+    "Concordo": 1,
+    "Sim": 1,
+    "Concordo Totalmente": 1,
+    "Satisfatório": 1,
+    "Ótimo": 1,
+    "Bom": 1,
+    "Desconheço": 0,
+    "Indiferente": 0,
+    "Neutro": 0,
+    "Discordo": -1,
+    "Não": -1,
+    "Discordo Totalmente": -1,
+    "Ruim": -1,
+    "Péssimo": -1,
+}
+
+def sql_mapa_respostas() -> str:
+    """MAPA_RESPOSTAS como relação SQL (Resposta, Classe)."""
+    valores = ", ".join(
+        "('{}', {})".format(texto.replace("'", "''"), classe)
+        for texto, classe in MAPA_RESPOSTAS.items()
+    )
+    return f"(SELECT * FROM (VALUES {valores}) AS m(Resposta, Classe))"
+
+def garantir_esquema(con):
+    """Cria dResposta e as colunas codificadas da fAvaliacao (idempotente)."""
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS dResposta (
+            ID_Resposta SMALLINT,
+            Resposta VARCHAR,
+            Classe TINYINT
+        )
+    """)
+    garantir_config(con)
+    if diretorio_parquet(con) is None:
+        # Em Parquet a view já expõe ID_Resposta/Classe (ver armazenamento.py)
+        con.execute("ALTER TABLE fAvaliacao ADD COLUMN IF NOT EXISTS ID_Resposta SMALLINT")
+        con.execute("ALTER TABLE fAvaliacao ADD COLUMN IF NOT EXISTS Classe TINYINT")
+    garantir_cubo(con)
+
+def registrar_respostas(con, origem):
+    """Cadastra na dResposta os textos de `origem` (relação com coluna Resposta) ainda desconhecidos."""
+    con.execute(f"""
+        INSERT INTO dResposta
+        SELECT
+            (SELECT COALESCE(MAX(ID_Resposta), 0) FROM dResposta) + ROW_NUMBER() OVER (ORDER BY novas.Resposta),
+            novas.Resposta,
+            m.Classe
+        FROM (
+            SELECT DISTINCT TRIM(Resposta) AS Resposta
+            FROM {origem}
+            WHERE Resposta IS NOT NULL
+        ) novas
+        LEFT JOIN {sql_mapa_respostas()} m ON novas.Resposta = m.Resposta
+        WHERE novas.Resposta NOT IN (SELECT Resposta FROM dResposta)
+    """)
+
+def atualizar_respostas(con):
+    """
+    Registra na dResposta os textos novos, reaplica MAPA_RESPOSTAS e preenche
+    ID_Resposta/Classe das linhas da fAvaliacao que ainda não foram codificadas.
+    """
+    em_parquet = diretorio_parquet(con) is not None
+    if not em_parquet:
+        # Em Parquet os textos são cadastrados antes de gravar cada lote
+        registrar_respostas(con, "(SELECT Resposta FROM fAvaliacao WHERE ID_Resposta IS NULL)")
+
+    # Mudanças no mapa valem também para textos já cadastrados
+    con.execute(f"""
+        UPDATE dResposta
+        SET Classe = m.Classe
+        FROM {sql_mapa_respostas()} m
+        WHERE dResposta.Resposta = m.Resposta AND dResposta.Classe IS DISTINCT FROM m.Classe
+    """)
+    con.execute(f"""
+        UPDATE dResposta
+        SET Classe = NULL
+        WHERE Classe IS NOT NULL AND Resposta NOT IN (SELECT Resposta FROM {sql_mapa_respostas()})
+    """)
+
+    if em_parquet:
+        # A view busca a Classe na dResposta: nada a reescrever nos arquivos
+        print("[INFO] Dicionário de respostas atualizado.")
+        return
+
+    con.execute("""
+        UPDATE fAvaliacao f
+        SET ID_Resposta = r.ID_Resposta, Classe = r.Classe
+        FROM dResposta r
+        WHERE f.ID_Resposta IS NULL AND TRIM(f.Resposta) = r.Resposta
+    """)
+    con.execute("""
+        UPDATE fAvaliacao f
+        SET Classe = r.Classe
+        FROM dResposta r
+        WHERE f.ID_Resposta = r.ID_Resposta AND f.Classe IS DISTINCT FROM r.Classe
+    """)
+    print("[INFO] Dicionário de respostas atualizado.")
+
+# ============================================================
+# LEITURA EM STREAMING
+# ============================================================
+
+def abrir_excel(path_excel: str):
+    """Abre o Excel em modo somente leitura (as linhas são lidas sob demanda)."""
+    from openpyxl import load_workbook
     try:
-        excel = pd.ExcelFile(path_excel)
-        dfs = {sheet: pd.read_excel(excel, sheet) for sheet in excel.sheet_names}
-        print(f"[INFO] Excel carregado. Abas: {list(dfs.keys())}")
-        return dfs
+        return load_workbook(path_excel, read_only=True, data_only=True)
     except Exception as e:
         raise Exception(f"Erro ao ler Excel: {e}")
 
-def validar_abas(dfs):
+def ler_cabecalhos(wb) -> dict:
+    """Primeira linha de cada aba. O corpo das abas ainda não é lido."""
+    cabecalhos = {}
+    for ws in wb.worksheets:
+        primeira = next(ws.iter_rows(max_row=1, values_only=True), ())
+        cabecalhos[ws.title] = [str(c) if c is not None else None for c in primeira]
+    return cabecalhos
+
+def validar_abas(cabecalhos):
     """Valida se todas as abas obrigatórias estão presentes."""
-    faltando = [a for a in ABAS_OBRIGATORIAS if a not in dfs]
+    faltando = [a for a in ABAS_OBRIGATORIAS if a not in cabecalhos]
     if faltando:
         raise Exception(f"Abas faltando no Excel: {faltando}")
     print("[INFO] Todas as abas obrigatórias presentes.")
 
-def validar_colunas(dfs):
+def validar_colunas(cabecalhos):
     """Valida se todas as colunas necessárias estão presentes."""
     for aba, cols in COLUNAS.items():
-        if aba not in dfs:
+        if aba not in cabecalhos:
             continue
-        colunas_faltando = set(cols) - set(dfs[aba].columns)
+        colunas_faltando = set(cols) - set(cabecalhos[aba])
         if colunas_faltando:
             raise Exception(f"Colunas faltantes em {aba}: {colunas_faltando}")
     print("[INFO] Todas as colunas necessárias presentes.")
 
+# Textos lidos como vazio (os mesmos do read_excel do pandas; "#N/A" também é o erro do Excel)
+TEXTOS_NULOS = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+
+def _inteiro(valor):
+    if valor is None or isinstance(valor, int):
+        return valor
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    if isinstance(valor, str):
+        texto = valor.strip()
+        if texto in TEXTOS_NULOS:
+            return None
+        numero = float(texto)
+        if numero.is_integer():
+            return int(numero)
+    raise ValueError
+
+def _texto(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, str):
+        return None if valor in TEXTOS_NULOS else valor
+    # Códigos numéricos gravados como número no Excel: 123.0 -> "123"
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor)
+
+CONVERSORES = {"BIGINT": _inteiro, "INTEGER": _inteiro, "VARCHAR": _texto}
+TIPOS_PANDAS = {"BIGINT": "Int64", "INTEGER": "Int32", "VARCHAR": object}
+
+TIPOS_DERIVADOS = {col: tipo for colunas in COLUNAS_DERIVADAS.values() for col, tipo in colunas.items()}
+
+def tipo_coluna(col):
+    return TIPOS_COLUNAS.get(col) or TIPOS_DERIVADOS.get(col, "VARCHAR")
+
+def colunas_banco(tabela):
+    """Colunas da tabela no banco vindas da planilha: as da aba e as derivadas."""
+    return COLUNAS[tabela] + list(COLUNAS_DERIVADAS.get(tabela, {}))
+
+def montar_lote(colunas, valores):
+    """Lote colunar tipado: tabela Arrow se houver pyarrow, senão DataFrame."""
+    if pa is not None:
+        tipos_arrow = {"BIGINT": pa.int64(), "INTEGER": pa.int32(), "VARCHAR": pa.string()}
+        return pa.table({col: pa.array(valores[col], type=tipos_arrow[tipo_coluna(col)]) for col in colunas})
+    import pandas as pd
+    return pd.DataFrame({col: pd.array(valores[col], dtype=TIPOS_PANDAS[tipo_coluna(col)]) for col in colunas})
+
+def iterar_lotes(ws, cabecalho, colunas, tamanho_lote=TAMANHO_LOTE):
+    """
+    Percorre as linhas da aba e gera (lote, linhas) com até `tamanho_lote`
+    linhas das `colunas`, já convertidas. Linhas totalmente vazias são ignoradas.
+    """
+    indices = [cabecalho.index(col) for col in colunas]
+    conversores = [CONVERSORES[tipo_coluna(col)] for col in colunas]
+    valores = {col: [] for col in colunas}
+    n = 0
+    for numero, linha in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
+        celulas = [linha[i] if i < len(linha) else None for i in indices]
+        convertidos = []
+        for col, converter, celula in zip(colunas, conversores, celulas):
+            try:
+                convertidos.append(converter(celula))
+            except ValueError:
+                raise Exception(f"Valor inválido em {ws.title}, linha {numero}, coluna {col}: {celula!r} (esperado {tipo_coluna(col)})")
+        if all(v is None for v in convertidos):
+            continue
+        for col, valor in zip(colunas, convertidos):
+            valores[col].append(valor)
+        n += 1
+        if n == tamanho_lote:
+            yield montar_lote(colunas, valores), n
+            valores = {col: [] for col in colunas}
+            n = 0
+    if n:
+        yield montar_lote(colunas, valores), n
+
+def contar_linhas(ws):
+    """Linhas de dados (sem o cabeçalho) que não estão totalmente vazias."""
+    return sum(1 for linha in ws.iter_rows(min_row=2, values_only=True) if any(c is not None for c in linha))
+
+def sql_definicao(tabela, derivadas=False):
+    """Colunas tipadas da tabela de preparação (CREATE TABLE); com `derivadas`, as de colunas_banco."""
+    colunas = colunas_banco(tabela) if derivadas else COLUNAS[tabela]
+    return ", ".join(f'"{col}" {tipo_coluna(col)}' for col in colunas)
+
+def preparar_excel(path_excel: str, destino: str, tamanho_lote=TAMANHO_LOTE, progresso=None, tabelas=None) -> dict:
+    """
+    Lê as abas do Excel em streaming e grava cada uma, já tipada, numa tabela
+    do DuckDB `destino` (arquivo de preparação, fora do banco principal).
+    Os cabeçalhos são validados antes de ler qualquer linha. Retorna {tabela: linhas}.
+    `progresso("lendo", tabela, linhas)` é chamado a cada lote, se informado.
+    `tabelas` restringe a leitura a algumas abas (ex.: uma parte da leitura paralela).
+    """
+    wb = abrir_excel(path_excel)
+    try:
+        cabecalhos = ler_cabecalhos(wb)
+        print(f"[INFO] Excel aberto. Abas: {list(cabecalhos)}")
+        validar_abas(cabecalhos)
+        validar_colunas(cabecalhos)
+
+        linhas = {}
+        con = duckdb.connect(destino)
+        try:
+            for tabela in (tabelas or COLUNAS):
+                colunas = COLUNAS[tabela]
+                con.execute(f'CREATE TABLE "{tabela}" ({sql_definicao(tabela)})')
+                linhas[tabela] = 0
+                for lote, n in iterar_lotes(wb[tabela], cabecalhos[tabela], colunas, tamanho_lote):
+                    con.register("lote_excel", lote)
+                    con.execute(f'INSERT INTO "{tabela}" SELECT * FROM lote_excel')
+                    con.unregister("lote_excel")
+                    linhas[tabela] += n
+                    if progresso:
+                        progresso("lendo", tabela, linhas[tabela])
+                print(f"[INFO] {linhas[tabela]} linhas lidas da aba {tabela}")
+        finally:
+            con.close()
+        return linhas
+    finally:
+        wb.close()
+
+# Tudo que muda o resultado da leitura entra na chave do cache de planilhas
+# (VERSAO_LEITURA sobe quando os conversores mudam)
+VERSAO_LEITURA = 1
+FORMATO_PREPARACAO = repr((VERSAO_LEITURA, COLUNAS, TIPOS_COLUNAS, sorted(TEXTOS_NULOS)))
+
+def chave_planilha(path_excel: str) -> str:
+    """Chave do arquivo no cache de planilhas (conteúdo + formato da leitura)."""
+    return cache_planilhas.impressao_arquivo(path_excel, FORMATO_PREPARACAO)
+
+def preparar_com_cache(path_excel: str, destino: str, progresso=None) -> dict:
+    """preparar_excel, mas um arquivo já convertido antes sai do cache de planilhas."""
+    chave = chave_planilha(path_excel)
+    linhas = cache_planilhas.carregar(chave, destino)
+    if linhas is None:
+        linhas = preparar_excel(path_excel, destino, progresso=progresso)
+        cache_planilhas.guardar(chave, [(destino, list(linhas))])
+    return linhas
+
+def juntar_preparacoes(planilhas, destino: str) -> dict:
+    """
+    Junta num único arquivo de preparação as partes lidas em separado, para
+    uma só inserção. `planilhas` tem, na ordem dos uploads, a lista de partes
+    (arquivo, [tabelas]) de cada planilha. Aqui entram as COLUNAS_DERIVADAS:
+    a dTipoPergunta de uma planilha vale para as famílias dos fatos dela
+    (TipoCod NULL se a planilha não tem fatos). Retorna {tabela: linhas}.
+    """
+    con = duckdb.connect(destino)
+    try:
+        for tabela in COLUNAS:
+            con.execute(f'CREATE TABLE "{tabela}" ({sql_definicao(tabela, derivadas=True)})')
+        n = 0
+        for partes in planilhas:
+            origem = {}  # tabela -> esquema anexado da parte que a leu
+            for arquivo, tabelas in partes:
+                con.execute("ATTACH '{}' AS parte{} (READ_ONLY)".format(arquivo.replace("'", "''"), n))
+                origem.update((tabela, f"parte{n}") for tabela in tabelas)
+                n += 1
+            for tabela, esquema in origem.items():
+                if tabela == "dTipoPergunta":
+                    familias = "(SELECT NULL::TINYINT AS TipoCod LIMIT 0)"
+                    if "fAvaliacao" in origem:
+                        familias = f'(SELECT DISTINCT {sql_codigo_tipo("TipoPergunta")} AS TipoCod FROM {origem["fAvaliacao"]}.fAvaliacao)'
+                    con.execute(f'INSERT INTO "{tabela}" SELECT tp.*, f.TipoCod FROM {esquema}."{tabela}" tp LEFT JOIN {familias} f ON TRUE ORDER BY tp.rowid')
+                else:
+                    con.execute(f'INSERT INTO "{tabela}" SELECT * FROM {esquema}."{tabela}"')
+            for esquema in set(origem.values()):
+                con.execute(f"DETACH {esquema}")
+        return {tabela: con.execute(f'SELECT COUNT(*) FROM "{tabela}"').fetchone()[0] for tabela in COLUNAS}
+    finally:
+        con.close()
+
+
+def chave_natural(tabela):
+    return CHAVES_NATURAIS.get(tabela, COLUNAS[tabela])
+
+def _sql_parte_chave(alias, col):
+    # Célula vazia no Excel vira NULL, mas bases antigas guardam ''; na chave os dois são iguais
+    valor = f'{alias}."{col}"' if alias else f'"{col}"'
+    return f"NULLIF({valor}, '')" if tipo_coluna(col) == "VARCHAR" else valor
+
+def _sql_mesma_chave(chave, a, b):
+    # Partes da chave podem ser NULL (ex.: Cod_Disciplina fora da pesquisa de disciplina)
+    return " AND ".join(f"{_sql_parte_chave(a, col)} IS NOT DISTINCT FROM {_sql_parte_chave(b, col)}" for col in chave)
+
+def upsert(tabela):
+    """Dimensões com chave natural: a linha do upload substitui a do banco."""
+    return tabela in CHAVES_NATURAIS and tabela != "fAvaliacao"
 
-def inserir_dados_diretamente(con, dfs, evitar_duplicatas=False):
-    """Insere dados diretamente no banco principal."""
+def preparar_lote(con, tabela, origem):
+    """
+    Cria a TEMP TABLE lote_temp com as linhas de `origem` que entram na
+    `tabela`: uma por chave natural e, nos fatos e nas tabelas sem chave
+    declarada, só as que ainda não estão no banco. Nas dimensões com chave,
+    só as chaves novas ou com alguma coluna diferente da do banco, e apaga do
+    banco as linhas que o lote substitui. Repetições dentro do lote
+    seguem a mesma regra, na ordem da planilha (ou dos arquivos): nas
+    dimensões vale a última linha, nos fatos a primeira.
+    Nos fatos, as linhas descartadas com outros valores que a que ficou (ex.:
+    outra Resposta para a mesma chave) são conflitos, não repetições: suas
+    chaves ficam na TEMP TABLE conflitos_temp.
+    Tudo em SQL: o custo acompanha o lote, não a tabela.
+    Retorna (ignoradas, substituidas, conflitantes); ignoradas são só as repetições exatas.
+    """
+    chave = chave_natural(tabela)
+    if tabela in CHAVES_NATURAIS:
+        colunas_chave = ", ".join(_sql_parte_chave(None, col) for col in chave)
+        ordem = "rowid DESC" if upsert(tabela) else "rowid"
+        selecao = f"SELECT * FROM {origem} QUALIFY ROW_NUMBER() OVER (PARTITION BY {colunas_chave} ORDER BY {ordem}) = 1"
+    else:
+        selecao = f"SELECT DISTINCT * FROM {origem}"
+
+    if upsert(tabela):
+        # Upsert: DELETE + INSERT só das chaves que mudam. Uma linha igual à do
+        # banco fica de fora: reenviar a mesma planilha não grava nada (nem
+        # abre uma nova geração dos dados)
+        mesma_chave = _sql_mesma_chave(chave, "l", "t")
+        mesma_linha = _sql_mesma_chave(colunas_banco(tabela), "l", "t")
+        con.execute(f"""
+            CREATE OR REPLACE TEMP TABLE lote_temp AS
+            SELECT * FROM ({selecao}) l
+            WHERE NOT EXISTS (SELECT 1 FROM "{tabela}" t WHERE {mesma_linha})
+               OR EXISTS (SELECT 1 FROM "{tabela}" t WHERE {mesma_chave} AND NOT ({mesma_linha}))
+        """)
+        ignoradas = con.execute(f"SELECT (SELECT COUNT(*) FROM {origem}) - COUNT(*) FROM lote_temp").fetchone()[0]
+        substituidas = con.execute(
+            f'SELECT COUNT(*) FROM "{tabela}" t WHERE EXISTS (SELECT 1 FROM lote_temp l WHERE {_sql_mesma_chave(chave, "l", "t")})'
+        ).fetchone()[0]
+        if substituidas:
+            con.execute(f'DELETE FROM "{tabela}" t WHERE EXISTS (SELECT 1 FROM lote_temp l WHERE {_sql_mesma_chave(chave, "l", "t")})')
+        return ignoradas, substituidas, 0
+
+    # Anti-join: só entra o que o banco ainda não tem
+    con.execute(f"CREATE OR REPLACE TEMP TABLE lote_unico AS {selecao}")
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE lote_temp AS
+        SELECT * FROM lote_unico l
+        WHERE NOT EXISTS (SELECT 1 FROM "{tabela}" t WHERE {_sql_mesma_chave(chave, "l", "t")})
+    """)
+    conflitantes = _separar_conflitos(con, tabela, origem) if tabela in CHAVES_NATURAIS else 0
+    con.execute("DROP TABLE lote_unico")
+    ignoradas = con.execute(f"SELECT (SELECT COUNT(*) FROM {origem}) - COUNT(*) FROM lote_temp").fetchone()[0]
+    return ignoradas - conflitantes, 0, conflitantes
+
+def _separar_conflitos(con, tabela, origem):
+    """
+    Chaves (conflitos_temp) das linhas de `origem` que ficaram de fora com
+    valores diferentes dos da linha que vale: a primeira do lote (lote_unico)
+    ou a do banco. Retorna quantas são.
+    """
+    chave = chave_natural(tabela)
+    colunas_chave = ", ".join(f'l."{col}"' for col in chave)
+    colunas = colunas_banco(tabela)
+    # Dentro do lote: linhas sem uma igual entre as que ficaram
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE conflitos_temp AS
+        SELECT {colunas_chave} FROM {origem} l
+        WHERE NOT EXISTS (SELECT 1 FROM lote_unico u WHERE {_sql_mesma_chave(colunas, "l", "u")})
+    """)
+    # Contra o banco: só quando alguma chave do lote já estava lá (o reenvio)
+    ja_no_banco = con.execute("SELECT (SELECT COUNT(*) FROM lote_unico) - COUNT(*) FROM lote_temp").fetchone()[0]
+    if ja_no_banco:
+        con.execute(f"""
+            INSERT INTO conflitos_temp
+            SELECT {colunas_chave} FROM lote_unico l
+            WHERE NOT EXISTS (SELECT 1 FROM lote_temp x WHERE {_sql_mesma_chave(chave, "l", "x")})
+              AND NOT EXISTS (SELECT 1 FROM "{tabela}" t WHERE {_sql_mesma_chave(colunas, "l", "t")})
+        """)
+    return con.execute("SELECT COUNT(*) FROM conflitos_temp").fetchone()[0]
+
+def inserir_dados_diretamente(con, esquema, linhas_por_tabela, evitar_duplicatas=False, progresso=None):
+    """
+    Insere no banco principal as tabelas preparadas no `esquema` anexado (ver
+    preparar_excel). Não abre transação nem avisa a nova geração: isso fica com
+    quem chama (ver inserir_preparado). `progresso("inserindo", tabela, linhas)`
+    é chamado ao fim de cada tabela, `progresso("conflitantes", tabela, linhas)`
+    quando há linhas em conflito (ver preparar_lote) e `progresso("cubo", ...)`
+    antes do refresh. Com evitar_duplicatas, cada tabela é deduplicada pela CHAVES_NATURAIS.
+    """
     total_registros = 0
+    fatos_inseridos = 0
+    garantir_esquema(con)
+    diretorio_fatos = diretorio_parquet(con)
+    # Nós do cubo a recalcular: os dos fatos do lote e os de perguntas que mudarem de eixo
+    con.execute(f"CREATE OR REPLACE TEMP TABLE chaves_lote AS {sql_chaves_no('fAvaliacao')} LIMIT 0")
+    guardar_eixos(con)
     
-    for tabela, df in dfs.items():
+    for tabela, linhas in linhas_por_tabela.items():
         if tabela not in COLUNAS:
             continue
             
         print(f"[INFO] Processando tabela: {tabela}")
         
-        # Seleciona apenas as colunas definidas
-        colunas_validas = [col for col in COLUNAS[tabela] if col in df.columns]
-        df = df[colunas_validas]
-        
-        # Remove linhas completamente vazias
-        df = df.dropna(how='all')
-        
-        if df.empty:
+        # Linhas vazias já foram descartadas na leitura
+        if not linhas:
             print(f"[INFO] Tabela {tabela} vazia após limpeza. Pulando.")
             continue
         
-        # Se evitar_duplicatas estiver ativado, remove duplicatas baseadas em todas as colunas
+        colunas_validas = colunas_banco(tabela)
         if evitar_duplicatas:
-            df = df.drop_duplicates()
-            print(f"[INFO] Removidas duplicatas da tabela {tabela}")
+            ignoradas, substituidas, conflitantes = preparar_lote(con, tabela, f'{esquema}."{tabela}"')
+            if ignoradas and upsert(tabela):
+                print(f"[INFO] {ignoradas} linhas sem mudança (iguais às do banco ou repetidas pela chave {chave_natural(tabela)}) ignoradas na tabela {tabela}")
+            elif ignoradas:
+                print(f"[INFO] {ignoradas} linhas repetidas (pela chave {chave_natural(tabela)}) ignoradas na tabela {tabela}")
+            if substituidas:
+                print(f"[INFO] {substituidas} linhas da tabela {tabela} substituídas pelas do upload")
+            if conflitantes:
+                exemplos = con.execute("SELECT * FROM conflitos_temp LIMIT 3").fetchall()
+                print(f"[ERRO] {conflitantes} linhas da tabela {tabela} ignoradas por conflito: a chave "
+                      f"{chave_natural(tabela)} já tem outros valores (no banco ou antes no upload). Ex.: {exemplos}")
+                if progresso:
+                    progresso("conflitantes", tabela, conflitantes)
+            con.execute("DROP TABLE IF EXISTS conflitos_temp")
+        else:
+            con.execute(f'CREATE OR REPLACE TEMP TABLE lote_temp AS SELECT * FROM {esquema}."{tabela}"')
         
-        # Insere os dados
-        con.register("df_temp", df)
-        con.execute(f"INSERT INTO {tabela} SELECT * FROM df_temp")
+        # Insere os dados (lista explícita: a fAvaliacao tem colunas derivadas)
+        colunas_sql = ", ".join(f'"{col}"' for col in colunas_validas)
+        if tabela == "fAvaliacao" and diretorio_fatos:
+            # Modo Parquet: o lote vira arquivos novos nas partições (Ano, TipoPergunta)
+            registrar_respostas(con, "lote_temp")
+            gravar_parquet(con, "lote_temp", colunas_validas, COLUNAS["fAvaliacao"], diretorio_fatos)
+        else:
+            # Fatos entram agrupados por tipo/unidade/curso (ver armazenamento.ORDEM_FATOS)
+            ordem = sql_ordem_fatos(colunas_validas) if tabela == "fAvaliacao" else ""
+            con.execute(f"INSERT INTO {tabela} ({colunas_sql}) SELECT {colunas_sql} FROM lote_temp{ordem}")
         
-        registros_inseridos = len(df)
+        registros_inseridos = con.execute("SELECT COUNT(*) FROM lote_temp").fetchone()[0]
+        if tabela == "fAvaliacao":
+            # Guarda os nós do cubo tocados por este lote para o refresh incremental
+            con.execute(f"INSERT INTO chaves_lote {sql_chaves_no('lote_temp')}")
+            fatos_inseridos = registros_inseridos
+        con.execute("DROP TABLE lote_temp")
         total_registros += registros_inseridos
         print(f"[INFO] {registros_inseridos} registros inseridos na tabela {tabela}")
+        if progresso:
+            progresso("inserindo", tabela, registros_inseridos)
+    
+    marcar_eixos_alterados(con, "chaves_lote")
+    if fatos_inseridos:
+        atualizar_respostas(con)
+    if con.execute("SELECT COUNT(*) FROM chaves_lote").fetchone()[0]:
+        if progresso:
+            progresso("cubo", "fAvaliacao", fatos_inseridos)
+        atualizar_cubo(con, "chaves_lote")
+    con.execute("DROP TABLE chaves_lote")
     
     return total_registros
 
+@contextmanager
+def conexao_escrita(path_banco: str):
+    """
+    Conexão de escrita no banco. No banco dos painéis ela vem do pool
+    (pool.escrita()): os dashboards seguem lendo a geração anterior durante
+    a ingestão, em vez de esperar por ela.
+    """
+    if os.path.abspath(path_banco) == os.path.abspath(pool.caminho):
+        with pool.escrita() as con:
+            yield con
+    else:
+        con = duckdb.connect(path_banco)
+        try:
+            yield con
+        finally:
+            con.close()
+
+def inserir_preparado(path_banco: str, preparacao: str, linhas_por_tabela: dict,
+                      evitar_duplicatas=True, progresso=None, ao_conectar=None):
+    """
+    Insere o arquivo de preparação no banco principal numa única transação:
+    se qualquer passo falhar (ou `progresso` levantar exceção para cancelar,
+    o que vale até a chamada com etapa "gravando", logo antes do COMMIT),
+    nada do lote fica no banco e os Parquet novos são apagados.
+    `ao_conectar(con)` recebe a conexão de escrita (e None ao fechar), para
+    quem precisa interrompê-la de outra thread.
+    """
+    with conexao_escrita(path_banco) as con:
+        if ao_conectar:
+            ao_conectar(con)
+        try:
+            con.execute("ATTACH '{}' AS excel (READ_ONLY)".format(preparacao.replace("'", "''")))
+            diretorio_fatos = diretorio_parquet(con)
+            parquet_antes = arquivos_parquet(diretorio_fatos) if diretorio_fatos else set()
+            try:
+                with transacao(con):
+                    total_registros = inserir_dados_diretamente(con, "excel", linhas_por_tabela, evitar_duplicatas, progresso)
+                    # Última chance de cancelar antes do COMMIT
+                    if progresso:
+                        progresso("gravando", None, total_registros)
+            except BaseException:
+                if diretorio_fatos:
+                    for arquivo in arquivos_parquet(diretorio_fatos) - parquet_antes:
+                        os.remove(arquivo)
+                raise
+            finally:
+                con.execute("DETACH DATABASE IF EXISTS excel")
+        finally:
+            if ao_conectar:
+                ao_conectar(None)
+
+    # Avisa conexões e caches de leitura que o banco mudou (só depois do COMMIT
+    # e de o pool ter devolvido a instância de escrita)
+    if total_registros:
+        nova_geracao()
+    return total_registros
+
 def processar_excel(path_excel: str, path_banco_principal: str, evitar_duplicatas=True):
     """Processa arquivo Excel e insere diretamente no banco principal."""
+    pasta_temp = tempfile.mkdtemp(prefix="ingestao_")
     try:
         print(f"[INFO] Iniciando processamento do Excel: {path_excel}")
         print(f"[INFO] Banco principal: {path_banco_principal}")
         
-        # 1. Carregar Excel
-        dfs = carregar_excel(path_excel)
-        
-        # 2. Validar estrutura
-        validar_abas(dfs)
-        validar_colunas(dfs)
-        
-        # 3. Conectar ao banco principal
-        con = duckdb.connect(path_banco_principal)
+        # 1. Validar a estrutura e ler o Excel em lotes para um DuckDB de preparação
+        # (o banco principal continua disponível para os dashboards enquanto isso).
+        # Um arquivo já lido antes vem do cache de planilhas, sem abrir o Excel.
+        lida = os.path.join(pasta_temp, "planilha.duckdb")
+        tabelas = list(preparar_com_cache(path_excel, lida))
+        preparacao = os.path.join(pasta_temp, "excel.duckdb")
+        linhas = juntar_preparacoes([[(lida, tabelas)]], preparacao)
         
-
-        
-        # 5. Inserir dados diretamente
-        total_registros = inserir_dados_diretamente(con, dfs, evitar_duplicatas)
-        
-        con.close()
+        # 2. Inserir no banco principal, tudo ou nada
+        total_registros = inserir_preparado(path_banco_principal, preparacao, linhas, evitar_duplicatas)
         
         print(f"[SUCESSO] {total_registros} registros inseridos no banco principal.")
         return total_registros
         
     except Exception as e:
         print(f"[ERRO] Falha ao processar Excel: {e}")
-        raise Exception(f"Erro ao processar Excel: {e}")
\ No newline at end of file
+        raise Exception(f"Erro ao processar Excel: {e}")
+    finally:
+        shutil.rmtree(pasta_temp, ignore_errors=True)
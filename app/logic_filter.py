@@ -1,47 +1,47 @@
 from shiny import reactive, ui
-import pandas as pd
-from data import df_estrutura  # Importa o DF para poder filtrar
+from padroes import payloads_padrao  # Índice da hierarquia compartilhado (hierarquia.py)
+
+def setup_cascading_filters(input, ui_session, limite, ativo=lambda: True, geracao=lambda: None):
+    # `limite`: semáforo da sessão (tarefas.limite_por_sessao) para montar o índice no executor
+    # `ativo`: nada é calculado/enviado até a aba de disciplinas ser aberta
+    # `geracao`: a cada upload as listas são refeitas com o índice novo
+    # As opções saem prontas do índice: cada troca de filtro é uma consulta a um dicionário
+    async def indice():
+        return await payloads_padrao.aguardar("hierarquia", limite)
+
+    async def atualizar(id_select, nivel, *filtros):
+        geracao()
+        try:
+            opcoes = list((await indice()).opcoes(nivel, *filtros))
+        except Exception as e:
+            # Sem o índice o select fica com as opções que já tinha
+            print(f"[ERRO] Falha ao atualizar as opções de {id_select}: {e}")
+            return
+        with reactive.isolate():
+            # Mantém a escolha do usuário se ela continuar entre as opções
+            atual = input[id_select]() if input[id_select].is_set() else None
+        ui_session.update_select(id_select, choices=opcoes, selected=atual if atual in opcoes else None)
 
-def setup_cascading_filters(input, ui_session):
-    
     # 1. Popula Setor (Inicialização)
-    setores = sorted(df_estrutura['Setor'].dropna().unique().tolist())
-    ui_session.update_select("disc_setor", choices=["Todos"] + setores)
+    @reactive.effect
+    async def _():
+        if not ativo(): return
+        await atualizar("disc_setor", "Setor")
 
     # 2. Atualiza Depto
     @reactive.effect
-    def _():
-        setor = input.disc_setor()
-        if setor == "Todos" or not setor:
-            opcoes = sorted(df_estrutura['Departamento'].dropna().unique().tolist())
-        else:
-            opcoes = sorted(df_estrutura[df_estrutura['Setor'] == setor]['Departamento'].dropna().unique().tolist())
-        ui_session.update_select("disc_depto", choices=["Todos"] + opcoes)
+    async def _():
+        if not ativo(): return
+        await atualizar("disc_depto", "Departamento", input.disc_setor())
 
     # 3. Atualiza Curso
     @reactive.effect
-    def _():
-        depto = input.disc_depto()
-        mask = pd.Series([True] * len(df_estrutura))
-        if input.disc_setor() != "Todos": mask &= (df_estrutura['Setor'] == input.disc_setor())
-        
-        if depto != "Todos":
-            mask &= (df_estrutura['Departamento'] == depto)
-            
-        opcoes = sorted(df_estrutura[mask]['Curso'].dropna().unique().tolist())
-        ui_session.update_select("disc_curso", choices=["Todos"] + opcoes)
+    async def _():
+        if not ativo(): return
+        await atualizar("disc_curso", "Curso", input.disc_setor(), input.disc_depto())
 
     # 4. Atualiza Disciplina
     @reactive.effect
-    def _():
-        curso = input.disc_curso()
-        mask = pd.Series([True] * len(df_estrutura))
-        
-        if input.disc_setor() != "Todos": mask &= (df_estrutura['Setor'] == input.disc_setor())
-        if input.disc_depto() != "Todos": mask &= (df_estrutura['Departamento'] == input.disc_depto())
-        
-        if curso != "Todos":
-            mask &= (df_estrutura['Curso'] == curso)
-            
-        opcoes = sorted(df_estrutura[mask]['Nome_Disciplina'].dropna().unique().tolist())
-        ui_session.update_select("disc_disciplina", choices=["Todas"] + opcoes)
\ No newline at end of file
+    async def _():
+        if not ativo(): return
+        await atualizar("disc_disciplina", "Nome_Disciplina", input.disc_setor(), input.disc_depto(), input.disc_curso())
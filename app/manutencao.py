@@ -0,0 +1,74 @@
+# manutencao.py
+# Rotinas de manutenção do banco principal. Uso:
+#   python manutencao.py esquema [--banco CAMINHO]
+#   python manutencao.py cubo [--banco CAMINHO]
+#   python manutencao.py parquet [--banco CAMINHO] [--diretorio DIR]
+#   python manutencao.py tabela [--banco CAMINHO]
+#   python manutencao.py reclusterizar [--banco CAMINHO]
+import argparse
+
+import duckdb
+
+from banco import DB_PATH
+from ingestao import COLUNAS, garantir_esquema, atualizar_respostas
+from cubo import reconstruir_cubo
+from armazenamento import diretorio_padrao, migrar_para_parquet, migrar_para_tabela, reclusterizar_fatos
+
+
+def cmd_esquema(con, args):
+    """Cria dResposta/colunas codificadas, codifica as respostas e monta o cubo."""
+    garantir_esquema(con)
+    atualizar_respostas(con)
+    reconstruir_cubo(con)
+
+
+def cmd_cubo(con, args):
+    """Reconstrói o aggAvaliacao (ex.: depois de alterar dPergunta/dTipoPergunta)."""
+    reconstruir_cubo(con)
+
+
+def cmd_parquet(con, args):
+    """Move a fAvaliacao para um dataset Parquet particionado por Ano e TipoPergunta."""
+    garantir_esquema(con)
+    atualizar_respostas(con)
+    migrar_para_parquet(con, args.diretorio or diretorio_padrao(args.banco), COLUNAS["fAvaliacao"])
+
+
+def cmd_tabela(con, args):
+    """Traz a fAvaliacao de volta do Parquet para uma tabela do DuckDB."""
+    migrar_para_tabela(con)
+
+
+def cmd_reclusterizar(con, args):
+    """Reordena fAvaliacao e cubo pelas chaves de filtro (depois de muitos uploads)."""
+    reclusterizar_fatos(con)
+    reconstruir_cubo(con)
+
+
+COMANDOS = {
+    "esquema": cmd_esquema,
+    "cubo": cmd_cubo,
+    "parquet": cmd_parquet,
+    "tabela": cmd_tabela,
+    "reclusterizar": cmd_reclusterizar,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manutenção do banco do dashboard CPA.")
+    parser.add_argument("comando", choices=sorted(COMANDOS))
+    parser.add_argument("--banco", default=DB_PATH, help="Caminho do arquivo DuckDB")
+    parser.add_argument("--diretorio", help="Dataset Parquet da fAvaliacao (padrão: pasta 'fatos' ao lado do banco)")
+    args = parser.parse_args()
+
+    print(f"[INFO] Banco: {args.banco}")
+    con = duckdb.connect(args.banco)
+    try:
+        COMANDOS[args.comando](con, args)
+    finally:
+        con.close()
+    print(f"[SUCESSO] Comando '{args.comando}' concluído.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,21 @@
-from shiny import module, ui, render, reactive
+import os
+
+from shiny import module, ui, render, reactive, req
+from shiny.module import resolve_id
+from shiny.render.renderer import Renderer
 from shiny.ui import tags
 from graphs import *
-from components import card_excelencia_ui, lista_kpis_ui
+from components import card_excelencia_ui, lista_kpis_ui, tabela_variacoes_ui
+
+# Onde os gráficos são desenhados: "servidor" (PNG do matplotlib, com cache)
+# ou "navegador" (payload compacto desenhado pelo www/graficos.js)
+MODO_GRAFICOS = os.environ.get("HACKATHON_GRAFICOS", "servidor")
+GRAFICOS_NO_NAVEGADOR = MODO_GRAFICOS == "navegador"
+
+def saida_grafico(id_saida, tipo):
+    if GRAFICOS_NO_NAVEGADOR:
+        return tags.div(id=resolve_id(id_saida), class_="grafico-cliente", data_tipo=tipo)
+    return ui.output_plot(id_saida, width="100%", height="100%")
 
 # --- UI GENÉRICA DO MÓDULO ---
 @module.ui
@@ -12,6 +26,9 @@ def dashboard_ui(titulo, filtro_customizado_ui):
         # BLOCO DE FILTRO (Injetado)
         filtro_customizado_ui,
 
+        # Aviso de carregamento (consulta em segundo plano)
+        ui.output_ui("aviso_carregando"),
+
         # Card Excelência
         ui.output_ui("card_excelencia"),
 
@@ -53,7 +70,7 @@ def dashboard_ui(titulo, filtro_customizado_ui):
         ui.panel_conditional(
             "input.view_mode === 'radar'",
             tags.div(
-                ui.output_plot("grafico_radar", width="100%", height="100%"),
+                saida_grafico("grafico_radar", "radar"),
                 class_="radar-container"
             )
         ),
@@ -65,27 +82,58 @@ def dashboard_ui(titulo, filtro_customizado_ui):
         ui.layout_column_wrap(
             tags.div(
                 tags.div("Status Geral das Respostas", class_="chart-title"),
-                ui.output_plot("grafico_donut", width="100%", height="100%"),
+                saida_grafico("grafico_donut", "donut"),
                 class_="chart-box"
             ),
             tags.div(
                 tags.div("Destaques (Top/Bottom)", class_="chart-title"),
-                ui.output_plot("grafico_barras", width="100%", height="100%"),
+                saida_grafico("grafico_barras", "barras"),
                 class_="chart-box"
             ),
             tags.div(
                 tags.div("Consistência das Avaliações", class_="chart-title"),
-                ui.output_plot("grafico_dist", width="100%", height="100%"),
+                saida_grafico("grafico_dist", "distribuicao"),
                 class_="chart-box"
             ),
             width=1/3,
         ),
+
+        # EVOLUÇÃO ANUAL (todos os anos do recorte, independente do filtro de ano)
+        tags.hr(),
+        tags.h5("Evolução por Ano", style="margin-bottom: 20px; color: #666;"),
+        ui.layout_columns(
+            tags.div(
+                tags.div("Nota Geral e por Eixo", class_="chart-title"),
+                saida_grafico("grafico_tendencia", "tendencia"),
+                class_="chart-box"
+            ),
+            tags.div(
+                tags.div("Maiores Variações", class_="chart-title"),
+                ui.output_ui("tabela_variacoes"),
+                class_="chart-box",
+                style="overflow-y: auto; justify-content: flex-start;"
+            ),
+            col_widths=(8, 4),
+        ),
         tags.br(), tags.br()
     )
 
 # --- SERVER GENÉRICO DO MÓDULO ---
+class saida_pronta(Renderer[dict]):
+    """
+    Envia o dict como está: o ImgData com o PNG já embutido (cache de
+    gráficos) ou, no modo navegador, o payload compacto do gráfico.
+    """
+    async def transform(self, value):
+        return dict(value)
+
 @module.server
-def dashboard_server(input, output, session, dados_getter, donut_getter, barras_getter, dist_getter):
+def dashboard_server(input, output, session, dados_getter, donut_getter, barras_getter, dist_getter, tendencia_getter, carregando=lambda: False):
+    
+    @render.ui
+    def aviso_carregando():
+        if not carregando(): return None
+        return tags.div(tags.i(class_="fa-solid fa-spinner fa-spin"), " Carregando dados...", class_="loading-banner")
     
     @render.ui
     def card_excelencia(): 
@@ -97,16 +145,33 @@ def dashboard_server(input, output, session, dados_getter, donut_getter, barras_
         _, lista = dados_getter()
         return lista_kpis_ui(lista, input.sort_order())
     
-    @render.plot
-    def grafico_radar(): 
+    async def grafico(tipo, id_saida, payload):
+        if GRAFICOS_NO_NAVEGADOR:
+            # Sem dependência do tamanho: redimensionar não volta ao servidor
+            return dados_grafico(tipo, payload)
+        # Tamanho do container no navegador, como o render.plot faria
+        largura = session.clientdata.output_width(id_saida)
+        altura = session.clientdata.output_height(id_saida)
+        req(largura, altura)
+        # Desenha num processo de render: o event loop segue atendendo as outras sessões
+        return await grafico_png(tipo, payload, largura, altura, session.clientdata.pixelratio())
+
+    @saida_pronta
+    async def grafico_radar(): 
         _, lista = dados_getter()
-        return criar_plot_radar(lista)
+        return await grafico("radar", "grafico_radar", lista)
     
-    @render.plot
-    def grafico_donut(): return criar_plot_donut(donut_getter())
+    @saida_pronta
+    async def grafico_donut(): return await grafico("donut", "grafico_donut", donut_getter())
     
-    @render.plot
-    def grafico_barras(): return criar_plot_barras(barras_getter())
+    @saida_pronta
+    async def grafico_barras(): return await grafico("barras", "grafico_barras", barras_getter())
     
-    @render.plot
-    def grafico_dist(): return criar_plot_distribuicao(dist_getter())
\ No newline at end of file
+    @saida_pronta
+    async def grafico_dist(): return await grafico("distribuicao", "grafico_dist", dist_getter())
+
+    @saida_pronta
+    async def grafico_tendencia(): return await grafico("tendencia", "grafico_tendencia", tendencia_getter())
+
+    @render.ui
+    def tabela_variacoes(): return tabela_variacoes_ui(tendencia_getter()["entidades"])
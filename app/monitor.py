@@ -0,0 +1,240 @@
+# monitor.py
+# Log das consultas da camada de dados: impressão digital do SQL, parâmetros,
+# tempo, linhas e painel de origem. Consultas acima do limiar levam junto o
+# plano do EXPLAIN ANALYZE. O log é JSON por linha, com rotação de arquivos.
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+from banco import conexao
+
+# --- CONFIGURAÇÃO ---
+base_dir = os.path.dirname(os.path.abspath(__file__))
+LOG_CONSULTAS = os.environ.get(
+    "HACKATHON_LOG_CONSULTAS",
+    os.path.abspath(os.path.join(base_dir, "..", "data", "logs", "consultas.log")),
+)
+# Acima deste tempo (ms) a consulta é lenta e ganha EXPLAIN ANALYZE
+LIMIAR_LENTA_MS = float(os.environ.get("HACKATHON_LIMIAR_LENTA_MS", "500"))
+# Intervalo mínimo (s) entre dois EXPLAIN ANALYZE da mesma consulta (ele reexecuta o SQL)
+INTERVALO_EXPLAIN = float(os.environ.get("HACKATHON_INTERVALO_EXPLAIN", "300"))
+# Consultas lentas à espera do EXPLAIN ANALYZE; com a fila cheia o plano fica para depois
+MAX_EXPLAINS_PENDENTES = int(os.environ.get("HACKATHON_MAX_EXPLAINS_PENDENTES", "8"))
+LOG_MAX_BYTES = int(os.environ.get("HACKATHON_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+LOG_ARQUIVOS = int(os.environ.get("HACKATHON_LOG_ARQUIVOS", "3"))
+
+# Painel que disparou a consulta ("inst", "cursos", "disc"); fora deles, "sistema"
+painel_atual = contextvars.ContextVar("painel_atual", default="sistema")
+
+@contextmanager
+def painel(nome):
+    """Marca as consultas feitas dentro do bloco como vindas do painel `nome`."""
+    token = painel_atual.set(nome)
+    try:
+        yield
+    finally:
+        painel_atual.reset(token)
+
+
+# --- LOG EM ARQUIVO ---
+
+_logger = None
+_lock_logger = threading.Lock()
+
+def _obter_logger():
+    global _logger
+    with _lock_logger:
+        if _logger is None:
+            _logger = logging.getLogger("hackathon.consultas")
+            _logger.setLevel(logging.INFO)
+            _logger.propagate = False
+            try:
+                os.makedirs(os.path.dirname(LOG_CONSULTAS), exist_ok=True)
+                handler = RotatingFileHandler(LOG_CONSULTAS, maxBytes=LOG_MAX_BYTES,
+                                              backupCount=LOG_ARQUIVOS, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                _logger.addHandler(handler)
+            except OSError as e:
+                print(f"[ERRO] Não foi possível abrir o log de consultas: {e}")
+                _logger.addHandler(logging.NullHandler())
+        return _logger
+
+
+# --- IMPRESSÃO DIGITAL ---
+
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_ESPACO = re.compile(r"\s+")
+
+def normalizar_sql(query):
+    """SQL sem literais nem espaços extras: consultas de mesmo formato ficam iguais."""
+    sql = _RE_STRING.sub("?", query)
+    sql = _RE_NUMERO.sub("?", sql)
+    return _RE_ESPACO.sub(" ", sql).strip()
+
+def impressao_digital(query):
+    return hashlib.sha1(normalizar_sql(query).encode("utf-8")).hexdigest()[:12]
+
+
+# --- EXECUÇÃO INSTRUMENTADA ---
+
+_ultimo_explain = {}  # impressão digital -> time.monotonic() do último EXPLAIN
+_lock_explain = threading.Lock()
+
+def _deve_explicar(digital):
+    agora = time.monotonic()
+    with _lock_explain:
+        ultimo = _ultimo_explain.get(digital)
+        if ultimo is not None and agora - ultimo < INTERVALO_EXPLAIN:
+            return False
+        _ultimo_explain[digital] = agora
+        return True
+
+def _explain_analyze(conn, query, params):
+    try:
+        linhas = conn.execute(f"EXPLAIN ANALYZE {query}", params).fetchall()
+        return "\n".join(str(linha[-1]) for linha in linhas)
+    except Exception as e:
+        return f"(EXPLAIN ANALYZE falhou: {e})"
+
+# O EXPLAIN ANALYZE reexecuta o SQL: ele roda numa thread própria, com outro
+# cursor do pool, e não no caminho de quem fez a consulta (que não espera a
+# segunda execução nem segura o cursor emprestado por ela). O registro da
+# consulta vai para o log quando o plano chega.
+_fila_explain = queue.Queue(maxsize=MAX_EXPLAINS_PENDENTES)
+_thread_explain = None
+
+def _explicar_pendentes():
+    while True:
+        registro, query, params = _fila_explain.get()
+        try:
+            with conexao() as conn:
+                registro["plano"] = _explain_analyze(conn, query, params)
+        except Exception as e:
+            registro["plano"] = f"(EXPLAIN ANALYZE falhou: {e})"
+        registrar(registro)
+
+def _agendar_explain(registro, query, params):
+    global _thread_explain
+    with _lock_explain:
+        if _thread_explain is None:
+            _thread_explain = threading.Thread(target=_explicar_pendentes, name="explain-consultas", daemon=True)
+            _thread_explain.start()
+    try:
+        _fila_explain.put_nowait((registro, query, params))
+    except queue.Full:
+        # Libera a impressão digital: a próxima execução lenta tenta de novo
+        with _lock_explain:
+            _ultimo_explain.pop(registro["digital"], None)
+        registro["plano"] = "(EXPLAIN ANALYZE adiado: fila de planos cheia)"
+        registrar(registro)
+
+def _buscar(conn, formato):
+    if formato == "df":
+        resultado = conn.df()
+        return resultado, len(resultado)
+    if formato == "one":
+        resultado = conn.fetchone()
+        return resultado, 0 if resultado is None else 1
+    if formato == "numpy":
+        # Colunas como arrays NumPy (MaskedArray onde há NULL), sem passar pelo pandas
+        resultado = conn.fetchnumpy()
+        return resultado, len(next(iter(resultado.values()), ()))
+    resultado = conn.fetchall()
+    return resultado, len(resultado)
+
+def executar(conn, query, params=None, formato="df"):
+    """
+    Executa `query` no cursor e devolve o resultado já lido ("df", "all",
+    "one" ou "numpy"), registrando a execução no log de consultas. Erros são
+    registrados e relançados.
+    """
+    params = list(params or [])
+    digital = impressao_digital(query)
+    inicio = time.perf_counter()
+    erro = None
+    linhas = 0
+    try:
+        conn.execute(query, params)
+        resultado, linhas = _buscar(conn, formato)
+        return resultado
+    except Exception as e:
+        erro = str(e)
+        raise
+    finally:
+        ms = (time.perf_counter() - inicio) * 1000
+        registro = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "digital": digital,
+            "painel": painel_atual.get(),
+            "ms": round(ms, 2),
+            "linhas": linhas,
+            "params": params,
+            "lenta": ms >= LIMIAR_LENTA_MS,
+            "sql": normalizar_sql(query),
+        }
+        if erro is not None:
+            registro["erro"] = erro
+        if erro is None and registro["lenta"] and _deve_explicar(digital):
+            _agendar_explain(registro, query, params)  # registrado junto com o plano
+        else:
+            registrar(registro)
+
+
+# --- REGISTROS RECENTES ---
+
+_recentes = deque(maxlen=500)
+_lock_recentes = threading.Lock()
+
+def registrar(registro):
+    with _lock_recentes:
+        _recentes.append(registro)
+    try:
+        _obter_logger().info(json.dumps(registro, ensure_ascii=False, default=str))
+    except Exception as e:
+        print(f"[ERRO] Falha ao gravar log de consultas: {e}")
+
+def ler_log(limite=500):
+    """Últimos registros do arquivo de log (sobrevive a reinícios); cai para a memória se não houver arquivo."""
+    if not os.path.exists(LOG_CONSULTAS):
+        with _lock_recentes:
+            return list(_recentes)[-limite:]
+    with open(LOG_CONSULTAS, encoding="utf-8") as f:
+        linhas = deque(f, maxlen=limite)
+    registros = []
+    for linha in linhas:
+        try:
+            registros.append(json.loads(linha))
+        except json.JSONDecodeError:
+            continue
+    return registros
+
+def resumo_por_consulta(registros):
+    """Agrupa os registros por impressão digital: execuções, tempos e lentas."""
+    grupos = {}
+    for r in registros:
+        g = grupos.setdefault(r["digital"], {
+            "digital": r["digital"], "execucoes": 0, "lentas": 0, "erros": 0,
+            "ms_total": 0.0, "ms_max": 0.0, "paineis": set(), "sql": r.get("sql", ""),
+        })
+        g["execucoes"] += 1
+        g["lentas"] += bool(r.get("lenta"))
+        g["erros"] += "erro" in r
+        g["ms_total"] += r.get("ms", 0)
+        g["ms_max"] = max(g["ms_max"], r.get("ms", 0))
+        g["paineis"].add(r.get("painel", "sistema"))
+    resumo = []
+    for g in grupos.values():
+        g["ms_medio"] = g["ms_total"] / g["execucoes"]
+        g["paineis"] = ", ".join(sorted(g["paineis"]))
+        resumo.append(g)
+    return sorted(resumo, key=lambda g: g["ms_max"], reverse=True)
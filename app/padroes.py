@@ -0,0 +1,129 @@
+# padroes.py
+# Payloads do estado inicial (filtros "Todos") calculados uma vez por geração
+# de dados e compartilhados, somente leitura, por todas as sessões. O app
+# aquece tudo ao subir; sessões que chegam antes esperam o mesmo cálculo em
+# vez de disparar consultas repetidas.
+import atexit
+import threading
+import time
+
+from banco import geracao_atual, ao_mudar_geracao
+from tarefas import em_segundo_plano
+from data import get_unidades_disponiveis, get_anos_disponiveis, get_snapshot_sql
+from hierarquia import montar_indice
+
+
+class PayloadsPadrao:
+    """Registro de payloads padrão com cálculo único (por nome) a cada geração."""
+
+    def __init__(self):
+        self._itens = {}    # nome -> (funcao, args)
+        self._valores = {}  # nome -> (geracao, valor)
+        self._locks = {}
+        self._aquecido = threading.Event()
+        self._encerrando = threading.Event()
+        self._threads = []
+
+    def registrar(self, nome, funcao, *args):
+        self._itens[nome] = (funcao, args)
+        self._locks[nome] = threading.Lock()
+
+    def atual(self, nome):
+        """(True, valor) se o payload da geração atual já foi calculado."""
+        item = self._valores.get(nome)
+        if item is not None and item[0] == geracao_atual():
+            return True, item[1]
+        return False, None
+
+    def obter(self, nome):
+        achou, valor = self.atual(nome)
+        if achou:
+            return valor
+        with self._locks[nome]:
+            # Outra thread pode ter calculado enquanto esperávamos o lock
+            achou, valor = self.atual(nome)
+            if achou:
+                return valor
+            geracao = geracao_atual()
+            funcao, args = self._itens[nome]
+            valor = funcao(*args)
+            self._valores[nome] = (geracao, valor)
+            return valor
+
+    async def aguardar(self, nome, limite):
+        """
+        obter() para quem roda no event loop: um payload já calculado volta
+        direto; senão a consulta (ou a espera pelo aquecimento, que segura o
+        mesmo lock) vai para o executor de consultas e não trava as sessões.
+        """
+        achou, valor = self.atual(nome)
+        if achou:
+            return valor
+        return await em_segundo_plano(limite, self.obter, nome)
+
+    def envolver(self, nome):
+        """
+        Versão de `funcao` que, chamada com os argumentos padrão, devolve o
+        payload compartilhado; com outros filtros, consulta normalmente.
+        """
+        funcao, args_padrao = self._itens[nome]
+
+        def chamar(*args):
+            if args == args_padrao:
+                return self.obter(nome)
+            return funcao(*args)
+        return chamar
+
+    def aquecer(self):
+        inicio = time.perf_counter()
+        for nome in self._itens:
+            if self._encerrando.is_set():
+                return
+            try:
+                self.obter(nome)
+            except Exception as e:
+                print(f"[ERRO] Falha ao aquecer '{nome}': {e}")
+        self._aquecido.set()
+        print(f"[INFO] Payloads padrão prontos ({(time.perf_counter() - inicio) * 1000:.0f} ms).")
+
+    def aquecer_em_segundo_plano(self):
+        if self._encerrando.is_set():
+            return
+        thread = threading.Thread(target=self.aquecer, name="aquecimento", daemon=True)
+        self._threads = [t for t in self._threads if t.is_alive()] + [thread]
+        thread.start()
+
+    def encerrar(self, timeout=30):
+        """
+        Para o aquecimento e espera a consulta em curso terminar. Chamado na
+        saída do interpretador: uma thread ainda dentro do DuckDB nesse momento
+        derruba o processo ("terminate called without an active exception").
+        """
+        self._encerrando.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def pronto(self):
+        """Verdadeiro depois do primeiro aquecimento (sinal de prontidão do app)."""
+        return self._aquecido.is_set()
+
+    def estado(self):
+        geracao = geracao_atual()
+        return {
+            "pronto": self.pronto(),
+            "geracao": geracao,
+            "atualizados": sorted(nome for nome, (g, _) in self._valores.items() if g == geracao),
+            "pendentes": sorted(nome for nome in self._itens if self._valores.get(nome, (None,))[0] != geracao),
+        }
+
+
+payloads_padrao = PayloadsPadrao()
+payloads_padrao.registrar("unidades", get_unidades_disponiveis)
+payloads_padrao.registrar("anos", get_anos_disponiveis)
+payloads_padrao.registrar("hierarquia", montar_indice)
+payloads_padrao.registrar("inst", get_snapshot_sql, "Institucional", "Todos", "Todos")
+payloads_padrao.registrar("cursos", get_snapshot_sql, "Cursos", "Todos", "Todos")
+
+# Depois de uma ingestão, recalcula em segundo plano para a próxima sessão não pagar a consulta
+ao_mudar_geracao(lambda geracao: payloads_padrao.aquecer_em_segundo_plano())
+atexit.register(payloads_padrao.encerrar)
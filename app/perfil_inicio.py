@@ -0,0 +1,141 @@
+# perfil_inicio.py
+# Perfil da subida do app (opcional, não roda junto com ele). Uso:
+#   python perfil_inicio.py [--banco CAMINHO] [--porta 8799] [--top 15] [--saida perfil.json]
+# Mede, em processos separados:
+#   1. o tempo de importação por módulo (python -X importtime, sem aquecimento);
+#   2. o tempo até o primeiro request servido ("/") e até /pronto responder 200,
+#      contando a partida do interpretador, como num worker novo.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def ambiente(args, **extras):
+    env = dict(os.environ, **extras)
+    if args.banco:
+        env["HACKATHON_DB"] = os.path.abspath(args.banco)
+    return env
+
+
+# --- IMPORTAÇÃO ---
+
+def ler_importtime(saida):
+    """Linhas do -X importtime como (módulo, self_ms, cumulativo_ms, profundidade)."""
+    modulos = []
+    for linha in saida.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        self_us, cumulativo_us, nome = linha[len("import time:"):].split("|")
+        profundidade = (len(nome) - len(nome.lstrip())) // 2
+        modulos.append((nome.strip(), int(self_us) / 1000, int(cumulativo_us) / 1000, profundidade))
+    return modulos
+
+
+def medir_importacao(args):
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=BASE_DIR, env=ambiente(args, HACKATHON_AQUECER="0"),
+        capture_output=True, text=True, timeout=args.timeout,
+    )
+    if processo.returncode != 0:
+        raise SystemExit(f"[ERRO] Falha ao importar o app:\n{processo.stderr[-2000:]}")
+    modulos = ler_importtime(processo.stderr)
+
+    locais = {nome[:-3] for nome in os.listdir(BASE_DIR) if nome.endswith(".py")}
+    por_pacote = defaultdict(float)
+    for nome, self_ms, _, _ in modulos:
+        por_pacote[nome.split(".")[0]] += self_ms
+    total = next((cumulativo for nome, _, cumulativo, prof in modulos if nome == "app" and prof == 0), None)
+
+    def arred(valor):
+        return round(valor, 1)
+
+    return {
+        "total_ms": arred(total) if total is not None else None,
+        "modulos_importados": len(modulos),
+        "modulos_do_app": [
+            {"modulo": nome, "self_ms": arred(self_ms), "cumulativo_ms": arred(cumulativo)}
+            for nome, self_ms, cumulativo, _ in modulos if nome in locais
+        ],
+        "pacotes_mais_lentos": [
+            {"pacote": nome, "self_ms": arred(ms)}
+            for nome, ms in sorted(por_pacote.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        ],
+        "modulos_mais_lentos": [
+            {"modulo": nome, "self_ms": arred(self_ms), "cumulativo_ms": arred(cumulativo)}
+            for nome, self_ms, cumulativo, _ in sorted(modulos, key=lambda m: m[1], reverse=True)[:args.top]
+        ],
+    }
+
+
+# --- PRIMEIRO REQUEST ---
+
+def status_http(url):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as resposta:
+            return resposta.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, ConnectionError, TimeoutError):
+        return None
+
+
+def medir_subida(args):
+    base = f"http://127.0.0.1:{args.porta}"
+    inicio = time.perf_counter()
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(args.porta), "--log-level", "warning"],
+        cwd=BASE_DIR, env=ambiente(args), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    marcos = {"primeiro_request_ms": None, "pronto_ms": None}
+    try:
+        while time.perf_counter() - inicio < args.timeout and None in marcos.values():
+            if servidor.poll() is not None:
+                raise SystemExit(f"[ERRO] O servidor terminou ao subir:\n{servidor.stderr.read()[-2000:]}")
+            decorrido = lambda: round((time.perf_counter() - inicio) * 1000, 1)
+            if marcos["primeiro_request_ms"] is None and status_http(base + "/") == 200:
+                marcos["primeiro_request_ms"] = decorrido()
+            if marcos["pronto_ms"] is None and status_http(base + "/pronto") == 200:
+                marcos["pronto_ms"] = decorrido()
+            time.sleep(0.02)
+    finally:
+        servidor.terminate()
+        try:
+            servidor.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            servidor.kill()
+    return marcos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perfil da subida do dashboard CPA.")
+    parser.add_argument("--banco", default=os.environ.get("HACKATHON_DB"), help="Arquivo DuckDB (padrão: HACKATHON_DB ou o banco do app)")
+    parser.add_argument("--porta", type=int, default=8799)
+    parser.add_argument("--top", type=int, default=15, help="Módulos/pacotes listados entre os mais lentos")
+    parser.add_argument("--timeout", type=float, default=120, help="Limite (s) de cada medição")
+    parser.add_argument("--saida", help="Grava o JSON neste arquivo além de imprimir")
+    args = parser.parse_args()
+
+    importacao = medir_importacao(args)
+    print(f"[INFO] import app: {importacao['total_ms']} ms", file=sys.stderr)
+    subida = medir_subida(args)
+    print(f"[INFO] primeiro request: {subida['primeiro_request_ms']} ms, /pronto: {subida['pronto_ms']} ms", file=sys.stderr)
+
+    relatorio = {"banco": args.banco, "python": sys.version.split()[0], "importacao": importacao, "subida": subida}
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    print(texto)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+# sintetico.py
+# Gera uma base sintética com o mesmo esquema das planilhas (ingestao.COLUNAS)
+# para medir desempenho sem os dados reais. Uso:
+#   python sintetico.py --linhas 1000000 --saida ../data/db/sintetico.duckdb
+#   HACKATHON_DB=../data/db/sintetico.duckdb python benchmark.py
+import argparse
+import os
+import time
+
+import duckdb
+
+from ingestao import COLUNAS, sql_definicao, garantir_esquema, atualizar_respostas
+from cubo import reconstruir_cubo, codigo_tipo
+
+# Tipos de pergunta por família de pesquisa (códigos e eixos das planilhas reais)
+TIPOS_PERGUNTA = {
+    "Institucional": [
+        ("RsSc", "Responsabilidade Social"),
+        ("MsãoPDI", "Missão e Plano de Desenvolvimento Institucional"),
+        ("PolPes", "Políticas de Pessoal"),
+        ("OrgGesInst", "Organização e Gestão da Instituição"),
+        ("SustFin", "Sustentabilidade Financeira"),
+        ("CiEx", "Comunicação Com a Sociedade"),
+        ("AsEs", "Política de Atendimento aos Discentes"),
+    ],
+    "Cursos": [
+        ("PlAc", "Políticas Acadêmicas"),
+        ("AvPDSPF", "Avaliação da percepção discente sobre o processo formativo"),
+    ],
+    "Disciplina": [
+        ("DsAO", "Abordagem e organização da disciplina"),
+        ("AtPM", "Atuação do Professor e do Monitor"),
+        ("AAvE", "Autoavaliação do estudante e considerações adicionais"),
+    ],
+}
+# Faixa de ID_Pergunta de cada família
+BASE_PERGUNTA = {"Institucional": 1000, "Cursos": 2000, "Disciplina": 3000}
+# Uma a cada tantas disciplinas é oferecida a mais de um curso (como nas
+# planilhas reais, onde a mesma disciplina aparece em cursos de setores diferentes)
+COMPARTILHADA_A_CADA = 20
+
+
+def sql_cursos_da_disciplina(args, disciplina):
+    """Quantos cursos oferecem a disciplina (1, ou de 2 a --cursos-por-disciplina nas compartilhadas)."""
+    maximo = min(args.cursos_por_disciplina, args.cursos)
+    if maximo <= 1:
+        return "1"
+    return (f"CASE WHEN {disciplina} % {COMPARTILHADA_A_CADA} = 0 "
+            f"THEN 2 + ({disciplina} // {COMPARTILHADA_A_CADA}) % {maximo - 1} ELSE 1 END")
+
+
+def sql_curso_da_oferta(args, disciplina, oferta):
+    """Código do curso da `oferta`-ésima oferta da disciplina (cursos vizinhos, de setores diferentes)."""
+    return f"printf('C%05d', ({disciplina} + {oferta}) % {args.cursos})"
+
+
+def criar_tabelas(con):
+    # Mesmos tipos que a ingestão produz a partir das planilhas (ingestao.TIPOS_COLUNAS)
+    for tabela in COLUNAS:
+        con.execute(f"CREATE TABLE {tabela} ({sql_definicao(tabela, derivadas=True)})")
+
+
+def gerar_dimensoes(con, args):
+    """Dimensões com as cardinalidades pedidas; os códigos seguem as fórmulas usadas na fato."""
+    con.execute(f"""
+        INSERT INTO dUnidade
+        SELECT printf('S%02d/U%04d', i % {args.setores}, i),
+               printf('Setor Sintético %02d', i % {args.setores}),
+               printf('Unidade Sintética %04d', i)
+        FROM range({args.unidades}) t(i)
+    """)
+    con.execute(f"""
+        INSERT INTO dCurso
+        SELECT printf('C%05d', i),
+               printf('CURSO SINTÉTICO %04d - Presencial', i),
+               printf('SETOR SINTÉTICO %02d', i % {args.setores})
+        FROM range({args.cursos}) t(i)
+    """)
+    # Uma linha por oferta (disciplina, curso)
+    con.execute(f"""
+        INSERT INTO dDisciplina
+        SELECT printf('D%06d', i),
+               printf('DISCIPLINA SINTÉTICA %06d', i),
+               {sql_curso_da_oferta(args, "i", "j")},
+               printf('DEPARTAMENTO SINTÉTICO %03d', i % {args.departamentos}),
+               printf('P%05d', i % 5000),
+               CASE WHEN i % 5 = 0 THEN 'EAD' ELSE 'Presencial' END
+        FROM range({args.disciplinas}) t(i), range({max(args.cursos_por_disciplina, 1)}) o(j)
+        WHERE j < {sql_cursos_da_disciplina(args, "i")}
+    """)
+
+    perguntas, tipos = [], []
+    for familia, lista in TIPOS_PERGUNTA.items():
+        tipos.extend((codigo, eixo, codigo_tipo(familia)) for codigo, eixo in lista)
+        for k in range(args.perguntas):
+            codigo = lista[k % len(lista)][0]
+            perguntas.append((BASE_PERGUNTA[familia] + k, k + 1, codigo, f"Pergunta sintética {familia} {k + 1}"))
+    con.executemany("INSERT INTO dTipoPergunta VALUES (?, ?, ?)", tipos)
+    con.executemany("INSERT INTO dPergunta VALUES (?, ?, ?, ?)", perguntas)
+
+
+def sql_fato(args, inicio, fim):
+    """
+    Linhas [inicio, fim) da fAvaliacao. Cada ID_Pesquisa responde `perguntas`
+    perguntas de uma família; o nó (unidade/curso/disciplina) é sorteado com
+    viés para os primeiros índices, e cada nó/pergunta tem sua própria taxa de
+    concordância. Nas disciplinas compartilhadas o curso é sorteado entre as
+    ofertas. Tudo sai de hash(linha, semente), então é reprodutível.
+    """
+    s = args.semente
+    q = args.perguntas
+    p_inst = args.fracao_institucional
+    p_curso = p_inst + args.fracao_cursos
+    anos = list(range(args.ano_final - args.anos + 1, args.ano_final + 1))
+    return f"""
+        WITH linhas AS (
+            SELECT i, i // {q} AS pesquisa, i % {q} AS k
+            FROM range({inicio}, {fim}) t(i)
+        ),
+        pesquisas AS (
+            SELECT *,
+                (hash(pesquisa, {s}, 1) % 1000000) / 1000000.0 AS u_tipo,
+                (hash(pesquisa, {s}, 2) % 1000000) / 1000000.0 AS u_no,
+                (hash(i, {s}, 4) % 1000000) / 1000000.0 AS u_resposta,
+                (hash(i, {s}, 5) % 1000000) / 1000000.0 AS u_variante
+            FROM linhas
+        ),
+        nos AS (
+            SELECT *,
+                CASE WHEN u_tipo < {p_inst} THEN 'Institucional'
+                     WHEN u_tipo < {p_curso} THEN 'Cursos'
+                     ELSE 'Disciplina' END AS tipo,
+                CAST(floor(pow(u_no, {args.assimetria}) * CASE
+                    WHEN u_tipo < {p_inst} THEN {args.unidades}
+                    WHEN u_tipo < {p_curso} THEN {args.cursos}
+                    ELSE {args.disciplinas} END) AS BIGINT) AS no
+            FROM pesquisas
+        ),
+        taxas AS (
+            SELECT *,
+                0.5 + (CAST(hash(tipo, no, {s}, 3) % 41 AS INTEGER) - 20) / 100.0
+                    + (CAST(hash(tipo, k, {s}, 6) % 21 AS INTEGER) - 10) / 100.0 AS p_concordo,
+                CAST(hash(pesquisa, {s}, 8) % ({sql_cursos_da_disciplina(args, "no")}) AS BIGINT) AS oferta
+            FROM nos
+        )
+        SELECT
+            pesquisa AS ID_Pesquisa,
+            CASE tipo WHEN 'Institucional' THEN {BASE_PERGUNTA['Institucional']}
+                      WHEN 'Cursos' THEN {BASE_PERGUNTA['Cursos']}
+                      ELSE {BASE_PERGUNTA['Disciplina']} END + k AS ID_Pergunta,
+            CASE
+                WHEN u_resposta < 0.003 THEN ''
+                WHEN u_resposta < p_concordo THEN CASE WHEN u_variante < 0.1 THEN 'Concordo Totalmente' ELSE 'Concordo' END
+                WHEN u_resposta < p_concordo + 0.28 THEN 'Desconheço'
+                ELSE CASE WHEN u_variante < 0.1 THEN 'Discordo Totalmente' ELSE 'Discordo' END
+            END AS Resposta,
+            CASE WHEN tipo = 'Disciplina' THEN printf('D%06d', no) END AS Cod_Disciplina,
+            CASE WHEN tipo = 'Cursos' THEN printf('C%05d', no)
+                 WHEN tipo = 'Disciplina' THEN {sql_curso_da_oferta(args, "no", "oferta")} END AS Cod_Curso,
+            tipo AS TipoPergunta,
+            NULL AS Pergunta,
+            CASE WHEN tipo = 'Institucional' THEN printf('S%02d/U%04d', no % {args.setores}, no) END AS SiglaLotação,
+            list_extract({anos}, CAST(hash(pesquisa, {s}, 7) % {len(anos)} AS INTEGER) + 1) AS Ano
+        FROM taxas
+    """
+
+
+def gerar(args):
+    if os.path.exists(args.saida):
+        if not args.sobrescrever:
+            raise SystemExit(f"[ERRO] {args.saida} já existe (use --sobrescrever).")
+        os.remove(args.saida)
+    os.makedirs(os.path.dirname(os.path.abspath(args.saida)), exist_ok=True)
+
+    inicio_geral = time.perf_counter()
+    con = duckdb.connect(args.saida)
+    try:
+        criar_tabelas(con)
+        gerar_dimensoes(con, args)
+
+        colunas = ", ".join(f'"{col}"' for col in COLUNAS["fAvaliacao"])
+        for inicio in range(0, args.linhas, args.lote):
+            fim = min(inicio + args.lote, args.linhas)
+            con.execute(f"INSERT INTO fAvaliacao ({colunas}) {sql_fato(args, inicio, fim)}")
+            print(f"[INFO] fAvaliacao: {fim}/{args.linhas} linhas")
+
+        garantir_esquema(con)
+        atualizar_respostas(con)
+        reconstruir_cubo(con)
+    finally:
+        con.close()
+    print(f"[SUCESSO] Base sintética em {args.saida} ({time.perf_counter() - inicio_geral:.1f}s).")
+
+
+def criar_parser():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Gera uma base sintética do dashboard CPA.")
+    parser.add_argument("--linhas", type=int, default=1_000_000, help="Linhas da fAvaliacao (100 mil a 100 milhões)")
+    parser.add_argument("--saida", default=os.path.join(base_dir, "..", "data", "db", "sintetico.duckdb"))
+    parser.add_argument("--sobrescrever", action="store_true")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--unidades", type=int, default=315)
+    parser.add_argument("--cursos", type=int, default=102)
+    parser.add_argument("--disciplinas", type=int, default=3400)
+    parser.add_argument("--cursos-por-disciplina", type=int, default=8,
+                        help="Máximo de cursos de uma disciplina compartilhada (1 = uma oferta por disciplina)")
+    parser.add_argument("--setores", type=int, default=17)
+    parser.add_argument("--departamentos", type=int, default=60)
+    parser.add_argument("--perguntas", type=int, default=20, help="Perguntas por família (e por pesquisa)")
+    parser.add_argument("--anos", type=int, default=3)
+    parser.add_argument("--ano-final", type=int, default=2025)
+    parser.add_argument("--fracao-institucional", type=float, default=0.5)
+    parser.add_argument("--fracao-cursos", type=float, default=0.3)
+    parser.add_argument("--assimetria", type=float, default=2.5,
+                        help="Expoente do sorteio dos nós: 1 = uniforme, maior = mais concentrado")
+    parser.add_argument("--lote", type=int, default=10_000_000, help="Linhas inseridas por comando")
+    return parser
+
+
+def main():
+    gerar(criar_parser().parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -78,6 +78,9 @@ custom_css = """
     .chart-box { background: white; border-radius: 12px; padding: 20px; box-shadow: 0 2px 10px rgba(0,0,0,0.05); height: 350px; display: flex; flex-direction: column; align-items: center; justify-content: center; overflow: hidden; }
     .chart-box img { object-fit: contain !important; max-height: 100% !important; max-width: 100% !important; width: auto !important; height: auto !important; }
     .chart-title { font-size: 16px; font-weight: 600; color: #444; margin-bottom: 15px; width: 100%; text-align: center; border-bottom: 1px solid #eee; padding-bottom: 10px; }
+    .grafico-cliente { width: 100%; flex: 1; min-height: 0; align-self: stretch; }
+    .radar-container .grafico-cliente { height: 100%; }
+    .loading-banner { color: #666; font-size: 14px; margin-bottom: 10px; }
     # ... (seu css anterior) ...
     .info-box { background: white; padding: 25px; border-radius: 8px; box-shadow: 0 2px 5px rgba(0,0,0,0.05); height: 100%; border-top: 4px solid #004b8d; }
     .info-title { font-size: 18px; font-weight: 700; color: #004b8d; margin-bottom: 15px; display: flex; align-items: center; gap: 10px; }
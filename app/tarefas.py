@@ -0,0 +1,69 @@
+# tarefas.py
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from banco import TAMANHO_POOL
+
+# Consultas simultâneas permitidas por sessão (as demais esperam na fila)
+MAX_CONSULTAS_SESSAO = int(os.environ.get("HACKATHON_CONSULTAS_SESSAO", "2"))
+# Gráficos desenhados ao mesmo tempo (um processo de render cada); os demais esperam na fila
+MAX_RENDERS = int(os.environ.get("HACKATHON_RENDERS", "2"))
+# Cada processo de render é trocado por um novo depois de tantos gráficos
+RENDERS_POR_PROCESSO = int(os.environ.get("HACKATHON_RENDERS_POR_PROCESSO", "500"))
+
+# Threads compartilhadas por todas as sessões do worker. Cada thread pega o
+# próprio cursor no pool de banco.py, então não adianta ter mais threads que cursores.
+executor_consultas = ThreadPoolExecutor(max_workers=TAMANHO_POOL, thread_name_prefix="consulta")
+
+
+def limite_por_sessao():
+    """Semáforo que limita quantas consultas uma sessão roda ao mesmo tempo."""
+    return asyncio.Semaphore(MAX_CONSULTAS_SESSAO)
+
+
+async def em_segundo_plano(limite, func, *args, **kwargs):
+    """
+    Roda `func` no executor sem bloquear o event loop das outras sessões.
+    O contexto (ex.: painel_atual do monitor) vai junto para a thread.
+    """
+    async with limite:
+        loop = asyncio.get_running_loop()
+        contexto = contextvars.copy_context()
+        return await loop.run_in_executor(executor_consultas, functools.partial(contexto.run, func, *args, **kwargs))
+
+
+# --- PROCESSOS DE RENDER (MATPLOTLIB) ---
+# O matplotlib segura o GIL enquanto desenha e não é thread-safe, então os
+# gráficos saem em processos próprios (spawn: não herdam o banco nem as
+# threads do app). Só o payload vai e só o PNG volta. Criado no primeiro uso.
+
+_executor_graficos = None
+
+def executor_graficos():
+    global _executor_graficos
+    if _executor_graficos is None:
+        _executor_graficos = ProcessPoolExecutor(
+            max_workers=MAX_RENDERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            max_tasks_per_child=RENDERS_POR_PROCESSO,
+        )
+    return _executor_graficos
+
+
+async def em_processo_de_render(func, *args):
+    """Roda `func` (função de módulo, com argumentos serializáveis) num processo de render."""
+    global _executor_graficos
+    loop = asyncio.get_running_loop()
+    executor = executor_graficos()
+    try:
+        return await loop.run_in_executor(executor, func, *args)
+    except BrokenProcessPool:
+        # Um processo morreu (ex.: falta de memória): o próximo gráfico cria um pool novo
+        if _executor_graficos is executor:
+            _executor_graficos = None
+        raise
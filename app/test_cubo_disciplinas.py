@@ -0,0 +1,190 @@
+# test_cubo_disciplinas.py
+# Painéis de disciplina sobre o cubo quando a mesma disciplina é oferecida a
+# mais de um curso. Uso: python -m pytest -q (a partir da raiz ou de app/)
+import os
+import tempfile
+
+# O log de consultas do monitor.py não deve ir para data/logs do repositório
+os.environ.setdefault("HACKATHON_LOG_CONSULTAS", os.path.join(tempfile.gettempdir(), "consultas_teste.log"))
+
+import duckdb
+import pytest
+
+import banco
+import data
+from cubo import reconstruir_cubo
+from ingestao import COLUNAS, sql_definicao, garantir_esquema, atualizar_respostas
+
+
+def criar_base(caminho, linhas):
+    """Banco com as tabelas das planilhas preenchidas com `linhas` ({tabela: [tuplas]}) e o cubo pronto."""
+    con = duckdb.connect(caminho)
+    try:
+        for tabela in COLUNAS:
+            con.execute(f'CREATE TABLE "{tabela}" ({sql_definicao(tabela)})')
+            if linhas.get(tabela):
+                marcadores = ", ".join("?" * len(COLUNAS[tabela]))
+                con.executemany(f'INSERT INTO "{tabela}" VALUES ({marcadores})', linhas[tabela])
+        garantir_esquema(con)
+        atualizar_respostas(con)
+        reconstruir_cubo(con)
+    finally:
+        con.close()
+
+
+@pytest.fixture
+def usar_banco():
+    """Aponta o pool de data.py para um banco de teste (a nova geração limpa o cache)."""
+    caminho_original = banco.pool.caminho
+
+    def usar(caminho):
+        banco.pool.reciclar()
+        banco.pool.caminho = caminho
+        banco.nova_geracao()
+
+    yield usar
+    banco.pool.reciclar()
+    banco.pool.caminho = caminho_original
+    banco.nova_geracao()
+
+
+# CE009 é oferecida a dois cursos de setores diferentes
+LINHAS_COMPARTILHADA = {
+    "dCurso": [
+        ("C1", "ESTATÍSTICA - Presencial", "SETOR DE CIÊNCIAS EXATAS"),
+        ("C2", "AGRONOMIA - Presencial", "SETOR DE CIÊNCIAS AGRÁRIAS"),
+    ],
+    "dDisciplina": [
+        ("CE009", "INTRODUÇÃO À ESTATÍSTICA", "C1", "DEPARTAMENTO DE ESTATÍSTICA", "P1", "Presencial"),
+        ("CE009", "INTRODUÇÃO À ESTATÍSTICA", "C2", "DEPARTAMENTO DE ESTATÍSTICA", "P2", "Presencial"),
+    ],
+    "dPergunta": [(3000, 1, "DsAO", "Pergunta de disciplina")],
+    "dTipoPergunta": [("DsAO", "Abordagem e organização da disciplina")],
+    "fAvaliacao": [
+        # Três avaliações pelo curso C1 (todas concordam) e duas pelo C2 (uma discorda)
+        (1, 3000, "Concordo", "CE009", "C1", "Disciplina", None, None, 2024),
+        (2, 3000, "Concordo", "CE009", "C1", "Disciplina", None, None, 2024),
+        (3, 3000, "Concordo", "CE009", "C1", "Disciplina", None, None, 2024),
+        (4, 3000, "Concordo", "CE009", "C2", "Disciplina", None, None, 2024),
+        (5, 3000, "Discordo", "CE009", "C2", "Disciplina", None, None, 2024),
+    ],
+}
+
+
+def test_disciplina_de_dois_cursos_conta_no_setor_do_curso_avaliado(tmp_path, usar_banco):
+    caminho = str(tmp_path / "compartilhada.duckdb")
+    criar_base(caminho, LINHAS_COMPARTILHADA)
+    usar_banco(caminho)
+
+    todos = data.get_donut_sql_disciplina("Todos", "Todos", "Todos", "Todas")
+    assert todos == {"total": 5, "concordo": 4, "neutro": 0, "discordo": 1}
+
+    exatas = data.get_donut_sql_disciplina("SETOR DE CIÊNCIAS EXATAS", "Todos", "Todos", "Todas")
+    agrarias = data.get_donut_sql_disciplina("SETOR DE CIÊNCIAS AGRÁRIAS", "Todos", "Todos", "Todas")
+    assert exatas == {"total": 3, "concordo": 3, "neutro": 0, "discordo": 0}
+    assert agrarias == {"total": 2, "concordo": 1, "neutro": 0, "discordo": 1}
+
+    curso = data.get_donut_sql_disciplina("Todos", "Todos", "AGRONOMIA - Presencial", "INTRODUÇÃO À ESTATÍSTICA")
+    assert curso["total"] == 2
+
+    ranking = data.get_ranking_sql_disciplina("SETOR DE CIÊNCIAS AGRÁRIAS", "Todos", "Todos", "Todas")
+    assert list(ranking["labels"]) == ["INTRODUÇÃO À ESTATÍSTICA"]
+    assert list(ranking["values"]) == [50]
+
+
+def test_snapshot_de_disciplina_nao_duplica_avaliacoes(tmp_path, usar_banco):
+    caminho = str(tmp_path / "compartilhada.duckdb")
+    criar_base(caminho, LINHAS_COMPARTILHADA)
+    usar_banco(caminho)
+
+    (_, eixos), donut, ranking, _ = data.get_snapshot_sql_disciplina("Todos", "Todos", "Todos", "Todas")
+    assert donut["total"] == 5
+    assert list(ranking["values"]) == [80]
+
+    _, donut_exatas, _, _ = data.get_snapshot_sql_disciplina("SETOR DE CIÊNCIAS EXATAS", "Todos", "Todos", "Todas")
+    assert donut_exatas["total"] == 3
+
+    estrutura = data.get_estrutura_academica()
+    assert sorted(estrutura["Setor"]) == ["SETOR DE CIÊNCIAS AGRÁRIAS", "SETOR DE CIÊNCIAS EXATAS"]
+
+
+# --- EQUIVALÊNCIA COM A FATO (BASE SINTÉTICA COM DISCIPLINAS COMPARTILHADAS) ---
+
+FATO_DISCIPLINA = """
+    FROM fAvaliacao f
+    JOIN (SELECT DISTINCT Cod_Disciplina, Cod_Curso, Nome_Disciplina, Departamento FROM dDisciplina) d
+      ON f.Cod_Disciplina = d.Cod_Disciplina AND f.Cod_Curso = d.Cod_Curso
+    JOIN dCurso c ON f.Cod_Curso = c.Cod_Curso
+"""
+
+
+def filtros_fato(setor, depto, curso, disciplina):
+    filtros, params = [], []
+    for coluna, valor, todos in (("c.Setor_Curso", setor, "Todos"), ("d.Departamento", depto, "Todos"),
+                                 ("c.Curso", curso, "Todos"), ("d.Nome_Disciplina", disciplina, "Todas")):
+        if valor != todos:
+            filtros.append(f"{coluna} = ?")
+            params.append(valor)
+    return (" AND ".join(filtros) if filtros else "TRUE"), params
+
+
+@pytest.fixture(scope="module")
+def base_sintetica(tmp_path_factory):
+    import sintetico
+    caminho = str(tmp_path_factory.mktemp("sintetico") / "sintetico.duckdb")
+    sintetico.gerar(sintetico.criar_parser().parse_args([
+        "--linhas", "60000", "--saida", caminho, "--cursos", "12", "--disciplinas", "200",
+        "--setores", "5", "--departamentos", "6", "--unidades", "20", "--cursos-por-disciplina", "4",
+    ]))
+    return caminho
+
+
+def test_paineis_de_disciplina_batem_com_a_fato(base_sintetica, usar_banco):
+    usar_banco(base_sintetica)
+    con = duckdb.connect(base_sintetica, read_only=True)
+    try:
+        # A base precisa ter disciplinas oferecidas a cursos de setores diferentes
+        assert con.execute("""
+            SELECT COUNT(*) FROM (
+                SELECT d.Cod_Disciplina FROM dDisciplina d JOIN dCurso c ON d.Cod_Curso = c.Cod_Curso
+                GROUP BY d.Cod_Disciplina HAVING COUNT(DISTINCT c.Setor_Curso) > 1
+            )
+        """).fetchone()[0] > 0
+
+        estrutura = data.get_estrutura_academica()
+        linha = estrutura.iloc[len(estrutura) // 2]
+        combos = [("Todos", "Todos", "Todos", "Todas")]
+        combos += [(setor, "Todos", "Todos", "Todas") for setor in sorted(set(estrutura["Setor"]))]
+        combos += [
+            (linha["Setor"], linha["Departamento"], "Todos", "Todas"),
+            (linha["Setor"], linha["Departamento"], linha["Curso"], "Todas"),
+            ("Todos", "Todos", "Todos", linha["Nome_Disciplina"]),
+        ]
+        for combo in combos:
+            where, params = filtros_fato(*combo)
+            total, concordo, neutro, discordo = con.execute(f"""
+                SELECT COUNT(*), COUNT(*) FILTER (WHERE f.Classe = 1),
+                       COUNT(*) FILTER (WHERE f.Classe = 0), COUNT(*) FILTER (WHERE f.Classe = -1)
+                {FATO_DISCIPLINA} WHERE {where}
+            """, params).fetchone()
+            esperado = data.donut_de_contagens(total, concordo, neutro, discordo)
+            assert data.get_donut_sql_disciplina(*combo) == esperado, combo
+            distribuicao = data.get_distribuicao_sql_disciplina(*combo)
+            assert distribuicao == data.distribuicao_de_contagens(concordo, neutro, discordo), combo
+
+            notas = dict(con.execute(f"""
+                SELECT d.Nome_Disciplina,
+                       CAST(100.0 * COUNT(*) FILTER (WHERE f.Classe = 1)
+                            / NULLIF(COUNT(*) FILTER (WHERE f.Classe <> 0), 0) AS INTEGER)
+                {FATO_DISCIPLINA} WHERE {where}
+                GROUP BY d.Nome_Disciplina
+            """, params).fetchall())
+            ranking = data.get_ranking_sql_disciplina(*combo)
+            assert len(ranking["labels"]) == min(8, sum(nota is not None for nota in notas.values())), combo
+            for label, valor in zip(ranking["labels"], ranking["values"]):
+                assert notas[label] == valor, (combo, label)
+
+            _, donut, _, _ = data.get_snapshot_sql_disciplina(*combo)
+            assert donut == esperado, combo
+    finally:
+        con.close()
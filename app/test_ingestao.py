@@ -0,0 +1,143 @@
+# test_ingestao.py
+# Reenvio de planilhas: chaves naturais e upsert das dimensões.
+# Uso: python -m pytest -q (a partir da raiz ou de app/)
+import duckdb
+
+import banco
+from ingestao import COLUNAS, sql_definicao, juntar_preparacoes, inserir_preparado
+from test_cubo_disciplinas import LINHAS_COMPARTILHADA, criar_base
+
+
+def ler_planilha(caminho, linhas):
+    """Parte lida de uma planilha (como a de preparar_excel), só com as abas de `linhas`."""
+    con = duckdb.connect(caminho)
+    try:
+        for tabela, tuplas in linhas.items():
+            con.execute(f'CREATE TABLE "{tabela}" ({sql_definicao(tabela)})')
+            marcadores = ", ".join("?" * len(COLUNAS[tabela]))
+            con.executemany(f'INSERT INTO "{tabela}" VALUES ({marcadores})', tuplas)
+    finally:
+        con.close()
+    return caminho, list(linhas)
+
+
+def enviar(tmp_path, caminho, *planilhas, progresso=None):
+    """Insere as `planilhas` ({tabela: [tuplas]}) num só upload, como um trabalho de ingestão."""
+    envio = len(list(tmp_path.glob("envio*")))
+    pasta = tmp_path / f"envio{envio}"
+    pasta.mkdir()
+    partes = [[ler_planilha(str(pasta / f"planilha{i}.duckdb"), linhas)] for i, linhas in enumerate(planilhas)]
+    preparacao = str(pasta / "excel.duckdb")
+    return inserir_preparado(caminho, preparacao, juntar_preparacoes(partes, preparacao),
+                             evitar_duplicatas=True, progresso=progresso)
+
+
+def eixos_do_cubo(caminho):
+    """{TipoCod: [eixos]} das linhas por eixo do cubo."""
+    con = duckdb.connect(caminho, read_only=True)
+    try:
+        linhas = con.execute("""
+            SELECT TipoCod, LIST(DISTINCT GrupoDePergunta ORDER BY GrupoDePergunta)
+            FROM aggAvaliacao WHERE Nivel = 0 GROUP BY TipoCod
+        """).fetchall()
+    finally:
+        con.close()
+    return dict(linhas)
+
+
+PLANILHA_DISCIPLINA = {
+    "dTipoPergunta": [("DsAO", "Abordagem e organização da disciplina")],
+    "fAvaliacao": LINHAS_COMPARTILHADA["fAvaliacao"][:1],
+}
+# Nos Cursos o mesmo código DsAO pertence a outro eixo (como nas planilhas de 2024)
+PLANILHA_CURSOS = {
+    "dPergunta": [(2000, 1, "DsAO", "Pergunta de curso")],
+    "dTipoPergunta": [("DsAO", "Políticas para o Ensino, a Pesquisa e a Extensão")],
+    "fAvaliacao": [
+        (10, 2000, "Concordo", None, "C1", "Cursos", None, None, 2024),
+        (11, 2000, "Discordo", None, "C2", "Cursos", None, None, 2024),
+    ],
+}
+
+
+def test_reenvio_da_dtipopergunta_troca_o_eixo(tmp_path):
+    caminho = str(tmp_path / "eixos.duckdb")
+    criar_base(caminho, LINHAS_COMPARTILHADA)
+
+    for eixo in ["Eixo da primeira planilha", "Eixo da segunda planilha"]:
+        enviar(tmp_path, caminho, dict(PLANILHA_DISCIPLINA, dTipoPergunta=[("DsAO", eixo)]))
+
+        con = duckdb.connect(caminho, read_only=True)
+        try:
+            assert con.execute("SELECT GrupoDePergunta FROM dTipoPergunta WHERE TipoCod = 3").fetchall() == [(eixo,)]
+        finally:
+            con.close()
+        assert eixos_do_cubo(caminho) == {3: [eixo]}
+
+
+def test_familias_com_o_mesmo_codigo_mantem_seus_eixos(tmp_path):
+    caminho = str(tmp_path / "familias.duckdb")
+    criar_base(caminho, LINHAS_COMPARTILHADA)
+
+    # As duas planilhas no mesmo upload: cada dTipoPergunta vale para a família dos seus fatos
+    enviar(tmp_path, caminho, PLANILHA_CURSOS, PLANILHA_DISCIPLINA)
+    assert eixos_do_cubo(caminho) == {
+        2: ["Políticas para o Ensino, a Pesquisa e a Extensão"],
+        3: ["Abordagem e organização da disciplina"],
+    }
+
+    # Reenviar só a de Disciplinas com outro eixo não mexe nos nós dos Cursos
+    enviar(tmp_path, caminho, dict(PLANILHA_DISCIPLINA, dTipoPergunta=[("DsAO", "Eixo revisado")]))
+    assert eixos_do_cubo(caminho) == {
+        2: ["Políticas para o Ensino, a Pesquisa e a Extensão"],
+        3: ["Eixo revisado"],
+    }
+
+
+def test_reenviar_a_mesma_planilha_nao_grava_nada(tmp_path):
+    caminho = str(tmp_path / "reenvio.duckdb")
+    criar_base(caminho, LINHAS_COMPARTILHADA)
+
+    assert enviar(tmp_path, caminho, PLANILHA_CURSOS) == 4
+    geracao = banco.geracao_atual()
+    # Dimensões iguais às do banco não são regravadas nem abrem uma nova geração
+    assert enviar(tmp_path, caminho, PLANILHA_CURSOS) == 0
+    assert banco.geracao_atual() == geracao
+
+    # Uma coluna diferente volta a valer como upsert da chave
+    pergunta = [(2000, 1, "DsAO", "Pergunta de curso (revisada)")]
+    assert enviar(tmp_path, caminho, dict(PLANILHA_CURSOS, dPergunta=pergunta)) == 1
+    con = duckdb.connect(caminho, read_only=True)
+    try:
+        assert con.execute("SELECT Pergunta FROM dPergunta WHERE ID_Pergunta = 2000").fetchall() == [(pergunta[0][3],)]
+    finally:
+        con.close()
+
+
+def test_fatos_em_conflito_sao_contados_a_parte(tmp_path):
+    caminho = str(tmp_path / "conflitos.duckdb")
+    criar_base(caminho, LINHAS_COMPARTILHADA)
+    avisos = []
+
+    def progresso(etapa, tabela, linhas):
+        if etapa == "conflitantes":
+            avisos.append((tabela, linhas))
+
+    fatos = [
+        (1, 3000, "Discordo", "CE009", "C1", "Disciplina", None, None, 2024),  # no banco como Concordo
+        (20, 3000, "Concordo", "CE009", "C1", "Disciplina", None, None, 2024),
+        (20, 3000, "Discordo", "CE009", "C1", "Disciplina", None, None, 2024),  # conflita com a de cima
+        (21, 3000, "Concordo", "CE009", "C2", "Disciplina", None, None, 2024),
+        (21, 3000, "Concordo", "CE009", "C2", "Disciplina", None, None, 2024),  # repetição exata
+        (2, 3000, "Concordo", "CE009", "C1", "Disciplina", None, None, 2024),   # igual à do banco
+    ]
+    assert enviar(tmp_path, caminho, {"fAvaliacao": fatos}, progresso=progresso) == 2
+    assert avisos == [("fAvaliacao", 2)]
+
+    con = duckdb.connect(caminho, read_only=True)
+    try:
+        # Vale a linha gravada antes (ou a primeira do upload)
+        respostas = con.execute("SELECT ID_Pesquisa, Resposta FROM fAvaliacao WHERE ID_Pesquisa IN (1, 20) ORDER BY 1").fetchall()
+        assert respostas == [(1, "Concordo"), (20, "Concordo")]
+    finally:
+        con.close()
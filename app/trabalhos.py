@@ -0,0 +1,317 @@
+# trabalhos.py
+# Ingestões de Excel como trabalhos em segundo plano, cada um com um id e uma
+# ou mais planilhas. A leitura (openpyxl, presa ao GIL) roda num pool de
+# processos próprios, em paralelo por planilha e por aba, e cada parte grava
+# seu arquivo de preparação; as partes são juntadas e a inserção roda numa
+# thread deste processo, que é quem pode abrir o banco para escrita, numa
+# única transação. O andamento por etapa e por aba fica em TrabalhoIngestao.resumo().
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+# Trabalhos terminados guardados para consulta (os mais antigos saem primeiro)
+MAX_TRABALHOS_GUARDADOS = 20
+# Processos de leitura por trabalho (cada um lê uma parte de uma planilha por vez)
+MAX_PROCESSOS_LEITURA = int(os.environ.get("HACKATHON_PROCESSOS_INGESTAO", str(min(4, os.cpu_count() or 1))))
+
+ETAPAS_ATIVAS = ("na_fila", "lendo", "inserindo", "cubo", "gravando")
+
+# Uma inserção por vez: o arquivo do banco só aceita um escritor
+_lock_escrita = threading.Lock()
+
+
+class IngestaoCancelada(Exception):
+    pass
+
+
+# --- PROCESSOS DE LEITURA ---
+
+def partes_da_planilha():
+    """
+    Abas lidas juntas por um processo: a fAvaliacao (quase todo o custo) sai
+    sozinha e as dimensões vão numa parte só, para não abrir o arquivo de novo por aba.
+    """
+    from ingestao import COLUNAS
+    return [["fAvaliacao"], [tabela for tabela in COLUNAS if tabela != "fAvaliacao"]]
+
+def _processo_de_leitura(tarefas, fila):
+    """Roda no processo filho (spawn): lê partes da fila `tarefas` até receber None."""
+    from ingestao import preparar_excel
+    while True:
+        tarefa = tarefas.get()
+        if tarefa is None:
+            return
+        chave, path_excel, tabelas, destino = tarefa
+        try:
+            progresso = lambda etapa, tabela, n: fila.put(("lidas", chave, tabela, n))
+            linhas = preparar_excel(path_excel, destino, progresso=progresso, tabelas=tabelas)
+            fila.put(("fim", chave, linhas))
+        except Exception as e:
+            fila.put(("erro", chave, str(e)))
+
+
+# --- TRABALHO ---
+
+class TrabalhoIngestao:
+    """Uma ingestão de uma ou mais planilhas: estado, andamento por aba e cancelamento."""
+
+    def __init__(self, arquivos, path_banco, evitar_duplicatas=True):
+        """`arquivos`: lista de (caminho, nome exibido) das planilhas, na ordem de inserção."""
+        self.id = uuid.uuid4().hex[:8]
+        self.nome = ", ".join(nome or os.path.basename(caminho) for caminho, nome in arquivos)
+        self.path_banco = path_banco
+        self.evitar_duplicatas = evitar_duplicatas
+        self.estado = "na_fila"
+        self.abas = {}  # aba -> {"lidas": n, "inseridas": n, "conflitantes": n}, somando as planilhas
+        self.total = 0
+        self.erro = None
+        self.criado = time.time()
+        self.terminado = None
+        self._lock = threading.Lock()
+        self._cancelar = threading.Event()
+        self._con = None
+        # Os arquivos enviados são copiados: o temporário do upload some com a sessão
+        self.pasta = tempfile.mkdtemp(prefix=f"ingestao_{self.id}_")
+        self.planilhas = []  # {"nome", "caminho", "lidas": {aba: n}, "partes": partes já lidas, "cache": veio do cache}
+        for i, (caminho, nome) in enumerate(arquivos):
+            copia = os.path.join(self.pasta, f"planilha{i}.xlsx")
+            shutil.copyfile(caminho, copia)
+            self.planilhas.append({"nome": nome or os.path.basename(caminho), "caminho": copia, "lidas": {}, "partes": 0, "cache": False})
+        self._partes_por_planilha = len(partes_da_planilha())
+
+    def _mudar(self, estado):
+        with self._lock:
+            self.estado = estado
+        print(f"[INFO] Ingestão {self.id}: {estado}")
+
+    def _aba(self, tabela):
+        return self.abas.setdefault(tabela, {"lidas": 0, "inseridas": 0, "conflitantes": 0})
+
+    def _contar_lidas(self, i, tabela, n):
+        # Sempre chamado com self._lock adquirido
+        self.planilhas[i]["lidas"][tabela] = n
+        self._aba(tabela)["lidas"] = sum(p["lidas"].get(tabela, 0) for p in self.planilhas)
+
+    # Execução (thread do trabalho)
+
+    def _ler(self):
+        """
+        Lê todas as partes de todas as planilhas no pool de processos e junta
+        tudo num arquivo de preparação. Devolve (arquivo, {tabela: linhas}).
+        Planilhas já convertidas antes vêm do cache de planilhas, sem processo.
+        """
+        import cache_planilhas
+        from ingestao import juntar_preparacoes, chave_planilha
+        tarefas = []
+        do_cache = {}  # i -> (arquivo de preparação, [tabelas])
+        for i, planilha in enumerate(self.planilhas):
+            if self._cancelar.is_set():
+                raise IngestaoCancelada()
+            planilha["chave"] = chave_planilha(planilha["caminho"])
+            destino = os.path.join(self.pasta, f"planilha{i}_cache.duckdb")
+            linhas = cache_planilhas.carregar(planilha["chave"], destino)
+            if linhas is not None:
+                do_cache[i] = (destino, list(linhas))
+                with self._lock:
+                    for tabela, n in linhas.items():
+                        self._contar_lidas(i, tabela, n)
+                    planilha["partes"] = self._partes_por_planilha
+                    planilha["cache"] = True
+                continue
+            for j, tabelas in enumerate(partes_da_planilha()):
+                destino = os.path.join(self.pasta, f"planilha{i}_parte{j}.duckdb")
+                tarefas.append(((i, j), planilha["caminho"], tabelas, destino))
+        # Maiores primeiro (a parte dos fatos, das planilhas maiores): o tempo
+        # total fica perto do da planilha mais lenta, não da soma
+        tarefas.sort(key=lambda t: ("fAvaliacao" not in t[2], -os.path.getsize(t[1])))
+        with self._lock:
+            for tabelas in partes_da_planilha():
+                for tabela in tabelas:
+                    self._aba(tabela)
+
+        contexto = multiprocessing.get_context("spawn")
+        fila_tarefas, fila = contexto.Queue(), contexto.Queue()
+        quantidade = min(MAX_PROCESSOS_LEITURA, len(tarefas))
+        for tarefa in tarefas + [None] * quantidade:
+            fila_tarefas.put(tarefa)
+        processos = [
+            contexto.Process(target=_processo_de_leitura, args=(fila_tarefas, fila),
+                             name=f"ingestao-{self.id}-{k}", daemon=True)
+            for k in range(quantidade)
+        ]
+        for processo in processos:
+            processo.start()
+        feitas = {}
+        try:
+            while len(feitas) < len(tarefas):
+                if self._cancelar.is_set():
+                    raise IngestaoCancelada()
+                try:
+                    mensagem = fila.get(timeout=0.2)
+                except queue.Empty:
+                    if not any(p.is_alive() for p in processos) and fila.empty():
+                        codigos = [p.exitcode for p in processos]
+                        raise Exception(f"Os processos de leitura terminaram sem resposta (códigos {codigos}).")
+                    continue
+                tipo, (i, j) = mensagem[0], mensagem[1]
+                if tipo == "lidas":
+                    with self._lock:
+                        self._contar_lidas(i, mensagem[2], mensagem[3])
+                elif tipo == "fim":
+                    feitas[(i, j)] = mensagem[2]
+                    with self._lock:
+                        for tabela, n in mensagem[2].items():
+                            self._contar_lidas(i, tabela, n)
+                        self.planilhas[i]["partes"] += 1
+                else:
+                    erro = mensagem[2]
+                    raise Exception(f"{self.planilhas[i]['nome']}: {erro}" if len(self.planilhas) > 1 else erro)
+        finally:
+            for processo in processos:
+                if processo.is_alive() and len(feitas) < len(tarefas):
+                    processo.terminate()
+                processo.join()
+
+        # Guarda as planilhas lidas agora para o próximo upload (ou auditoria) do mesmo arquivo
+        partes_lidas = {}
+        for (i, j), _, tabelas, destino in sorted(tarefas, key=lambda t: t[0]):
+            partes_lidas.setdefault(i, []).append((destino, tabelas))
+        for i, partes in partes_lidas.items():
+            cache_planilhas.guardar(self.planilhas[i]["chave"], partes)
+
+        destino = os.path.join(self.pasta, "excel.duckdb")
+        planilhas = [[do_cache[i]] if i in do_cache else partes_lidas[i] for i in range(len(self.planilhas))]
+        return destino, juntar_preparacoes(planilhas, destino)
+
+    def _progresso_insercao(self, etapa, tabela, n):
+        # Chamado entre os passos da transação: levantar aqui desfaz tudo
+        if self._cancelar.is_set():
+            raise IngestaoCancelada()
+        with self._lock:
+            if etapa == "inserindo":
+                self._aba(tabela)["inseridas"] = n
+            elif etapa == "conflitantes":
+                # Linhas com a chave de outra já gravada mas outros valores: ficam de fora
+                self._aba(tabela)["conflitantes"] = n
+            else:
+                self.estado = etapa
+
+    def _ao_conectar(self, con):
+        with self._lock:
+            self._con = con
+
+    def _inserir(self, destino, linhas):
+        from ingestao import inserir_preparado
+        # Espera a vez de escrever sem deixar de atender um cancelamento
+        while not _lock_escrita.acquire(timeout=0.2):
+            if self._cancelar.is_set():
+                raise IngestaoCancelada()
+        try:
+            if self._cancelar.is_set():
+                raise IngestaoCancelada()
+            self._mudar("inserindo")
+            return inserir_preparado(
+                self.path_banco, destino, linhas, self.evitar_duplicatas,
+                progresso=self._progresso_insercao, ao_conectar=self._ao_conectar,
+            )
+        finally:
+            _lock_escrita.release()
+
+    def executar(self):
+        inicio = time.perf_counter()
+        try:
+            self._mudar("lendo")
+            destino, linhas = self._ler()
+            total = self._inserir(destino, linhas)
+            with self._lock:
+                self.total = total
+            self._mudar("concluido")
+            print(f"[SUCESSO] Ingestão {self.id}: {total} registros inseridos ({time.perf_counter() - inicio:.1f} s).")
+        except Exception as e:
+            if self._cancelar.is_set():
+                self._mudar("cancelado")
+            else:
+                with self._lock:
+                    self.erro = str(e)
+                self._mudar("erro")
+                print(f"[ERRO] Ingestão {self.id}: {e}")
+        finally:
+            with self._lock:
+                self.terminado = time.time()
+            shutil.rmtree(self.pasta, ignore_errors=True)
+
+    # API pública
+
+    def cancelar(self):
+        """Pede o cancelamento: a leitura é abortada e a inserção sofre ROLLBACK."""
+        with self._lock:
+            if self.estado not in ETAPAS_ATIVAS:
+                return False
+            self._cancelar.set()
+            if self._con is not None:
+                # Interrompe a consulta em andamento; transacao() faz o ROLLBACK
+                self._con.interrupt()
+        print(f"[INFO] Ingestão {self.id}: cancelamento pedido.")
+        return True
+
+    def ativo(self):
+        return self.terminado is None
+
+    def resumo(self):
+        with self._lock:
+            fim = self.terminado or time.time()
+            return {
+                "id": self.id,
+                "nome": self.nome,
+                "estado": self.estado,
+                "abas": {tabela: dict(contagem) for tabela, contagem in self.abas.items()},
+                "planilhas": [
+                    {"nome": p["nome"], "lidas": sum(p["lidas"].values()),
+                     "lida": p["partes"] == self._partes_por_planilha, "cache": p["cache"]}
+                    for p in self.planilhas
+                ],
+                "total": self.total,
+                "conflitantes": sum(contagem["conflitantes"] for contagem in self.abas.values()),
+                "erro": self.erro,
+                "cancelando": self._cancelar.is_set() and self.terminado is None,
+                "segundos": round(fim - self.criado, 1),
+            }
+
+
+# --- REGISTRO ---
+
+_trabalhos = {}
+_lock_registro = threading.Lock()
+
+def submeter_ingestao(arquivos, path_banco, evitar_duplicatas=True):
+    """
+    Cria o trabalho para as planilhas `arquivos` (lista de (caminho, nome)),
+    dispara a thread e devolve-o (use .id para acompanhar).
+    """
+    trabalho = TrabalhoIngestao(arquivos, path_banco, evitar_duplicatas)
+    with _lock_registro:
+        _trabalhos[trabalho.id] = trabalho
+        terminados = [t for t in _trabalhos.values() if not t.ativo()]
+        for antigo in sorted(terminados, key=lambda t: t.criado)[:max(0, len(terminados) - MAX_TRABALHOS_GUARDADOS)]:
+            del _trabalhos[antigo.id]
+    threading.Thread(target=trabalho.executar, name=f"ingestao-{trabalho.id}", daemon=True).start()
+    print(f"[INFO] Ingestão {trabalho.id} submetida: {trabalho.nome}")
+    return trabalho
+
+def obter_trabalho(id_trabalho):
+    with _lock_registro:
+        return _trabalhos.get(id_trabalho)
+
+def cancelar_trabalho(id_trabalho):
+    trabalho = obter_trabalho(id_trabalho)
+    return trabalho.cancelar() if trabalho else False
+
+def listar_trabalhos():
+    with _lock_registro:
+        trabalhos = list(_trabalhos.values())
+    return [t.resumo() for t in sorted(trabalhos, key=lambda t: t.criado, reverse=True)]
@@ -9,16 +9,17 @@ def criar_pagina_upload():
         
         ui.card(
             ui.h4("Carregar dados (Upload de Excel UFPR)", class_="mb-3"),
-            ui.p("Envie um arquivo Excel no formato padrão para atualizar o banco de dados."),
+            ui.p("Envie um ou mais arquivos Excel no formato padrão para atualizar o banco de dados. "
+                 "Vários arquivos (ex.: Institucional, Cursos e EAD de um ciclo) são lidos em paralelo e inseridos juntos."),
             
-            # Container para status/feedback
-            ui.output_text("status_ingestao"),
+            # Container para status/feedback (andamento do trabalho de ingestão)
+            ui.output_ui("status_ingestao"),
             
             ui.input_file(
                 "upload_excel",
-                "Escolher arquivo Excel (.xlsx)",
+                "Escolher arquivos Excel (.xlsx)",
                 accept=[".xlsx"],
-                multiple=False
+                multiple=True
             ),
             
             ui.br(),
@@ -28,6 +29,11 @@ def criar_pagina_upload():
                 "Processar Dados",
                 class_="btn btn-primary"
             ),
+            ui.input_action_button(
+                "cancelar_ingestao",
+                "Cancelar",
+                class_="btn btn-outline-danger ms-2"
+            ),
             
             ui.br(), ui.br(),
             
@@ -61,4 +67,57 @@ def criar_pagina_upload():
             ui.p("Cada aba deve conter as colunas específicas conforme o modelo disponível para download."),
             style="margin-top: 20px; padding: 20px; background: #f8f9fa;"
         )
-    )
\ No newline at end of file
+    )
+
+# --- ANDAMENTO DA INGESTÃO ---
+
+ROTULOS_ETAPA = {
+    "na_fila": "⏳ Na fila",
+    "lendo": "📥 Lendo a planilha",
+    "inserindo": "💾 Inserindo no banco",
+    "cubo": "🧮 Atualizando os agregados",
+    "gravando": "💾 Gravando",
+    "concluido": "✅ Concluído",
+    "cancelado": "🚫 Cancelado: nada foi gravado no banco",
+    "erro": "❌ Erro ao processar arquivo",
+}
+
+def painel_trabalho(resumo):
+    """Estado de um trabalho de ingestão (trabalhos.TrabalhoIngestao.resumo()) com as linhas por aba."""
+    etapa = ROTULOS_ETAPA.get(resumo["estado"], resumo["estado"])
+    if resumo["cancelando"]:
+        etapa += " (cancelando...)"
+    cabecalho = tags.p(
+        tags.strong(etapa), f" | {resumo['nome']} | trabalho {resumo['id']} | {resumo['segundos']:.0f} s"
+    )
+    linhas = [
+        tags.tr(tags.td(aba), tags.td(f"{contagem['lidas']:,}".replace(",", ".")),
+                tags.td(f"{contagem['inseridas']:,}".replace(",", ".")),
+                tags.td(f"{contagem['conflitantes']:,}".replace(",", "."),
+                        class_="text-danger" if contagem["conflitantes"] else None))
+        for aba, contagem in resumo["abas"].items()
+    ]
+    planilhas = tags.ul(*[
+        tags.li(f"{p['nome']}: {p['lidas']:,} linhas lidas".replace(",", ".")
+                + (" (cache)" if p["cache"] else "") + (" ✔" if p["lida"] else ""))
+        for p in resumo["planilhas"]
+    ]) if len(resumo["planilhas"]) > 1 or any(p["cache"] for p in resumo["planilhas"]) else None
+    tabela = tags.table(
+        tags.thead(tags.tr(tags.th("Aba"), tags.th("Linhas lidas"), tags.th("Linhas inseridas"),
+                           tags.th("Em conflito (ignoradas)"))),
+        tags.tbody(*linhas),
+        class_="table table-sm",
+    ) if linhas else None
+    rodape = None
+    if resumo["estado"] == "concluido":
+        rodape = tags.p(f"Sucesso! {resumo['total']} registros inseridos no banco principal.")
+    elif resumo["erro"]:
+        rodape = tags.p(resumo["erro"][:300], class_="text-danger")
+    conflitos = None
+    if resumo["conflitantes"]:
+        conflitos = tags.p(
+            f"Atenção: {resumo['conflitantes']:,} linhas ignoradas por conflito ".replace(",", ".")
+            + "(mesma chave de uma linha já gravada ou anterior no upload, com outra resposta). Veja o log da ingestão.",
+            class_="text-danger",
+        )
+    return tags.div(cabecalho, planilhas, tabela, conflitos, rodape)
@@ -0,0 +1,250 @@
+// graficos.js
+// Gráficos desenhados no navegador (modo HACKATHON_GRAFICOS=navegador).
+// O servidor manda só o payload compacto de graphs.dados_grafico; aqui ele
+// vira SVG, sem dependências externas. Redimensionar ou trocar a aba
+// redesenha localmente, sem ida ao servidor.
+(function () {
+  "use strict";
+
+  var SVG_NS = "http://www.w3.org/2000/svg";
+  var AZUL = "#004b8d";
+  var VERDE = "#198754";
+  var CINZA = "#adb5bd";
+  var VERMELHO = "#dc3545";
+  var TEXTO = "#333333";
+  var GRADE = "#cccccc";
+  // Paleta tab10 do matplotlib, a mesma dos gráficos renderizados no servidor
+  var TAB10 = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd",
+               "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf"];
+
+  // --- SVG ---
+
+  function el(nome, atributos, pai) {
+    var no = document.createElementNS(SVG_NS, nome);
+    for (var chave in atributos) {
+      if (atributos[chave] !== undefined && atributos[chave] !== null) {
+        no.setAttribute(chave, atributos[chave]);
+      }
+    }
+    if (pai) pai.appendChild(no);
+    return no;
+  }
+
+  function texto(pai, x, y, conteudo, atributos) {
+    var no = el("text", Object.assign({ x: x, y: y, fill: TEXTO, "font-size": 11 }, atributos || {}), pai);
+    no.textContent = conteudo;
+    return no;
+  }
+
+  function dica(no, conteudo) {
+    el("title", {}, no).textContent = conteudo;
+  }
+
+  function abreviar(rotulo, limite) {
+    rotulo = String(rotulo);
+    return rotulo.length > limite ? rotulo.slice(0, limite - 3) + "..." : rotulo;
+  }
+
+  function formatar(n) {
+    return Number(n).toLocaleString("pt-BR");
+  }
+
+  // --- GRÁFICOS ---
+
+  function radar(svg, dados, w, h) {
+    var n = dados.labels.length;
+    var cx = w / 2, cy = h / 2;
+    var r = Math.max(10, Math.min(w, h) / 2 - 70);
+    var angulo = function (i) { return -Math.PI / 2 + (2 * Math.PI * i) / n; };
+    var ponto = function (i, v) {
+      return [cx + Math.cos(angulo(i)) * r * v / 100, cy + Math.sin(angulo(i)) * r * v / 100];
+    };
+
+    [20, 40, 60, 80, 100].forEach(function (nivel) {
+      var pts = [];
+      for (var i = 0; i < n; i++) pts.push(ponto(i, nivel).join(","));
+      el("polygon", { points: pts.join(" "), fill: "none", stroke: "#e5e5e5" }, svg);
+      texto(svg, cx + 3, cy - r * nivel / 100 - 2, nivel, { fill: "#999", "font-size": 9 });
+    });
+    var pts = [];
+    for (var i = 0; i < n; i++) {
+      var fim = ponto(i, 100);
+      el("line", { x1: cx, y1: cy, x2: fim[0], y2: fim[1], stroke: "#e5e5e5" }, svg);
+      var rotulo = ponto(i, 118);
+      var cos = Math.cos(angulo(i));
+      texto(svg, rotulo[0], rotulo[1], abreviar(dados.labels[i], 28), {
+        "text-anchor": Math.abs(cos) < 0.2 ? "middle" : (cos > 0 ? "start" : "end"),
+        "dominant-baseline": "middle", "font-size": 10,
+      });
+      pts.push(ponto(i, dados.values[i]).join(","));
+    }
+    el("polygon", { points: pts.join(" "), fill: AZUL, "fill-opacity": 0.25, stroke: AZUL, "stroke-width": 2 }, svg);
+    for (var j = 0; j < n; j++) {
+      var p = ponto(j, dados.values[j]);
+      dica(el("circle", { cx: p[0], cy: p[1], r: 4, fill: AZUL }, svg), dados.labels[j] + ": " + dados.values[j]);
+    }
+  }
+
+  function donut(svg, dados, w, h) {
+    var fatias = [
+      ["Concordo", dados.concordo, VERDE],
+      ["Neutro", dados.neutro, CINZA],
+      ["Discordo", dados.discordo, VERMELHO],
+    ];
+    var legenda = Math.min(170, w * 0.45);
+    var r = Math.max(10, Math.min(w - legenda, h) / 2 - 10);
+    var cx = (w - legenda) / 2, cy = h / 2, interno = r * 0.6;
+    var inicio = -Math.PI / 2;
+    fatias.forEach(function (f, i) {
+      var fracao = dados.total ? f[1] / dados.total : 0;
+      if (fracao > 0) {
+        var fim = inicio + fracao * 2 * Math.PI;
+        var grande = fracao > 0.5 ? 1 : 0;
+        var fatia = fracao >= 0.9999
+          ? el("circle", { cx: cx, cy: cy, r: (r + interno) / 2, fill: "none", stroke: f[2], "stroke-width": r - interno }, svg)
+          : el("path", {
+              d: ["M", cx + r * Math.cos(inicio), cy + r * Math.sin(inicio),
+                  "A", r, r, 0, grande, 1, cx + r * Math.cos(fim), cy + r * Math.sin(fim),
+                  "L", cx + interno * Math.cos(fim), cy + interno * Math.sin(fim),
+                  "A", interno, interno, 0, grande, 0, cx + interno * Math.cos(inicio), cy + interno * Math.sin(inicio),
+                  "Z"].join(" "),
+              fill: f[2],
+            }, svg);
+        dica(fatia, f[0] + ": " + formatar(f[1]));
+        inicio = fim;
+      }
+      var y = cy - 30 + i * 22;
+      el("rect", { x: w - legenda + 5, y: y - 9, width: 12, height: 12, fill: f[2] }, svg);
+      texto(svg, w - legenda + 22, y + 1, f[0] + ": " + formatar(f[1]) + " (" + (fracao * 100).toFixed(1) + "%)");
+    });
+    texto(svg, w - legenda + 5, cy - 52, "Respostas", { "font-weight": "bold" });
+    texto(svg, cx, cy, formatar(dados.total), {
+      "text-anchor": "middle", "dominant-baseline": "middle", "font-size": 22, "font-weight": "bold",
+    });
+  }
+
+  function barras(svg, dados, w, h) {
+    var n = dados.labels.length;
+    var esquerda = Math.min(w * 0.45, 190), direita = 10, topo = 5, base = 20;
+    var passo = (h - topo - base) / n;
+    var escala = function (v) { return esquerda + (w - esquerda - direita) * v / 115; };
+    [0, 20, 40, 60, 80, 100].forEach(function (v) {
+      el("line", { x1: escala(v), y1: topo, x2: escala(v), y2: h - base, stroke: GRADE, "stroke-dasharray": "3,3", "stroke-opacity": 0.6 }, svg);
+      texto(svg, escala(v), h - 5, v, { "text-anchor": "middle", "font-size": 10 });
+    });
+    // O payload vem em ordem crescente (de baixo para cima), como no barh
+    for (var i = 0; i < n; i++) {
+      var y = h - base - (i + 1) * passo + passo * 0.2;
+      var valor = dados.values[i];
+      dica(el("rect", { x: escala(0), y: y, width: escala(valor) - escala(0), height: passo * 0.6, fill: AZUL }, svg),
+           dados.labels[i] + ": " + valor);
+      texto(svg, esquerda - 6, y + passo * 0.3, abreviar(dados.labels[i], 30), { "text-anchor": "end", "dominant-baseline": "middle", "font-size": 10 });
+      texto(svg, escala(valor) + 4, y + passo * 0.3, valor, { "dominant-baseline": "middle", "font-weight": "bold", fill: AZUL });
+    }
+    el("line", { x1: escala(0), y1: h - base, x2: w - direita, y2: h - base, stroke: GRADE }, svg);
+  }
+
+  function distribuicao(svg, dados, w, h) {
+    var limites = dados.limites, bins = dados.bins;
+    var margem = 10, base = 45;
+    var maximo = Math.max.apply(null, bins) || 1;
+    var x = function (v) { return margem + (w - 2 * margem) * (v - limites[0]) / (limites[limites.length - 1] - limites[0]); };
+    var y = function (v) { return h - base - (h - base - 10) * v / maximo; };
+    for (var i = 0; i < bins.length; i++) {
+      var meio = (limites[i] + limites[i + 1]) / 2;
+      var cor = meio < 40 ? VERMELHO : (meio < 60 ? CINZA : VERDE);
+      dica(el("rect", {
+        x: x(limites[i]) + 0.5, y: y(bins[i]), width: Math.max(0, x(limites[i + 1]) - x(limites[i]) - 1),
+        height: y(0) - y(bins[i]), fill: cor, "fill-opacity": 0.7,
+      }, svg), limites[i] + "–" + limites[i + 1] + ": " + formatar(bins[i]));
+    }
+    el("line", { x1: x(limites[0]), y1: y(0), x2: x(limites[limites.length - 1]), y2: y(0), stroke: GRADE }, svg);
+    var xm = x(dados.media);
+    el("polygon", { points: [xm, y(0) + 4, xm - 7, y(0) + 16, xm + 7, y(0) + 16].join(" "), fill: TEXTO }, svg);
+    texto(svg, xm, y(0) + 32, dados.media.toFixed(1), { "text-anchor": "middle", "font-weight": "bold" });
+  }
+
+  function tendencia(svg, dados, w, h) {
+    var anos = dados.anos;
+    var legenda = Math.min(220, w * 0.35);
+    var esquerda = 35, topo = 15, base = 25;
+    var largura = w - legenda - esquerda - 10;
+    var x = function (ano) {
+      if (anos.length < 2) return esquerda + largura / 2;
+      return esquerda + largura * (ano - anos[0]) / (anos[anos.length - 1] - anos[0]);
+    };
+    var y = function (v) { return topo + (h - topo - base) * (1 - v / 105); };
+    [0, 20, 40, 60, 80, 100].forEach(function (v) {
+      el("line", { x1: esquerda, y1: y(v), x2: esquerda + largura, y2: y(v), stroke: GRADE, "stroke-dasharray": "3,3", "stroke-opacity": 0.6 }, svg);
+      texto(svg, esquerda - 5, y(v), v, { "text-anchor": "end", "dominant-baseline": "middle", "font-size": 10 });
+    });
+    anos.forEach(function (ano) {
+      texto(svg, x(ano), h - 6, ano, { "text-anchor": "middle", "font-size": 10 });
+    });
+
+    function serie(s, cor, espessura, opacidade, rotulo) {
+      var pts = s.ano.map(function (ano, i) { return x(ano) + "," + y(s.score[i]); });
+      el("polyline", { points: pts.join(" "), fill: "none", stroke: cor, "stroke-width": espessura, "stroke-opacity": opacidade }, svg);
+      s.ano.forEach(function (ano, i) {
+        dica(el("circle", { cx: x(ano), cy: y(s.score[i]), r: espessura + 2, fill: cor, "fill-opacity": opacidade }, svg),
+             rotulo + " (" + ano + "): " + s.score[i]);
+      });
+    }
+
+    var itens = [];
+    Object.keys(dados.eixos).forEach(function (eixo, i) {
+      var cor = TAB10[i % 10];
+      serie(dados.eixos[eixo], cor, 1.2, 0.7, eixo);
+      itens.push([eixo, cor]);
+    });
+    if (dados.geral.ano.length) {
+      serie(dados.geral, AZUL, 3, 1, "Geral");
+      dados.geral.ano.forEach(function (ano, i) {
+        texto(svg, x(ano), y(dados.geral.score[i] + 3), dados.geral.score[i], { "text-anchor": "middle", "font-weight": "bold", fill: AZUL });
+      });
+      itens.push(["Geral", AZUL]);
+    }
+    var y0 = Math.max(topo, h / 2 - itens.length * 8);
+    itens.forEach(function (item, i) {
+      el("line", { x1: w - legenda + 5, y1: y0 + i * 16, x2: w - legenda + 20, y2: y0 + i * 16, stroke: item[1], "stroke-width": 3 }, svg);
+      texto(svg, w - legenda + 25, y0 + i * 16, abreviar(item[0], 34), { "dominant-baseline": "middle", "font-size": 9 });
+    });
+  }
+
+  var DESENHOS = { radar: radar, donut: donut, barras: barras, distribuicao: distribuicao, tendencia: tendencia };
+
+  function desenhar(no) {
+    while (no.firstChild) no.removeChild(no.firstChild);
+    var dados = no._dadosGrafico;
+    var w = no.clientWidth, h = no.clientHeight;
+    if (!dados || w < 20 || h < 20) return;
+    var svg = el("svg", { width: w, height: h, viewBox: "0 0 " + w + " " + h }, no);
+    DESENHOS[no.getAttribute("data-tipo")](svg, dados, w, h);
+  }
+
+  // --- OUTPUT BINDING DO SHINY ---
+
+  var observador = typeof ResizeObserver === "undefined" ? null : new ResizeObserver(function (entradas) {
+    entradas.forEach(function (entrada) { desenhar(entrada.target); });
+  });
+
+  var binding = new Shiny.OutputBinding();
+  Object.assign(binding, {
+    find: function (escopo) { return $(escopo).find(".grafico-cliente"); },
+    renderValue: function (no, dados) {
+      no._dadosGrafico = dados;
+      if (observador && !no._observado) {
+        observador.observe(no);
+        no._observado = true;
+      }
+      desenhar(no);
+    },
+  });
+  Shiny.outputBindings.register(binding, "cpa.graficoCliente");
+
+  if (!observador) {
+    window.addEventListener("resize", function () {
+      document.querySelectorAll(".grafico-cliente").forEach(desenhar);
+    });
+  }
+})();